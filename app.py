@@ -1,13 +1,18 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 from datetime import datetime
 import style
-from database import DataManager
-import io
+from database import create_data_manager, get_setting, PersonnelDirectory
 import re
 import base64
 import os
+import uuid
 import stats
+from writer import get_writer
+from export import EXPORT_FORMATS, ExportCache, export_key
+from schema import SHEET_DATE_FORMAT, display_frame
+import profiler
 
 # Page Configuration
 st.set_page_config(
@@ -22,13 +27,17 @@ st.markdown(style.get_custom_css(), unsafe_allow_html=True)
 
 # Initialize Data Manager
 if 'db' not in st.session_state:
-    st.session_state.db = DataManager()
+    st.session_state.db = create_data_manager()
 elif not hasattr(st.session_state.db, 'load_services'):
     # Force reload if old instance doesn't have the new method
     del st.session_state.db
-    st.session_state.db = DataManager()
+    st.session_state.db = create_data_manager()
 
 db = st.session_state.db
+writer = get_writer()
+
+# Identifies this browser session for the background writer results
+if 'session_key' not in st.session_state: st.session_state.session_key = uuid.uuid4().hex
 
 # Load personnel data (Force reload if specified)
 if 'personnel_list' not in st.session_state:
@@ -51,29 +60,36 @@ if 'new_emp_name' not in st.session_state: st.session_state.new_emp_name = ""
 # Management state
 if 'confirm_action_type' not in st.session_state: st.session_state.confirm_action_type = None
 if 'confirm_emp_data' not in st.session_state: st.session_state.confirm_emp_data = {}
+if 'bulk_action_type' not in st.session_state: st.session_state.bulk_action_type = None
+
+# Grid entry state: (date, service, frame) the editor was pre-filled with
+if 'grid_base' not in st.session_state: st.session_state.grid_base = None
+if 'grid_default_arrival' not in st.session_state: st.session_state.grid_default_arrival = datetime.now().strftime("%H:%M")
+
+# "No change" choice of the bulk edit selectboxes
+KEEP_VALUE = "— Inchangé —"
+
+# Columns of the grid entry editor
+GRID_COLUMNS = ["Présent", "Nom et Prénoms", "Heure d'arrivée", "Heure de départ"]
+
+# Row counts offered for the Visualisation table
+PAGE_SIZES = [25, 50, 100, 200]
+# Profiled reruns kept for the debug panel
+PROFILE_HISTORY = 20
 
 # --- HELPER FUNCTIONS ---
 
+def get_directory():
+    """Personnel directory of the current personnel list (rebuilt only when the list is reloaded)."""
+    directory = st.session_state.get('personnel_directory')
+    if directory is None or directory.source is not st.session_state.personnel_list:
+        directory = PersonnelDirectory(st.session_state.personnel_list)
+        st.session_state.personnel_directory = directory
+    return directory
+
 def get_personnel_info(name):
     """Retrieve Sex and Service for a given name."""
-    df_p = st.session_state.personnel_list
-    if not df_p.empty and name:
-        cols = df_p.columns.tolist()
-        name_col = next((c for c in cols if "nom" in c.lower()), None)
-        sex_col = next((c for c in cols if "sexe" in c.lower() or "genre" in c.lower()), None)
-        service_col = next((c for c in cols if "service" in c.lower() or "département" in c.lower()), None)
-        
-        if name_col:
-            # Flexible matching: exact or contains
-            # Ensure column is string for comparison to match dropdown
-            mask = df_p[name_col].astype(str).str.strip() == str(name).strip()
-            row = df_p[mask]
-            
-            if not row.empty:
-                s_val = row.iloc[0][sex_col] if sex_col else None
-                svc_val = row.iloc[0][service_col] if service_col else None
-                return s_val, svc_val
-    return None, None
+    return get_directory().info(name)
 
 def validate_time_format(time_str):
     """Regex validation for HH:MM format"""
@@ -108,7 +124,7 @@ def update_form_defaults():
             st.session_state.form_service_display = ""
             
         # 2. Check for existing entry TODAY
-        date_str = st.session_state.form_date.strftime("%d/%m/%Y")
+        date_str = st.session_state.form_date.strftime(SHEET_DATE_FORMAT)
         existing = db.get_entry_for_today(name, date_str)
         
         if existing:
@@ -172,7 +188,7 @@ def submit_entry_callback():
          st.session_state.error_msg_entry = "⚠️ Format d'heure de départ invalide (Ex: 17:30)"
          return
 
-    d_str = st.session_state.form_date.strftime("%d/%m/%Y")
+    d_str = st.session_state.form_date.strftime(SHEET_DATE_FORMAT)
     ha_str = ha_input # Already string validated
     hd_str = hd_input if st.session_state.form_save_depart else ""
     
@@ -180,26 +196,126 @@ def submit_entry_callback():
     final_sex = st.session_state.form_sex
     final_service = st.session_state.form_service
 
-    success, msg = st.session_state.db.upsert_entry(
+    # Written by the background writer: the callback returns at once,
+    # the outcome is reported as a toast by write_status_panel()
+    name = st.session_state.form_name
+    depth = writer.submit(
+        st.session_state.session_key,
+        st.session_state.db,
+        "upsert_entry",
         d_str, 
-        st.session_state.form_name, 
+        name, 
         final_sex, 
         final_service, 
         ha_str, 
-        hd_str
+        hd_str,
+        label=name
     )
     
-    if success:
-        st.session_state.success_msg_entry = msg
-        st.session_state.form_name = None # Reset name selection
-        st.session_state.form_save_depart = True
-        st.session_state.form_depart = "17:30" # Reset default time
-        if 'error_msg_entry' in st.session_state: del st.session_state.error_msg_entry
-    else:
-        st.session_state.error_msg_entry = "Erreur lors de l'enregistrement."
+    st.session_state.success_msg_entry = f"⏳ Enregistrement en cours pour {name} (file d'attente : {depth})"
+    st.session_state.form_name = None # Reset name selection
+    st.session_state.form_save_depart = True
+    st.session_state.form_depart = "17:30" # Reset default time
+    if 'error_msg_entry' in st.session_state: del st.session_state.error_msg_entry
+
+def clean_time(value):
+    """'HH:MM' text of a stored time (string with 'h', time object...), '' when empty."""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    if hasattr(value, 'strftime'):
+        return value.strftime("%H:%M")
+    return str(value).replace('h', ':').strip()
+
+def build_grid(date_str, service):
+    """One row per employee of the service, pre-filled with the entries already saved for the date."""
+    rows = []
+    for name in get_directory().staff(service):
+        existing = db.get_entry_for_today(name, date_str)
+        rows.append({
+            "Présent": existing is not None,
+            "Nom et Prénoms": name,
+            "Heure d'arrivée": clean_time(existing.get("Heure d'arrivée")) if existing else "",
+            "Heure de départ": clean_time(existing.get("Heure de départ")) if existing else "",
+        })
+    return pd.DataFrame(rows, columns=GRID_COLUMNS)
+
+def reset_grid():
+    """Callback when the grid date or service changes: the editor is pre-filled again."""
+    st.session_state.grid_base = None
+    if 'grid_editor' in st.session_state: del st.session_state.grid_editor
+
+def submit_grid_callback():
+    """Callback of the grid entry button: every checked row in one upsert_entries() call."""
+    date_str, service, base = st.session_state.grid_base
+    grid = base.copy()
+    for pos, changes in st.session_state.get('grid_editor', {}).get("edited_rows", {}).items():
+        for col, value in changes.items():
+            grid.at[int(pos), col] = value
+
+    default_arrival = st.session_state.grid_default_arrival.strip()
+    entries, invalid = [], []
+    for pos, row in grid.iterrows():
+        if not row["Présent"]:
+            continue
+        arrival = str(row["Heure d'arrivée"] or "").strip() or default_arrival
+        departure = str(row["Heure de départ"] or "").strip()
+        if not validate_time_format(arrival) or (departure and not validate_time_format(departure)):
+            invalid.append(row["Nom et Prénoms"])
+            continue
+        grid.at[pos, "Heure d'arrivée"] = arrival
+        # Rows saved earlier and left untouched are not sent again
+        if base.iloc[pos]["Présent"] and (grid.iloc[pos] == base.iloc[pos]).all():
+            continue
+        entries.append((date_str, row["Nom et Prénoms"], arrival, departure))
+
+    if invalid:
+        st.session_state.error_msg_grid = f"⚠️ Format d'heure invalide (Ex: 08:30) pour : {', '.join(invalid)}"
+        return
+    if not entries:
+        st.session_state.error_msg_grid = "⚠️ Aucune présence nouvelle ou modifiée à enregistrer."
+        return
+
+    depth = writer.submit(
+        st.session_state.session_key,
+        st.session_state.db,
+        "upsert_entries",
+        entries,
+        label=f"Saisie groupée {service}"
+    )
+    st.session_state.success_msg_grid = (f"⏳ Enregistrement en cours de {len(entries)} présence(s) "
+                                         f"pour {service} (file d'attente : {depth})")
+    # The saved values become the new starting point of the editor
+    st.session_state.grid_base = (date_str, service, grid)
+    del st.session_state.grid_editor
+
+@st.fragment(run_every=2)
+def write_status_panel():
+    """Sidebar panel polled every 2s: toasts finished writes, shows queue depth and latency."""
+    for label, success, msg, latency_ms in writer.pop_results(st.session_state.session_key):
+        if success:
+            st.toast(f"{msg} ({latency_ms:.0f} ms)", icon="✅")
+        else:
+            st.toast(f"Erreur lors de l'enregistrement ({label}) : {msg}", icon="❌")
+
+    w_stats = writer.stats()
+    col_q, col_l = st.columns(2)
+    col_q.metric("File d'écriture", w_stats["depth"])
+    col_l.metric("Dernière écriture", f"{w_stats['last_ms']:.0f} ms" if w_stats["last_ms"] is not None else "-")
+    if w_stats["avg_ms"] is not None:
+        st.caption(f"Moyenne : {w_stats['avg_ms']:.0f} ms · p95 : {w_stats['p95_ms']:.0f} ms")
+    if hasattr(db, "pending_count") and db.pending_count():
+        st.caption(f"🔄 {db.pending_count()} saisie(s) en attente de synchronisation")
+    if hasattr(db, "pool"):
+        q = db.pool.scheduler.stats()
+        st.caption(
+            f"Quota Sheets/min : lecture {q['read']['remaining']}/{q['read']['capacity']} · "
+            f"écriture {q['write']['remaining']}/{q['write']['capacity']} · "
+            f"réessais {q['read']['retries'] + q['write']['retries']}"
+        )
 
 # --- VIEWS ---
 
+@profiler.profiled()
 def view_saisie_mouvements():
     st.markdown("<div class='info-card'><h3>📝 Nouvelle Saisie / Modification</h3>", unsafe_allow_html=True)
     
@@ -208,14 +324,8 @@ def view_saisie_mouvements():
         st.success(st.session_state.success_msg_entry)
         st.session_state.success_msg_entry = None
 
-    # Prepare dropdown list
-    personnel_names = []
-    if not st.session_state.personnel_list.empty:
-        cols = st.session_state.personnel_list.columns.tolist()
-        name_col = next((c for c in cols if "nom" in c.lower()), None)
-        if name_col:
-            personnel_names = st.session_state.personnel_list[name_col].dropna().astype(str).unique().tolist()
-            personnel_names.sort()
+    # Prepare dropdown list (sorted once per personnel reload)
+    personnel_names = get_directory().names
 
     # FORM UI
     col1, col2, col3 = st.columns(3)
@@ -259,18 +369,73 @@ def view_saisie_mouvements():
 
     # Recent entries preview
     st.markdown("### 🕒 Derniers Enregistrements")
-    df = db.load_data()
+    # Tail read only: the preview never needs the full history
+    df = db.load_latest(5)
     if not df.empty:
         # Sort by Order Number Descending (Latest entries first)
         if "N° ordre" in df.columns:
              # Ensure numeric for sorting
              df["N° ordre"] = pd.to_numeric(df["N° ordre"], errors='coerce')
              df = df.sort_values(by="N° ordre", ascending=False)
-        st.dataframe(df.head(5), use_container_width=True, hide_index=True)
+        st.dataframe(display_frame(df.head(5)), use_container_width=True, hide_index=True)
 
+@profiler.profiled()
+def view_saisie_groupee():
+    st.markdown("<div class='info-card'><h3>👥 Saisie groupée par service</h3>", unsafe_allow_html=True)
+
+    if 'success_msg_grid' in st.session_state and st.session_state.success_msg_grid:
+        st.success(st.session_state.success_msg_grid)
+        st.session_state.success_msg_grid = None
+
+    services = get_directory().services
+    if not services:
+        st.info("Aucun service renseigné dans le personnel.")
+        st.markdown("</div>", unsafe_allow_html=True)
+        return
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        grid_date = st.date_input("Date", value=datetime.now(), key="grid_date", on_change=reset_grid)
+    with col2:
+        service = st.selectbox("Service", options=services, key="grid_service", on_change=reset_grid)
+    with col3:
+        st.text_input("Heure d'arrivée par défaut (HH:MM)", key="grid_default_arrival", max_chars=5,
+                      help="Utilisée pour les présents dont l'heure d'arrivée est vide")
+
+    date_str = grid_date.strftime(SHEET_DATE_FORMAT)
+    base = st.session_state.grid_base
+    if base is None or base[:2] != (date_str, service):
+        base = (date_str, service, build_grid(date_str, service))
+        st.session_state.grid_base = base
+        if 'grid_editor' in st.session_state: del st.session_state.grid_editor
+
+    st.caption("Cochez les présents et ajustez les heures ; un départ vide conserve celui déjà enregistré.")
+    st.data_editor(
+        base[2],
+        key="grid_editor",
+        hide_index=True,
+        use_container_width=True,
+        num_rows="fixed",
+        disabled=["Nom et Prénoms"],
+        column_config={
+            "Présent": st.column_config.CheckboxColumn("Présent"),
+            "Heure d'arrivée": st.column_config.TextColumn("Heure d'arrivée", max_chars=5),
+            "Heure de départ": st.column_config.TextColumn("Heure de départ", max_chars=5),
+        },
+    )
+
+    st.button("Enregistrer la saisie groupée", type="primary", use_container_width=True, on_click=submit_grid_callback)
+
+    if 'error_msg_grid' in st.session_state and st.session_state.error_msg_grid:
+        st.error(st.session_state.error_msg_grid)
+        st.session_state.error_msg_grid = None
+
+    st.markdown("</div>", unsafe_allow_html=True)
+
+@profiler.profiled()
 def view_nouveau_personnel():
     # Calculate total employees
-    total_emp = len(st.session_state.personnel_list) if not st.session_state.personnel_list.empty else 0
+    total_emp = len(get_directory())
     
     st.markdown(f"<div class='info-card'><h3>👤 Ajouter un employé <span style='font-size:0.7em; color:#666; float:right'>Total: {total_emp}</span></h3>", unsafe_allow_html=True)
     
@@ -285,14 +450,9 @@ def view_nouveau_personnel():
         services = db.load_services()
         
         # 2. Add any services currently attached to employees but not in ref list
-        if not st.session_state.personnel_list.empty:
-            cols = st.session_state.personnel_list.columns.tolist()
-            svc_col = next((c for c in cols if "service" in c.lower()), None)
-            if svc_col:
-                used_services = st.session_state.personnel_list[svc_col].dropna().astype(str).unique().tolist()
-                for s in used_services:
-                    if s not in services and s.strip():
-                        services.append(s)
+        for s in get_directory().services:
+            if s not in services:
+                services.append(s)
         
         # 3. Clean and Sort
         services = sorted(list(set([s.strip() for s in services if s.strip()])))
@@ -417,13 +577,7 @@ def view_nouveau_personnel():
 
     col_search_emp, col_action_emp = st.columns([2, 1])
     
-    personnel_names = []
-    if not st.session_state.personnel_list.empty:
-         cols = st.session_state.personnel_list.columns.tolist()
-         name_col = next((c for c in cols if "nom" in c.lower()), None)
-         if name_col:
-             personnel_names = st.session_state.personnel_list[name_col].dropna().astype(str).unique().tolist()
-             personnel_names.sort()
+    personnel_names = get_directory().names
 
     with col_search_emp:
         # Reset confirmation on change
@@ -525,53 +679,161 @@ def view_nouveau_personnel():
             col_yes.button("🗑️ Oui, supprimer définitivement", type="primary", use_container_width=True, on_click=handle_delete_confirm)
             col_no.button("❌ Annuler", use_container_width=True, on_click=handle_cancel)
 
+    # --- Bulk actions (reorganisations, departures): one write whatever the number of employees ---
+    st.markdown("#### Actions groupées")
+
+    def handle_bulk_confirm():
+        names = st.session_state.bulk_emp_select
+        if st.session_state.bulk_action_type == 'BULK_DELETE':
+            success, msg = db.delete_employees(names)
+        else:
+            sex = st.session_state.bulk_sex
+            service = st.session_state.bulk_service
+            success, msg = db.update_employees(
+                names,
+                sexe=None if sex == KEEP_VALUE else sex,
+                service=None if service == KEEP_VALUE else service,
+            )
+        if success:
+            st.session_state.manage_success_msg = msg
+            st.session_state.personnel_list = db.load_personnel()
+            st.session_state.bulk_emp_select = []
+            if st.session_state.bulk_action_type == 'BULK_DELETE' and st.session_state.get("manage_emp_select") in names:
+                st.session_state.manage_emp_select = ""
+        else:
+            st.session_state.manage_error_msg = msg
+        st.session_state.bulk_action_type = None
+
+    def handle_bulk_cancel():
+        st.session_state.bulk_action_type = None
+
+    bulk_names = st.multiselect(
+        "Sélectionner plusieurs employés",
+        personnel_names,
+        key="bulk_emp_select",
+        on_change=handle_bulk_cancel,
+        placeholder="Choisir un ou plusieurs employés",
+    )
+
+    if bulk_names:
+        col_b1, col_b2 = st.columns(2)
+        with col_b1:
+            st.selectbox("Nouveau service", [KEEP_VALUE] + get_all_services(), key="bulk_service")
+        with col_b2:
+            st.selectbox("Sexe", [KEEP_VALUE, "M", "F"], key="bulk_sex")
+
+        col_bb1, col_bb2 = st.columns(2)
+        with col_bb1:
+            if st.button(f"💾 Appliquer aux {len(bulk_names)} sélectionnés", type="primary", use_container_width=True):
+                if st.session_state.bulk_service == KEEP_VALUE and st.session_state.bulk_sex == KEEP_VALUE:
+                    st.error("Choisissez un service ou un sexe à appliquer.")
+                else:
+                    st.session_state.bulk_action_type = 'BULK_UPDATE'
+                    st.rerun()
+        with col_bb2:
+            if st.button(f"🗑️ Supprimer les {len(bulk_names)} sélectionnés", type="secondary", use_container_width=True):
+                st.session_state.bulk_action_type = 'BULK_DELETE'
+                st.rerun()
+
+        if st.session_state.bulk_action_type == 'BULK_UPDATE':
+            changes = [f"{label} : **{value}**" for label, value in
+                       (("service", st.session_state.bulk_service), ("sexe", st.session_state.bulk_sex))
+                       if value != KEEP_VALUE]
+            st.info(f"❓ Appliquer {', '.join(changes)} à **{len(bulk_names)}** employé(s) ?")
+            col_yes, col_no = st.columns(2)
+            col_yes.button("✅ Oui, appliquer", use_container_width=True, on_click=handle_bulk_confirm)
+            col_no.button("❌ Annuler", use_container_width=True, on_click=handle_bulk_cancel, key="bulk_cancel_update")
+
+        elif st.session_state.bulk_action_type == 'BULK_DELETE':
+            st.error(f"⚠️ **ATTENTION** : Vous êtes sur le point de supprimer **{len(bulk_names)}** employé(s) "
+                     f"définitivement : {', '.join(bulk_names)}.")
+            col_yes, col_no = st.columns(2)
+            col_yes.button("🗑️ Oui, supprimer définitivement", type="primary", use_container_width=True,
+                           on_click=handle_bulk_confirm, key="bulk_confirm_delete")
+            col_no.button("❌ Annuler", use_container_width=True, on_click=handle_bulk_cancel, key="bulk_cancel_delete")
+
     st.markdown("</div>", unsafe_allow_html=True)
 
+@profiler.profiled()
 def view_visualisation():
     st.markdown("<div class='info-card'><h3>📊 Bibliothèque des Données</h3>", unsafe_allow_html=True)
     
     df_all = db.load_data()
     
     if not df_all.empty:
-        # Sort by Order Number Descending (Latest entries first)
-        if "N° ordre" in df_all.columns:
-            # Ensure numeric for sorting
-            df_all["N° ordre"] = pd.to_numeric(df_all["N° ordre"], errors='coerce')
-            df_all = df_all.sort_values(by="N° ordre", ascending=False)
-            
         col_search, col_dl = st.columns([3, 1])
         with col_search:
-            search_query = st.text_input("Recherche globale", placeholder="Nom, Service, Date...", key="search_visu")
+            search_query = st.text_input(
+                "Recherche globale", placeholder="Nom, Service, Date... (ex: service:parc date:12/2025)", key="search_visu",
+                help="Accents et majuscules ignorés. Préfixes possibles : nom:, service:, date:, sexe:, arrivee:, depart:, ordre:",
+                on_change=lambda: st.session_state.update(visu_page=1),
+            )
         
-        # Filter logic
-        filtered_df = df_all.copy()
+        # Filter logic (inverted index, no cell scan)
+        positions = np.arange(len(df_all))
         if search_query:
-            mask = filtered_df.astype(str).apply(lambda x: x.str.contains(search_query, case=False, na=False)).any(axis=1)
-            filtered_df = filtered_df[mask]
+            positions = db.load_search_index().search(search_query)
+            positions = positions[positions < len(df_all)]
+
+        # Table controls: sorting and paging happen here, only the visible page is sent to the browser
+        col_sort, col_order, col_size, col_page = st.columns([2, 1, 1, 1])
+        with col_sort:
+            columns = df_all.columns.tolist()
+            sort_col = st.selectbox("Trier par", columns,
+                                    index=columns.index("N° ordre") if "N° ordre" in columns else 0, key="visu_sort")
+        with col_order:
+            descending = st.selectbox("Ordre", ["Décroissant", "Croissant"], key="visu_order") == "Décroissant"
+        with col_size:
+            page_size = st.selectbox("Lignes par page", PAGE_SIZES, index=1, key="visu_page_size")
+        total_pages = max(1, -(-len(positions) // page_size))
+        if st.session_state.get("visu_page", 1) > total_pages:
+            st.session_state.visu_page = total_pages
+        with col_page:
+            page = st.number_input(f"Page (sur {total_pages})", min_value=1, max_value=total_pages, step=1, key="visu_page")
+
+        # Sort keys from the typed frame: real dates and times instead of dd/mm/yyyy strings
+        typed = db.load_typed()
+        keys = typed[sort_col] if sort_col in typed.columns and len(typed) == len(df_all) else df_all[sort_col]
+        sorted_keys = keys.iloc[positions].reset_index(drop=True)
+        order = positions[sorted_keys.sort_values(ascending=not descending, na_position="last", kind="stable").index.to_numpy()]
 
         with col_dl:
-            st.write("") # Spacer
-            output = io.BytesIO()
-            with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                filtered_df.to_excel(writer, index=False, sheet_name='Donnees_Export')
-            
-            st.download_button(
-                label="📥 Exporter (.xlsx)",
-                data=output.getvalue(),
-                file_name=f"export_personnel_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            )
+            # Export built only on request, then reused while data, search and sort are unchanged
+            export_fmt = st.selectbox("Export", list(EXPORT_FORMATS), format_func=lambda f: EXPORT_FORMATS[f][0],
+                                      key="visu_export_fmt")
+            if 'export_cache' not in st.session_state: st.session_state.export_cache = ExportCache()
+            export_cache = st.session_state.export_cache
+            key = export_key(db.data_version(), search_query, sort_col, descending, export_fmt)
+            export_path = export_cache.get(key)
+            if export_path is None and st.button("⚙️ Préparer l'export", use_container_width=True):
+                with st.spinner("Génération de l'export..."):
+                    export_path = export_cache.build(key, export_fmt, lambda: display_frame(df_all.iloc[order]))
+            if export_path:
+                with open(export_path, "rb") as f:
+                    st.download_button(
+                        label="📥 Télécharger",
+                        data=f,
+                        file_name=f"export_personnel_{datetime.now().strftime('%Y%m%d_%H%M')}.{export_fmt}",
+                        mime=EXPORT_FORMATS[export_fmt][1],
+                        use_container_width=True,
+                    )
         
+        first = (page - 1) * page_size
+        page_df = df_all.iloc[order[first:first + page_size]]
         st.dataframe(
-            filtered_df,
+            display_frame(page_df),
             use_container_width=True,
-            height=600,
+            height=min(600, 38 + 35 * max(1, len(page_df))),
             hide_index=True,
             column_config={
                 "N° ordre": st.column_config.NumberColumn(format="%d"),
+                "ID Employé": st.column_config.NumberColumn(format="%d"),
             }
         )
-        st.caption(f"Affichage de {len(filtered_df)} enregistrements.")
+        if len(positions):
+            st.caption(f"Affichage de {first + 1} à {first + len(page_df)} sur {len(positions)} enregistrements.")
+        else:
+            st.caption("Affichage de 0 enregistrements.")
     else:
         st.info("La base de données est vide pour le moment.")
     st.markdown("</div>", unsafe_allow_html=True)
@@ -585,10 +847,13 @@ def main():
         
         selection = st.radio(
             "Navigation",
-            ["📝 Saisie Mouvements", "➕ Nouveau Personnel", "📊 Visualisation", "📊 Statistiques"],
+            ["📝 Saisie Mouvements", "👥 Saisie groupée", "➕ Nouveau Personnel", "📊 Visualisation", "📊 Statistiques"],
             label_visibility="collapsed"
         )
         
+        st.divider()
+        write_status_panel()
+
         st.divider()
         st.info("💡 Sélectionnez une option ci-dessus pour naviguer.")
         st.caption("Version 1.0.2")
@@ -617,6 +882,8 @@ def main():
 
     if selection == "📝 Saisie Mouvements":
         view_saisie_mouvements()
+    elif selection == "👥 Saisie groupée":
+        view_saisie_groupee()
     elif selection == "➕ Nouveau Personnel":
         view_nouveau_personnel()
     elif selection == "📊 Visualisation":
@@ -624,5 +891,36 @@ def main():
     elif selection == "📊 Statistiques":
         stats.view_dashboard(db)
 
+def profiling_enabled():
+    """Opt-in instrumentation: [debug] profiler = true in secrets.toml or ?profile=1 in the URL."""
+    return bool(get_setting("debug", "profiler", False)) or st.query_params.get("profile") == "1"
+
+def profile_panel(profile):
+    """Sidebar debug panel: spans of this rerun and totals of the last ones."""
+    if 'profiles' not in st.session_state: st.session_state.profiles = []
+    st.session_state.profiles = (st.session_state.profiles + [profile])[-PROFILE_HISTORY:]
+
+    with st.sidebar.expander("🐞 Profil d'exécution", expanded=False):
+        spans = pd.DataFrame(profile.spans)
+        spans["name"] = ["\u00a0\u00a0" * d + n for d, n in zip(spans["depth"], spans["name"])]
+        spans["KB"] = (spans["bytes"] / 1024).round(1)
+        st.dataframe(
+            spans[["name", "ms", "api_calls", "rows", "KB"]].rename(columns={
+                "name": "Étape", "api_calls": "Appels API", "rows": "Lignes"}),
+            hide_index=True, use_container_width=True,
+        )
+        last = pd.DataFrame([
+            {"Heure": datetime.fromtimestamp(p.started_at).strftime("%H:%M:%S"), "ms": p.spans[0]["ms"],
+             "Appels API": p.api_calls, "KB": round(p.bytes_sent / 1024, 1)}
+            for p in reversed(st.session_state.profiles)
+        ])
+        st.caption("Dernières exécutions")
+        st.dataframe(last, hide_index=True, use_container_width=True)
+
 if __name__ == "__main__":
-    main()
+    if profiling_enabled():
+        with profiler.profile_run("main", log_path=get_setting("debug", "log_path", profiler.PROFILE_LOG_PATH)) as profile:
+            main()
+        profile_panel(profile)
+    else:
+        main()
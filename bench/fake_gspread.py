@@ -0,0 +1,263 @@
+# In-memory stand-in for the gspread Spreadsheet/Worksheet API used by database.py.
+# Every method call counts as one API request: it is logged in FakeSpreadsheet.calls,
+# delayed by the configured latency and refused with a 429 APIError once the
+# per-minute quota is spent, like the real service.
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+
+import gspread
+from gspread.utils import a1_to_rowcol
+
+
+class FakeResponse:
+    """Minimal requests.Response for gspread.exceptions.APIError."""
+
+    def __init__(self, status_code, message, retry_after=None):
+        self.status_code = status_code
+        self.headers = {"Retry-After": str(retry_after)} if retry_after else {}
+        self._message = message
+        self.text = message
+
+    def json(self):
+        return {"error": {"code": self.status_code, "message": self._message, "status": "RESOURCE_EXHAUSTED"}}
+
+
+class FakeCell:
+    def __init__(self, row, col, value):
+        self.row = row
+        self.col = col
+        self.value = value
+
+
+class FakeWorksheet:
+    def __init__(self, spreadsheet, title, rows=None):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.id = abs(hash(title))
+        self.rows = [list(r) for r in rows or []]
+
+    @property
+    def col_count(self):
+        return max([26] + [len(r) for r in self.rows])
+
+    def add_cols(self, cols):
+        self._call("add_cols")
+
+    def _call(self, name, rows_out=0):
+        self.spreadsheet._request(f"{self.title}.{name}", rows_out)
+
+    # --- Reads ---
+
+    def get_all_values(self, **kwargs):
+        self._call("get_all_values", len(self.rows))
+        return [[str(v) for v in r] for r in self.rows]
+
+    def get_values(self, range_name=None, **kwargs):
+        if range_name is None:
+            return self.get_all_values()
+        values = self._range(range_name)
+        self._call("get_values", len(values))
+        return values
+
+    get = get_values
+
+    def batch_get(self, ranges, **kwargs):
+        out = [self._range(r) for r in ranges]
+        self._call("batch_get", sum(len(v) for v in out))
+        return out
+
+    def get_all_records(self, **kwargs):
+        self._call("get_all_records", max(0, len(self.rows) - 1))
+        if not self.rows:
+            return []
+        header = self.rows[0]
+        records = []
+        for row in self.rows[1:]:
+            row = list(row) + [""] * (len(header) - len(row))
+            records.append(dict(zip(header, (gspread.utils.numericise(str(v)) for v in row))))
+        return records
+
+    def row_values(self, row, **kwargs):
+        self._call("row_values", 1)
+        return [str(v) for v in self.rows[row - 1]] if row <= len(self.rows) else []
+
+    def col_values(self, col, **kwargs):
+        self._call("col_values", len(self.rows))
+        return [str(r[col - 1]) if len(r) >= col else "" for r in self.rows]
+
+    def find(self, query, in_column=None, **kwargs):
+        self._call("find")
+        for i, row in enumerate(self.rows):
+            for j, value in enumerate(row):
+                if str(value) == str(query) and in_column in (None, j + 1):
+                    return FakeCell(i + 1, j + 1, value)
+        return None
+
+    def findall(self, query, in_column=None, **kwargs):
+        self._call("findall")
+        return [FakeCell(i + 1, j + 1, value)
+                for i, row in enumerate(self.rows) for j, value in enumerate(row)
+                if str(value) == str(query) and in_column in (None, j + 1)]
+
+    def _range(self, range_name):
+        """Rows of an A1 range ("A5:G", "5:9", "A1:D1", "B:B"), as strings."""
+        ref = range_name.split("!")[-1]
+        match = re.match(r"([A-Z]*)(\d*):([A-Z]*)(\d*)$", ref)
+        first = int(match.group(2) or 1)
+        last = int(match.group(4) or len(self.rows))
+        first_col = a1_to_rowcol(f"{match.group(1)}1")[1] if match.group(1) else 1
+        last_col = a1_to_rowcol(f"{match.group(3)}1")[1] if match.group(3) else None
+        return [[str(v) for v in r[first_col - 1:last_col]] for r in self.rows[first - 1:last]]
+
+    # --- Writes ---
+
+    def _set(self, row, col, value):
+        while len(self.rows) < row:
+            self.rows.append([])
+        cells = self.rows[row - 1]
+        while len(cells) < col:
+            cells.append("")
+        cells[col - 1] = value
+
+    def _write(self, range_name, values):
+        row, col = a1_to_rowcol(range_name.split("!")[-1].split(":")[0])
+        for i, line in enumerate(values):
+            for j, value in enumerate(line):
+                self._set(row + i, col + j, value)
+
+    def _appended(self, first):
+        last = len(self.rows)
+        return {"updates": {"updatedRange": f"'{self.title}'!A{first}:Z{last}", "updatedRows": last - first + 1}}
+
+    def append_row(self, values, **kwargs):
+        self._call("append_row")
+        self.rows.append(list(values))
+        return self._appended(len(self.rows))
+
+    def append_rows(self, values, **kwargs):
+        self._call("append_rows")
+        first = len(self.rows) + 1
+        self.rows.extend(list(v) for v in values)
+        return self._appended(first)
+
+    def update(self, values=None, range_name=None, **kwargs):
+        self._call("update")
+        self._write(range_name, values)
+
+    def update_cell(self, row, col, value):
+        self._call("update_cell")
+        self._set(row, col, value)
+
+    def batch_update(self, data, **kwargs):
+        self._call("batch_update")
+        for item in data:
+            self._write(item["range"], item["values"])
+
+    def delete_rows(self, start_index, end_index=None):
+        self._call("delete_rows")
+        del self.rows[start_index - 1:(end_index or start_index)]
+
+    def clear(self):
+        self._call("clear")
+        self.rows = []
+
+    def resize(self, rows=None, cols=None):
+        self._call("resize")
+
+    def update_title(self, title):
+        self._call("update_title")
+        self.spreadsheet._sheets[title] = self.spreadsheet._sheets.pop(self.title)
+        self.title = title
+
+
+class FakeSpreadsheet:
+    """Spreadsheet of FakeWorksheets with request accounting.
+
+    - latency_ms: added to every request (plus up to jitter_ms)
+    - quota_per_minute: requests allowed per rolling minute (None: unlimited);
+      beyond it requests fail with a 429 APIError carrying Retry-After
+    """
+
+    def __init__(self, title="SUIVI_PERSONNEL_DB", latency_ms=0.0, jitter_ms=0.0, quota_per_minute=None, seed=0):
+        self.title = title
+        self.id = "fake-spreadsheet"
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.quota_per_minute = quota_per_minute
+        self.calls = Counter()  # "<sheet>.<method>" -> requests
+        self.rows_read = 0
+        self.throttled = 0
+        self._random = random.Random(seed)
+        self._recent = deque()  # timestamps of the requests of the last minute
+        self._lock = threading.Lock()
+        self._sheets = {}
+
+    def _request(self, name, rows_out=0):
+        with self._lock:
+            now = time.monotonic()
+            if self.quota_per_minute is not None:
+                while self._recent and now - self._recent[0] > 60:
+                    self._recent.popleft()
+                if len(self._recent) >= self.quota_per_minute:
+                    self.throttled += 1
+                    raise gspread.exceptions.APIError(FakeResponse(429, "Quota exceeded", retry_after=1))
+                self._recent.append(now)
+            self.calls[name] += 1
+            self.rows_read += rows_out
+        delay = self.latency_ms + self._random.uniform(0, self.jitter_ms)
+        if delay:
+            time.sleep(delay / 1000)
+
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    def add_sheet(self, title, rows):
+        """Test setup: creates a worksheet without counting a request."""
+        self._sheets[title] = FakeWorksheet(self, title, rows)
+        return self._sheets[title]
+
+    def worksheet(self, title):
+        self._request("worksheet")
+        if title not in self._sheets:
+            raise gspread.WorksheetNotFound(title)
+        return self._sheets[title]
+
+    def worksheets(self, **kwargs):
+        self._request("worksheets")
+        return list(self._sheets.values())
+
+    def add_worksheet(self, title, rows, cols, **kwargs):
+        self._request("add_worksheet")
+        if title in self._sheets:
+            raise gspread.exceptions.APIError(FakeResponse(400, f'A sheet with the name "{title}" already exists.'))
+        return self.add_sheet(title, [])
+
+    def batch_update(self, body):
+        """Structural requests; only deleteDimension (rows) is supported."""
+        self._request("batch_update")
+        by_id = {sheet.id: sheet for sheet in self._sheets.values()}
+        for request in body["requests"]:
+            target = request["deleteDimension"]["range"]
+            del by_id[target["sheetId"]].rows[target["startIndex"]:target["endIndex"]]
+        return {"replies": [{} for _ in body["requests"]]}
+
+    def values_batch_get(self, ranges, params=None, **kwargs):
+        """Ranges of several worksheets ("'Title'" or "'Title'!A5:H") in one request."""
+        out = []
+        for range_name in ranges:
+            title, _, ref = range_name.partition("!")
+            sheet = self._sheets[title.strip("'")]
+            values = sheet._range(ref) if ref else [[str(v) for v in r] for r in sheet.rows]
+            out.append({"range": range_name, "values": values})
+        self._request("values_batch_get", sum(len(r["values"]) for r in out))
+        return {"valueRanges": out}
+
+    def values_batch_update(self, body=None, **kwargs):
+        self._request("values_batch_update")
+        for item in body["data"]:
+            title, range_name = item["range"].rsplit("!", 1)
+            self._sheets[title.strip("'")]._write(range_name, item["values"])
+        return {"totalUpdatedRanges": len(body["data"])}
@@ -0,0 +1,224 @@
+# Offline benchmarks of database.DataManager against the fake Google Sheets in fake_gspread.py.
+#
+#   python -m bench.run_bench                      # run, compare with bench/baseline.json
+#   python -m bench.run_bench --update-baseline    # store the current figures as the baseline
+#   python -m bench.run_bench --latency-ms 150 --quota 60 --employees 500 --years 3
+#   python -m bench.run_bench --legacy             # single 'Mouvements' sheet instead of one sheet per month
+#
+# Exits with status 1 when an operation makes more API calls or reads more rows
+# than its baseline, or gets slower than the allowed tolerance. Only runs with the
+# same parameters as the baseline are compared.
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+from bench.fake_gspread import FakeSpreadsheet
+from bench.synthetic import by_month, generate
+from database import DEFAULT_SERVICES, DataManager, RequestScheduler, SheetsConnectionPool
+from schema import SHEET_DATE_FORMAT
+from timesheet import Timesheet
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+UNLIMITED_QUOTA = 10 ** 9
+# Slowdown allowed before a timing counts as a regression (ratio, plus absolute slack in ms)
+TIME_TOLERANCE = 1.0
+TIME_SLACK_MS = 5.0
+DATASET_END = date(2025, 12, 31)
+
+
+class Bench:
+    """One fake spreadsheet filled with the synthetic dataset, and a DataManager on top of it."""
+
+    def __init__(self, args, personnel, mouvements):
+        self.spreadsheet = FakeSpreadsheet(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                                           quota_per_minute=args.quota, seed=args.seed)
+        sheets = {"Mouvements": mouvements} if args.legacy else by_month(mouvements)
+        for title, rows in sheets.items():
+            self.spreadsheet.add_sheet(title, rows)
+        self.spreadsheet.add_sheet("Personnel", personnel)
+        self.spreadsheet.add_sheet("Services", [["Service"]] + [[s] for s in DEFAULT_SERVICES])
+        quota = args.scheduler_quota or args.quota or UNLIMITED_QUOTA
+        pool = SheetsConnectionPool(spreadsheet=self.spreadsheet, scheduler=RequestScheduler(quota, quota))
+        self.db = DataManager(cache_ttl=3600, pool=pool)
+        # Steady state: worksheet handles fetched, caches warm
+        self.db.load_data()
+        self.db.load_personnel()
+
+    def measure(self, func):
+        sheet = self.spreadsheet
+        calls, rows, throttled = sheet.total_calls(), sheet.rows_read, sheet.throttled
+        builds = self.rollup_builds()
+        started = time.perf_counter()
+        func()
+        return {
+            "ms": (time.perf_counter() - started) * 1000,
+            "api_calls": sheet.total_calls() - calls,
+            "rows": sheet.rows_read - rows,
+            "throttled": sheet.throttled - throttled,
+            "rebuilds": self.rollup_builds() - builds,
+        }
+
+    def rollup_builds(self):
+        """Rollups rebuilt from raw rows so far (writes should advance them in place)."""
+        return self.db.__dict__.get("memo_builds", {}).get("rollups", 0)
+
+
+def scenarios(args, personnel, mouvements):
+    """Yields (operation name, Bench, list of callables to time)."""
+    rng = random.Random(args.seed)
+    people = [row[1] for row in personnel[1:]]
+    history = mouvements[1:]
+    n = args.repeat
+    month_start = DATASET_END.replace(day=1)
+    # New check-ins go on the weekends of the last month: no existing row, no new month sheet
+    weekends = [d.strftime(SHEET_DATE_FORMAT) for d in (month_start + timedelta(days=i) for i in range(DATASET_END.day))
+                if d.weekday() >= 5]
+
+    bench = Bench(args, personnel, mouvements)
+    yield "load_data (froid)", bench, [lambda: bench.db.load_data(refresh=True)] * n
+    yield "load_data (cache)", bench, [lambda: bench.db.load_data()] * n
+    yield "load_data (mois courant)", bench, [
+        lambda: bench.db.load_data(refresh=True, start=month_start, end=DATASET_END)] * n
+    # Monthly timesheets of the whole history, from the cached typed frame
+    bench.db.load_typed()
+    yield "Timesheet (historique)", bench, [lambda: Timesheet.from_frame(bench.db.load_typed())] * n
+
+    bench = Bench(args, personnel, mouvements)
+    rows = rng.sample(history, n)
+    yield "upsert_entry (mise à jour)", bench, [
+        (lambda r=r: bench.db.upsert_entry(r[1], r[2], r[3], r[4], "08:05", "17:40")) for r in rows]
+    yield "upsert_entry (ajout)", bench, [
+        (lambda i=i: bench.db.upsert_entry(weekends[i % len(weekends)], people[0], "M", DEFAULT_SERVICES[0], "07:50", ""))
+        for i in range(n)]
+
+    # Shift start: 10 check-ins to correct and 10 new ones per call
+    batches = [[(r[1], r[2], "08:10", "") for r in rng.sample(history, 10)]
+               + [(weekends[i % len(weekends)], name, "07:55", "") for name in rng.sample(people[1:], 10)]
+               for i in range(n)]
+    yield "upsert_entries (x20)", bench, [(lambda b=b: bench.db.upsert_entries(b)) for b in batches]
+
+    bench = Bench(args, personnel, mouvements)
+    new_names = [f"BENCH Employé {i}" for i in range(n)]
+    yield "add_employee (ajout)", bench, [
+        (lambda name=name: bench.db.add_employee(name, "F", DEFAULT_SERVICES[1])) for name in new_names]
+    renamed = rng.sample(people, 2 * n)
+    yield "add_employee (renommage)", bench, [
+        (lambda old=old: bench.db.add_employee(f"{old} (renommé)", "M", DEFAULT_SERVICES[2], original_name=old))
+        for old in renamed[:n]]
+    yield "update_history_name", bench, [
+        (lambda old=old: bench.db.update_history_name(old, f"{old} (renommé)")) for old in renamed[n:]]
+    yield "update_employees (x5)", bench, [
+        (lambda i=i: bench.db.update_employees(people[i * 5:(i + 1) * 5], service=DEFAULT_SERVICES[3]))
+        for i in range(n)]
+    yield "delete_employee", bench, [(lambda name=name: bench.db.delete_employee(name)) for name in new_names]
+
+    bench = Bench(args, personnel, mouvements)
+    yield "add_employees (x50)", bench, [
+        (lambda i=i: bench.db.add_employees([(f"BENCH Import {i}-{k}", "M", DEFAULT_SERVICES[0]) for k in range(50)]))
+        for i in range(n)]
+
+    # Save then dashboard refresh on the current month: the rollups must be advanced, not rebuilt
+    bench = Bench(args, personnel, mouvements)
+    bench.db.load_rollups(month_start, DATASET_END)
+    last_month = [r for r in history if r[1] >= month_start.strftime(SHEET_DATE_FORMAT)]
+    saves = [(r[1], r[2], r[3], r[4]) for r in rng.sample(last_month, n)] + \
+        [(weekends[i % len(weekends)], people[-1], "F", DEFAULT_SERVICES[1]) for i in range(n)]
+    yield "upsert_entry + tableau de bord", bench, [
+        (lambda s=s: (bench.db.upsert_entry(*s, "08:02", ""), bench.db.load_rollups(month_start, DATASET_END)))
+        for s in saves]
+
+
+def summarize(samples):
+    times = sorted(s["ms"] for s in samples)
+    return {
+        "median_ms": round(statistics.median(times), 2),
+        "p95_ms": round(times[min(len(times) - 1, int(0.95 * len(times)))], 2),
+        "api_calls": round(statistics.mean(s["api_calls"] for s in samples), 2),
+        "rows": round(statistics.mean(s["rows"] for s in samples), 1),
+        "throttled": sum(s["throttled"] for s in samples),
+        "rebuilds": sum(s["rebuilds"] for s in samples),
+    }
+
+
+def compare(name, result, baseline, check_time):
+    """Regression messages of one operation against its baseline figures."""
+    problems = []
+    if result["api_calls"] > baseline["api_calls"] + 1e-9:
+        problems.append(f"appels API {baseline['api_calls']} -> {result['api_calls']}")
+    if result["rebuilds"] > baseline.get("rebuilds", result["rebuilds"]):
+        problems.append(f"agrégats reconstruits {baseline['rebuilds']} -> {result['rebuilds']}")
+    if result["rows"] > baseline["rows"] * 1.05 + 1:
+        problems.append(f"lignes lues {baseline['rows']} -> {result['rows']}")
+    if check_time and result["median_ms"] > baseline["median_ms"] * (1 + TIME_TOLERANCE) + TIME_SLACK_MS:
+        problems.append(f"médiane {baseline['median_ms']} ms -> {result['median_ms']} ms")
+    return [f"{name}: {p}" for p in problems]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks hors ligne de database.py (Google Sheets simulé).")
+    parser.add_argument("--employees", type=int, default=200)
+    parser.add_argument("--years", type=float, default=1)
+    parser.add_argument("--repeat", type=int, default=5, help="appels mesurés par opération")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="latence ajoutée à chaque requête")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--quota", type=int, default=None, help="requêtes/minute acceptées par le faux serveur")
+    parser.add_argument("--scheduler-quota", type=int, default=None,
+                        help="quota/minute du RequestScheduler (par défaut : --quota, sinon illimité)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--legacy", action="store_true", help="une seule feuille 'Mouvements' (non découpée par mois)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--no-time-check", action="store_true", help="ne compare que les appels API et les lignes")
+    args = parser.parse_args(argv)
+
+    params = {k: getattr(args, k) for k in ("employees", "years", "repeat", "latency_ms", "jitter_ms", "quota", "seed", "legacy")}
+    started = time.perf_counter()
+    personnel, mouvements = generate(employees=args.employees, years=args.years, seed=args.seed,
+                                     end=DATASET_END)
+    print(f"Jeu de données : {len(personnel) - 1} employés, {len(mouvements) - 1} mouvements "
+          f"(généré en {time.perf_counter() - started:.1f} s)\n")
+
+    results = {}
+    print(f"{'Opération':32} {'médiane ms':>11} {'p95 ms':>9} {'appels API':>11} {'lignes lues':>12} {'refus 429':>10} "
+          f"{'reconstr.':>10}")
+    for name, bench, calls in scenarios(args, personnel, mouvements):
+        results[name] = summarize([bench.measure(call) for call in calls])
+        r = results[name]
+        print(f"{name:32} {r['median_ms']:>11.2f} {r['p95_ms']:>9.2f} {r['api_calls']:>11.2f} {r['rows']:>12.1f} {r['throttled']:>10} "
+              f"{r['rebuilds']:>10}")
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"params": params, "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"\nRéférence enregistrée dans {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("\nAucune référence : lancez avec --update-baseline pour en créer une.")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    # Figures are only comparable for the same dataset, repeat count and simulated network
+    if baseline.get("params") != params:
+        print("\nParamètres différents de la référence : pas de comparaison.")
+        return 0
+    regressions = []
+    for name, result in results.items():
+        if name in baseline["results"]:
+            regressions += compare(name, result, baseline["results"][name], not args.no_time_check)
+    if regressions:
+        print("\nRÉGRESSIONS :")
+        for line in regressions:
+            print(f"  - {line}")
+        return 1
+    print("\nAucune régression par rapport à la référence.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+# Synthetic data for the benchmarks: years of check-ins for hundreds of employees
+import random
+from datetime import date, timedelta
+
+from database import DEFAULT_SERVICES, MOUVEMENTS_COLUMNS, PERSONNEL_COLUMNS, month_of, partition_title
+from schema import SHEET_DATE_FORMAT
+
+LAST_NAMES = ["KOUASSI", "YAO", "KONÉ", "DIALLO", "BAMBA", "TRAORÉ", "N'GUESSAN", "KOFFI", "OUATTARA", "AKA",
+              "COULIBALY", "TOURÉ", "GBAGBO", "ASSI", "BROU", "DJÉ", "SORO", "KOUAMÉ", "ZADI", "EHOUMAN"]
+FIRST_NAMES = ["Jean", "Awa", "Ézéchiel", "Fatou", "Aminata", "Koffi", "Adjoua", "Mamadou", "Marie-Laure",
+               "Hervé", "Aïcha", "Serge", "Clémence", "Ibrahim", "Mariam", "Désiré", "Estelle", "Yves"]
+
+
+def _time(rng, mean_minutes, spread):
+    minutes = int(rng.gauss(mean_minutes, spread))
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def generate(employees=300, years=2, presence=0.9, end=None, seed=42, linked=True):
+    """Returns (personnel rows, mouvements rows), header included, as sheet values.
+
+    One check-in per employee and working day (Monday-Friday) with the given
+    presence rate, arrivals around 07:45 and departures around 17:30 (empty
+    for about one day in ten, like forgotten check-outs). With linked=False
+    the "ID Employé" cells are left empty, as in a sheet not migrated yet.
+    """
+    rng = random.Random(seed)
+    services = list(DEFAULT_SERVICES)
+    people = []
+    used = set()
+    while len(people) < employees:
+        name = f"{rng.choice(LAST_NAMES)} {rng.choice(FIRST_NAMES)}"
+        if name in used:
+            name = f"{name} {len(people)}"
+        used.add(name)
+        people.append((name, rng.choice("MF"), rng.choice(services)))
+
+    personnel = [list(PERSONNEL_COLUMNS)] + [[i + 1, n, s, svc] for i, (n, s, svc) in enumerate(people)]
+
+    mouvements = [list(MOUVEMENTS_COLUMNS)]
+    end = end or date.today()
+    day = end - timedelta(days=365 * years)
+    while day <= end:
+        if day.weekday() < 5:
+            day_str = day.strftime(SHEET_DATE_FORMAT)
+            for employee_id, (name, sexe, service) in enumerate(people, start=1):
+                if rng.random() < presence:
+                    departure = _time(rng, 17 * 60 + 30, 25) if rng.random() > 0.1 else ""
+                    mouvements.append([len(mouvements), day_str, name, sexe, service,
+                                       _time(rng, 7 * 60 + 45, 20), departure, employee_id if linked else ""])
+        day += timedelta(days=1)
+    return personnel, mouvements
+
+
+def by_month(mouvements):
+    """Splits mouvements rows (header included) into {month worksheet title: rows with header}."""
+    sheets = {}
+    for row in mouvements[1:]:
+        sheets.setdefault(partition_title(month_of(row[1])), [mouvements[0]]).append(row)
+    return sheets
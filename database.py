@@ -2,82 +2,1469 @@ import pandas as pd
 import streamlit as st
 import gspread
 from oauth2client.service_account import ServiceAccountCredentials
+import functools
 import json
+import os
+import random
+import re
+import socket
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import insort
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+
+from profiler import profile_methods, record_api_call
+from rollups import DailyRollup
+from search import SearchIndex
+from schema import (DateIndex, display_date, display_frame, fold_text, frame_from_values, normalize_name,
+                    to_sheet_date, to_sheet_dates, typed_frame)
+from timesheet import DEFAULT_END, DEFAULT_START, Timesheet, schedule_minutes
+
+# Read-through cache defaults (overridable in secrets.toml under [cache])
+CACHE_TTL_SECONDS = 60
+CACHE_MAX_ENTRIES = 8
+
+# Incremental Mouvements refresh: rows re-read above the last synced row to catch
+# in-place edits (upsert_entry only rewrites recent rows), and maximum age of a
+# tail-only copy before a full reload
+SYNC_PROBE_ROWS = 200
+FULL_SYNC_SECONDS = 15 * 60
+
+# Movements are stored one worksheet per month ("Mouvements_2025_06"), so reads skip
+# the months outside the requested range. A spreadsheet still holding the single
+# "Mouvements" sheet keeps using it until partition_mouvements.py splits it.
+# The partition list comes from the spreadsheet metadata, re-read with every full sync
+MOVEMENTS_SHEET = "Mouvements"
+PARTITION_PREFIX = "Mouvements_"
+PARTITION_ROWS = 1000
+# Structures built over a date range (typed frame, rollups) kept per manager
+RANGE_MEMOS = 6
+
+# Google Sheets connection
+SHEETS_SCOPE = ["https://spreadsheets.google.com/feeds", 'https://www.googleapis.com/auth/spreadsheets',
+                "https://www.googleapis.com/auth/drive.file", "https://www.googleapis.com/auth/drive"]
+SPREADSHEET_NAME = "SUIVI_PERSONNEL_DB"
+
+# Sheets API quotas (per minute, overridable in secrets.toml under [quota]) and retry policy
+QUOTA_READS_PER_MINUTE = 60
+QUOTA_WRITES_PER_MINUTE = 60
+LOW_PRIORITY_RESERVE = 0.2  # share of each bucket kept for interactive calls
+MAX_RETRIES = 5
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 32.0
+
+# Ids ("N° ordre") reserved per process at once, see IdAllocator
+ID_BLOCK_SIZE = 20
+
+# Storage backend (secrets.toml [storage] backend = "gsheets" | "sqlite")
+DEFAULT_BACKEND = "gsheets"
+SQLITE_DEFAULT_PATH = "suivi_rh.db"
+
+# Movements reference their employee by personnel "N° ordre" (last column, added by
+# migrate_employee_ids); "Nom et Prenoms" keeps the name as typed, for reading the sheet
+# by hand and for rows that are not linked
+EMPLOYEE_ID_COLUMN = "ID Employé"
+MOUVEMENTS_COLUMNS = ["N° ordre", "Date", "Nom et Prenoms", "Sexe", "Service", "Heure d'arrivée", "Heure de départ",
+                      EMPLOYEE_ID_COLUMN]
+PERSONNEL_COLUMNS = ["N° ordre", "Nom et Prénoms", "Sexe", "Service"]
+DEFAULT_SERVICES = ["Prélèvements", "Parc Auto", "Comptabilité Matière",
+                    "Hygiène Assainissement", "Biologie Moléculaire",
+                    "Administration"]
+
+
+def get_setting(section, key, default=None):
+    """Reads an optional value from st.secrets, falling back to default."""
+    try:
+        if section in st.secrets:
+            return st.secrets[section].get(key, default)
+    except Exception:
+        pass
+    return default
+
+
+def work_schedule():
+    """(start, end) of the reference working day in minutes, from [schedule] (default 08:00-17:30)."""
+    return schedule_minutes(get_setting("schedule", "start", DEFAULT_START),
+                            get_setting("schedule", "end", DEFAULT_END))
+
+
+def _same_value(old, new):
+    """True when a reloaded sheet value (frame or list) holds the same data as the cached one."""
+    if isinstance(old, pd.DataFrame) or isinstance(new, pd.DataFrame):
+        return isinstance(old, pd.DataFrame) and isinstance(new, pd.DataFrame) and old.equals(new)
+    try:
+        return bool(old == new)
+    except Exception:
+        return False
+
+
+class SheetCache:
+    """Versioned in-memory copy of worksheets with TTL and LRU eviction.
+
+    Every patch, and every put of a value that differs from the cached one,
+    bumps the version of the key, so derived structures (indexes, rollups...)
+    are rebuilt only when the data actually changed: a TTL reload finding the
+    same rows only makes the entry fresh again.
+    """
+
+    def __init__(self, ttl=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (loaded_at, value)
+        self._versions = {}  # key -> int, never reset so versions stay unique
+        self._lock = threading.RLock()
+
+    def get(self, key):
+        """Returns the cached value, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            loaded_at, value = entry
+            if self.ttl is not None and time.monotonic() - loaded_at > self.ttl:
+                # Kept (until evicted) so the next refresh can be incremental, see peek()
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def peek(self, key):
+        """Returns the cached value even if expired (None if missing or evicted)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[1] if entry else None
+
+    def put(self, key, value):
+        """Stores a freshly loaded value and evicts the least recently used keys."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not _same_value(entry[1], value):
+                self._versions[key] = self._versions.get(key, 0) + 1
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while self.max_entries and len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def patch(self, key, func):
+        """Applies func(value) -> new value to a cached entry, keeping its age.
+
+        Returns False when nothing is cached (the next read will reload anyway).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            loaded_at, value = entry
+            try:
+                new_value = func(value)
+            except Exception:
+                # A failed patch must never leave a half-updated copy behind
+                self.invalidate(key)
+                return False
+            self._entries[key] = (loaded_at, new_value)
+            self._versions[key] = self._versions.get(key, 0) + 1
+            return True
+
+    def invalidate(self, key=None):
+        """Drops one key, or the whole cache when key is None."""
+        with self._lock:
+            keys = list(self._entries) if key is None else [key]
+            for k in keys:
+                if self._entries.pop(k, None) is not None:
+                    self._versions[k] = self._versions.get(k, 0) + 1
+
+    def version(self, key):
+        """Current version number of a key (0 if never loaded)."""
+        return self._versions.get(key, 0)
+
+
+def _appended_row_number(response):
+    """Extracts the sheet row written by append_row from the API response."""
+    try:
+        updated_range = response["updates"]["updatedRange"]
+        match = re.search(r"![A-Z]+(\d+)", updated_range)
+        return int(match.group(1)) if match else None
+    except Exception:
+        return None
+
+
+class WriteBuffer:
+    """Collects sheet mutations and sends them in as few API calls as possible.
+
+    Cell writes from every worksheet are merged into contiguous row ranges and
+    sent in one spreadsheet-level values_batch_update; appends are grouped into
+    one append_rows per worksheet. A failed append is never sent again: it may
+    have landed, and the callers re-check the sheet before writing it anew.
+    """
 
-class DataManager:
     def __init__(self):
-        # Authenticate with Google Sheets
-        self.scope = ["https://spreadsheets.google.com/feeds", 'https://www.googleapis.com/auth/spreadsheets',
-                 "https://www.googleapis.com/auth/drive.file", "https://www.googleapis.com/auth/drive"]
-        
+        self._cells = OrderedDict()  # title -> {row: {col: value}}
+        self._appends = OrderedDict()  # title -> (worksheet, [(values, on_done)])
+        self._worksheets = {}
+
+    def __len__(self):
+        return sum(len(rows) for rows in self._cells.values()) + \
+            sum(len(items) for _, items in self._appends.values())
+
+    def set_cells(self, worksheet, row, values_by_col):
+        """Queues cell writes on one row: {col (1-based): value}."""
+        self._worksheets[worksheet.title] = worksheet
+        row_cells = self._cells.setdefault(worksheet.title, {}).setdefault(row, {})
+        row_cells.update(values_by_col)
+
+    def append(self, worksheet, values, on_done=None):
+        """Queues a new row; on_done(row_number) is called once it is written."""
+        _, items = self._appends.setdefault(worksheet.title, (worksheet, []))
+        items.append((values, on_done))
+        return values
+
+    @staticmethod
+    def _row_ranges(title, row, cells):
+        """Splits the cells of one row into contiguous A1 ranges."""
+        ranges = []
+        cols = sorted(cells)
+        start = prev = cols[0]
+        for col in cols[1:] + [None]:
+            if col is not None and col == prev + 1:
+                prev = col
+                continue
+            a1 = f"{gspread.utils.rowcol_to_a1(row, start)}:{gspread.utils.rowcol_to_a1(row, prev)}"
+            ranges.append({
+                "range": gspread.utils.absolute_range_name(title, a1),
+                "values": [[cells[c] for c in range(start, prev + 1)]],
+            })
+            start = prev = col
+        return ranges
+
+    def flush(self, spreadsheet):
+        """Sends every pending write. Returns the failures, one dict per row."""
+        cells, appends = self._cells, self._appends
+        self._cells, self._appends = OrderedDict(), OrderedDict()
+        failures = []
+
+        data = []
+        for title, rows in cells.items():
+            for row, row_cells in rows.items():
+                data.extend((title, row, r) for r in self._row_ranges(title, row, row_cells))
+        if data:
+            try:
+                spreadsheet.values_batch_update(body={
+                    "valueInputOption": "RAW",
+                    "data": [r for _, _, r in data],
+                })
+            except Exception:
+                # Replay range by range so the caller knows exactly which rows failed
+                for title, row, r in data:
+                    try:
+                        self._worksheets[title].update(range_name=r["range"].split("!", 1)[1], values=r["values"])
+                    except Exception as e:
+                        failures.append({"sheet": title, "row": row, "error": str(e)})
+
+        for title, (worksheet, items) in appends.items():
+            try:
+                response = worksheet.append_rows([values for values, _ in items])
+                first_row = _appended_row_number(response)
+                for i, (_, on_done) in enumerate(items):
+                    if on_done:
+                        on_done(first_row + i if first_row else None)
+            except Exception as e:
+                # Appending row by row could duplicate rows the failed call did write: every row
+                # is reported, and the cached copy invalidated so a retry reads the sheet again
+                for values, _ in items:
+                    failures.append({"sheet": title, "row": None, "values": values, "error": str(e)})
+        return failures
+
+
+def name_key(name):
+    """Key identifying an employee by name in every backend: case, spacing and accents ignored."""
+    return fold_text(normalize_name(name))
+
+
+class MovementIndex:
+    """Hash indexes over the Mouvements frame, by employee.
+
+    Rows linked to an employee are keyed by its id ("ID Employé"), the
+    others (not migrated yet, unknown employee) by name_key():
+    - (employee key, date) -> sheet row number (header is row 1)
+    - employee key -> row positions in the frame
+    """
+
+    def __init__(self, df):
+        self.by_employee_date = {}
+        self.by_employee = {}
+        if "Nom et Prenoms" in df.columns and "Date" in df.columns:
+            ids = df[EMPLOYEE_ID_COLUMN].tolist() if EMPLOYEE_ID_COLUMN in df.columns else [None] * len(df)
+            for pos, (name, date_val, employee_id) in enumerate(
+                    zip(df["Nom et Prenoms"].tolist(), df["Date"].tolist(), ids)):
+                self.add(pos, name, date_val, employee_id)
+
+    @staticmethod
+    def employee_key(name, employee_id=None):
+        """Integer employee id when the row is linked, name_key() otherwise."""
+        try:
+            return int(employee_id)
+        except (TypeError, ValueError):
+            return name_key(name)
+
+    def add(self, pos, name, date_val, employee_id=None):
+        """Registers the row at frame position pos."""
+        key = self.employee_key(name, employee_id)
+        self.by_employee.setdefault(key, []).append(pos)
+        # Keep the first occurrence, like the former boolean mask lookup
+        self.by_employee_date.setdefault((key, str(date_val).strip()), pos + 2)
+
+    def row_for(self, name, date_val, employee_id=None):
+        """Sheet row number of an employee's movement on a date, or None.
+
+        Looks up the linked rows of employee_id first, then unlinked rows by name.
+        """
+        date_key = str(date_val).strip()
+        if employee_id is not None:
+            row = self.by_employee_date.get((employee_id, date_key))
+            if row is not None:
+                return row
+        return self.by_employee_date.get((name_key(name), date_key))
+
+    def positions_for(self, name, employee_id=None):
+        """Frame positions of every row of an employee (linked to employee_id, or unlinked under name)."""
+        positions = list(self.by_employee.get(name_key(name), []))
+        if employee_id is not None:
+            positions = sorted(positions + self.by_employee.get(employee_id, []))
+        return positions
+
+
+def month_of(value):
+    """(year, month) of a date object or date string (stored or dd/mm/yyyy), None when unreadable."""
+    if hasattr(value, "year") and hasattr(value, "month"):
+        return value.year, value.month
+    stored = to_sheet_date(value)
+    if stored is None:
+        return None
+    return int(stored[:4]), int(stored[5:7])
+
+
+def in_months(value, start=None, end=None):
+    """True when the month of a date lies in the months of [start, end] (None: unbounded)."""
+    month = month_of(value)
+    if month is None:
+        return False
+    return (start is None or month >= month_of(start)) and (end is None or month <= month_of(end))
+
+
+def partition_title(month):
+    """Worksheet of the movements of a (year, month)."""
+    return f"{PARTITION_PREFIX}{month[0]:04d}_{month[1]:02d}"
+
+
+def partition_month(title):
+    """(year, month) of a partition worksheet title, None for any other sheet."""
+    match = re.fullmatch(re.escape(PARTITION_PREFIX) + r"(\d{4})_(\d{2})", title)
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+class PartitionCatalog:
+    """Mouvements worksheets of the spreadsheet, oldest first.
+
+    Either the single legacy "Mouvements" sheet, or one "Mouvements_YYYY_MM"
+    sheet per month holding at least one movement. Month sheets found next to
+    the legacy sheet belong to a split in progress and are ignored.
+    """
+
+    def __init__(self, titles):
+        titles = list(titles)
+        self.legacy = MOVEMENTS_SHEET in titles
+        self.months = [] if self.legacy else sorted(m for m in map(partition_month, titles) if m)
+
+    def __len__(self):
+        return 1 if self.legacy else len(self.months)
+
+    def titles(self, start=None, end=None):
+        """Worksheets holding the movements of [start, end] (dates, None: unbounded)."""
+        if self.legacy:
+            return [MOVEMENTS_SHEET]
+        first = month_of(start) if start is not None else None
+        last = month_of(end) if end is not None else None
+        return [partition_title(m) for m in self.months
+                if (first is None or m >= first) and (last is None or m <= last)]
+
+    def title_for(self, date_val):
+        """Worksheet a movement of date_val belongs to (whether it exists yet or not)."""
+        if self.legacy:
+            return MOVEMENTS_SHEET
+        month = month_of(date_val)
+        if month is None:
+            raise ValueError(f"Date invalide : {date_val}")
+        return partition_title(month)
+
+    def add(self, title):
+        """Registers a month sheet just created."""
+        month = partition_month(title)
+        if month and not self.legacy and month not in self.months:
+            insort(self.months, month)
+
+
+class PersonnelDirectory:
+    """Lookups over one personnel frame, resolved once.
+
+    The name/sex/service columns are found once (headers containing "nom",
+    "sexe"/"genre", "service"/"département"), and the dropdown lists are
+    sorted up front. A name resolves to the row holding it exactly, else to
+    the only row with the same name regardless of accents, case and spacing;
+    homonyms ("KONÉ Awa" / "KONE Awa") are never resolved from a variant.
+    Build a new directory whenever the frame is reloaded.
+    """
+
+    def __init__(self, df):
+        self.source = df
+        cols = df.columns.tolist()
+        self.id_col = next((c for c in cols if "ordre" in c.lower()), None)
+        self.name_col = next((c for c in cols if "nom" in c.lower()), None)
+        self.sex_col = next((c for c in cols if "sexe" in c.lower() or "genre" in c.lower()), None)
+        self.service_col = next((c for c in cols if "service" in c.lower() or "département" in c.lower()), None)
+        self._records = {}
+        self._positions = {}
+        self._folded = {}
+        self.names_by_id = {}
+        names, services = set(), set()
+        if self.name_col and not df.empty:
+            for pos, record in enumerate(df.to_dict("records")):
+                name = record.get(self.name_col)
+                if name is None or pd.isna(name) or not str(name).strip():
+                    continue
+                names.add(str(name))
+                exact = str(name).strip()
+                # Keep the first occurrence of an exact name, like the former boolean mask lookup
+                if exact not in self._records:
+                    self._records[exact] = record
+                    self._positions[exact] = pos
+                self._folded.setdefault(self.key(name), []).append((pos, exact))
+                employee_id = self._as_id(record.get(self.id_col)) if self.id_col else None
+                if employee_id is not None:
+                    self.names_by_id.setdefault(employee_id, str(name))
+                if self.service_col and str(record.get(self.service_col) or "").strip():
+                    services.add(str(record[self.service_col]))
+        self.names = sorted(names)
+        self.services = sorted(services)
+
+    @staticmethod
+    def key(name):
+        return name_key(name)
+
+    def __len__(self):
+        return len(self.source)
+
+    def homonyms(self, name):
+        """[(row position, stored name)] of the rows equal to name regardless of accents, case and spacing."""
+        if not name:
+            return []
+        return list(self._folded.get(self.key(name), ()))
+
+    def resolve(self, name):
+        """Stored name an employee name refers to: the exact one, else the only matching row; None when unknown or ambiguous."""
+        if not name:
+            return None
+        exact = str(name).strip()
+        if exact in self._records:
+            return exact
+        matches = self._folded.get(self.key(name), ())
+        return matches[0][1] if len(matches) == 1 else None
+
+    def ambiguous(self, name):
+        """Rows a name matches only loosely, when there are several of them ([] when resolvable or unknown)."""
+        matches = self.homonyms(name)
+        return matches if len(matches) > 1 and self.resolve(name) is None else []
+
+    def ambiguity_error(self, names):
+        """Refusal message for the first name matching several rows but none exactly, or None."""
+        for name in names:
+            rows = self.ambiguous(name)
+            if rows:
+                listed = ", ".join(f"{stored} (ligne {pos + 2})" for pos, stored in rows)
+                return f"Nom ambigu : '{name}' correspond à plusieurs employés ({listed}). Saisissez le nom exact."
+        return None
+
+    def get(self, name):
+        """Personnel record (column -> value) of an employee, or None."""
+        stored = self.resolve(name)
+        return self._records[stored] if stored is not None else None
+
+    def position(self, name):
+        """Row position of an employee in the frame (sheet row - 2), or None."""
+        stored = self.resolve(name)
+        return self._positions[stored] if stored is not None else None
+
+    @staticmethod
+    def _as_id(value):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+    def id_of(self, name):
+        """Personnel "N° ordre" of an employee, or None when unknown."""
+        record = self.get(name)
+        if record is None or not self.id_col:
+            return None
+        return self._as_id(record.get(self.id_col))
+
+    def staff(self, service):
+        """Sorted names of the employees of a service."""
+        return [name for name in self.names if str(self.info(name)[1] or "") == service]
+
+    def info(self, name):
+        """(sex, service) of an employee, (None, None) when unknown."""
+        record = self.get(name)
+        if record is None:
+            return None, None
+        sex = record.get(self.sex_col) if self.sex_col else None
+        service = record.get(self.service_col) if self.service_col else None
+        return sex, service
+
+
+def _set_row(df, idx, changes):
+    """Cache patch: overwrites some columns of one row."""
+    return _set_rows(df, {idx: changes})
+
+
+def _set_rows(df, changes_by_idx):
+    """Cache patch: overwrites some columns of several rows ({index: {column: value}})."""
+    df = df.copy()
+    for idx, changes in changes_by_idx.items():
+        for col, value in changes.items():
+            if col in df.columns:
+                try:
+                    df.at[idx, col] = value
+                except (TypeError, ValueError):
+                    # e.g. text written into a column the loader inferred as numeric
+                    df[col] = df[col].astype(object)
+                    df.at[idx, col] = value
+    return df
+
+
+def _row_blocks(rows):
+    """Sorted row numbers -> [(first, last)] runs of consecutive rows."""
+    blocks = []
+    for row in rows:
+        if blocks and row == blocks[-1][1] + 1:
+            blocks[-1][1] = row
+        else:
+            blocks.append([row, row])
+    return [tuple(block) for block in blocks]
+
+
+def _set_positions(df, positions, col, value):
+    """Cache patch: writes one value in one column at some row positions."""
+    df = df.copy()
+    if col in df.columns and positions:
+        df.iloc[positions, df.columns.get_loc(col)] = value
+    return df
+
+
+def _last_column(df):
+    """A1 letter of the last column of a frame read from a sheet."""
+    return re.sub(r"\d", "", gspread.utils.rowcol_to_a1(1, max(1, len(df.columns))))
+
+
+def _concat_partitions(frames):
+    """One frame of partition frames, positions running across them (always a new frame)."""
+    filled = [df for df in frames if len(df)]
+    if len(filled) > 1:
+        return pd.concat(filled, ignore_index=True)
+    if filled or frames:
+        return (filled or frames)[0].copy()
+    return pd.DataFrame(columns=MOUVEMENTS_COLUMNS)
+
+
+def _month_mask(df, start=None, end=None):
+    """Boolean mask of the rows of a movements frame dated in the months of [start, end]."""
+    # Stored dates sort as text: "yyyy-mm" prefixes compare like the months
+    months = df["Date"].astype(str).str[:7]
+    mask = months.str.fullmatch(r"\d{4}-\d{2}")
+    if start is not None:
+        mask &= months >= "%04d-%02d" % month_of(start)
+    if end is not None:
+        mask &= months <= "%04d-%02d" % month_of(end)
+    return mask
+
+
+def _stored_dates(df):
+    """Sheet frame with its dates in stored form: rows not migrated yet (dd/mm/yyyy) are converted on read."""
+    if "Date" in df.columns and not df.empty:
+        df["Date"] = to_sheet_dates(df["Date"])
+    return df
+
+
+def join_employee_names(df, directory):
+    """Read-time join: current personnel name of every movement linked by "ID Employé".
+
+    Unlinked rows, and rows of deleted employees, keep the name stored in the sheet.
+    """
+    if df.empty or EMPLOYEE_ID_COLUMN not in df.columns or "Nom et Prenoms" not in df.columns \
+            or not directory.names_by_id:
+        return df
+    ids = pd.to_numeric(df[EMPLOYEE_ID_COLUMN], errors="coerce")
+    current = ids.map(directory.names_by_id)
+    linked = current.notna().to_numpy()
+    if linked.any():
+        df = df.copy()
+        df.loc[linked, "Nom et Prenoms"] = current[linked]
+    return df
+
+
+@profile_methods
+class BaseDataManager(ABC):
+    """Storage surface used by the views, implemented by every backend.
+
+    - DataManager: Google Sheets (default)
+    - database_sqlite.SQLiteDataManager: local SQLite file
+
+    Abstract methods must all be implemented: a backend missing one cannot
+    be instantiated. Backends also provide _lock, a threading.RLock taken by
+    their writes, and _memo_lock, a threading.Lock guarding the memoized
+    structures (held for bookkeeping only, never across a load or a build).
+    """
+
+    @abstractmethod
+    def load_data(self, refresh=False, start=None, end=None):
+        """Movements; with start/end (dates), only those of the months overlapping [start, end]."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def load_personnel(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def load_services(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_service_ref(self, service_name):
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_services(self, service_names):
+        """Adds several services to the reference list at once, skipping the ones already known."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_employee(self, name, sexe, service, original_name=None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_history_name(self, old_name, new_name):
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_employee(self, name):
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_employees(self, employees):
+        """Adds several employees [(name, sexe, service)] at once, skipping the names already known."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_employees(self, names, sexe=None, service=None):
+        """Sets the sex and/or service (None: unchanged) of several employees at once."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_employees(self, names):
+        """Deletes several employees at once."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def upsert_entry(self, date_val, name, gender, service, arrival_time, departure_time):
+        raise NotImplementedError
+
+    @abstractmethod
+    def upsert_entries(self, entries):
+        """Adds or updates several movements [(date, name, arrival, departure)] at once.
+
+        Sex and service come from the personnel base; an empty departure keeps
+        the one already recorded.
+        """
+        raise NotImplementedError
+
+    def personnel_directory(self):
+        """PersonnelDirectory of the personnel base."""
+        return PersonnelDirectory(self.load_personnel())
+
+    @abstractmethod
+    def get_entry_for_today(self, name, date_val):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_rows_for_name(self, name, start=None, end=None):
+        """Positions in load_data(start=start, end=end) of every movement of an employee."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def migrate_employee_ids(self):
+        """Links existing movements to their employee ("ID Employé"). Returns (success, message)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def migrate_dates(self):
+        """Rewrites the dd/mm/yyyy dates of existing movements as stored dates (yyyy-mm-dd). Returns (success, message)."""
+        raise NotImplementedError
+
+    def load_latest(self, n=5):
+        """Last n movements in storage order."""
+        return self.load_data().tail(n)
+
+    def data_version(self, start=None, end=None):
+        """Token that changes whenever load_data(start=start, end=end) would return different rows (None: unknown)."""
+        return None
+
+    def _memoized(self, name, build, start=None, end=None):
+        """Structure derived from the movements, rebuilt once per data version.
+
+        Ranged structures cover whole months: they are keyed by the months of
+        [start, end], and the RANGE_MEMOS most recently used are kept apart
+        from the full history, so a dashboard range does not evict the other views.
+
+        Reads never wait for a write: the version is taken and the structure
+        built outside the manager lock, and the result is published only if
+        no write advanced the memo meanwhile (it is still returned otherwise).
+        """
+        # May reload expired partitions: outside every lock
+        current = self.data_version() if start is None and end is None else self.data_version(start, end)
+        with self._memo_lock:
+            memos = self.__dict__.setdefault("_memos", {})
+            if start is not None or end is not None:
+                ranges = self.__dict__.setdefault("_range_memos", OrderedDict())
+                name = f"{name}:{month_of(start) if start is not None else ''}-{month_of(end) if end is not None else ''}"
+                ranges[name] = (start, end)
+                ranges.move_to_end(name)
+                while len(ranges) > RANGE_MEMOS:
+                    memos.pop(ranges.popitem(last=False)[0], None)
+            seen = memos.get(name)
+            if current is not None and seen is not None and seen[0] == current:
+                return seen[1]
+            # Full builds per structure, e.g. to check that writes advance memos instead
+            self.__dict__.setdefault("memo_builds", Counter())[name.split(":")[0]] += 1
+        memo = (current, build())
+        with self._memo_lock:
+            if memos.get(name) is seen:
+                memos[name] = memo
+        return memo[1]
+
+    def _advance_memo(self, name, before, after, update):
+        """Applies a write to a derived structure if it was current before the write.
+
+        before/after are full data versions. Every memo of the structure is
+        advanced, ranged ones ("name:<months>") included: update(value, in_range)
+        gets a predicate telling whether a written date lies in the memo's months.
+        """
+        memos = self.__dict__.get("_memos", {})
+        with self._memo_lock:
+            ranges = dict(self.__dict__.get("_range_memos", {}))
+            keys = [key for key in memos if key == name or key.startswith(f"{name}:")]
+        # Range versions may re-read the catalog: computed before taking the memo lock
+        spans = {}
+        for key in keys:
+            if key in ranges:
+                start, end = ranges[key]
+                spans[key] = (self._range_version(before, start, end), self._range_version(after, start, end),
+                              lambda date_val, start=start, end=end: in_months(date_val, start, end))
+            else:
+                spans[key] = (before, after, lambda date_val: True)
+        with self._memo_lock:
+            for key, (memo_before, memo_after, in_range) in spans.items():
+                memo = memos.get(key)
+                if memo is not None and memo[0] == memo_before and memo_before != memo_after:
+                    update(memo[1], in_range)
+                    # New tuple: a read building meanwhile sees the memo moved and does not publish
+                    memos[key] = (memo_after, memo[1])
+
+    def _range_version(self, version, start=None, end=None):
+        """data_version(start, end) derived from a full data version (same token unless the backend versions months)."""
+        return version
+
+    def load_typed(self, start=None, end=None):
+        """Mouvements with typed columns (see schema.py), rebuilt once per data version.
+
+        Dates are datetime64, times minutes since midnight, names/services
+        categoricals. Positions match load_data(start=start, end=end). Shared: do not mutate.
+        """
+        return self._memoized("typed", lambda: typed_frame(self.load_data(start=start, end=end)), start, end)
+
+    def load_rollups(self, start=None, end=None):
+        """Per-day × service counts and distinct employees, rebuilt once per data version.
+
+        With start/end, only the months overlapping [start, end] are read.
+        """
+        return self._memoized("rollups", lambda: DailyRollup.from_frame(self.load_typed(start, end)), start, end)
+
+    def load_date_index(self, start=None, end=None):
+        """DateIndex of load_typed(start, end): positions of a date range by binary search."""
+        return self._memoized("dates", lambda: DateIndex(
+            self.load_typed(start, end).get("Date", pd.Series(dtype="datetime64[ns]"))), start, end)
+
+    def load_timesheet(self, start=None, end=None):
+        """Timesheet (see timesheet.py) of load_typed(start, end) against the [schedule] working day."""
+        schedule = work_schedule()
+        return self._memoized(f"timesheet{schedule}", lambda: Timesheet.from_frame(
+            self.load_typed(start, end), schedule), start, end)
+
+    def load_search_index(self):
+        """Search index over load_data() rows (dates as displayed), rebuilt once per data version."""
+        return self._memoized("search", lambda: SearchIndex(display_frame(self.load_data())))
+
+    def _rollups_written(self, before, after, date_val, name, service):
+        def apply(rollup, in_range):
+            if in_range(date_val):
+                rollup.apply(date_val, name, service)
+        self._advance_memo("rollups", before, after, apply)
+
+    @contextmanager
+    def batch(self):
+        """Groups the writes of several operations (no-op unless the backend buffers writes)."""
+        yield self
+
+    def flush_writes(self):
+        return []
+
+    def ensure_connected(self):
+        """Returns True when the backend can take writes (reconnecting if needed)."""
+        return True
+
+
+def create_data_manager():
+    """Builds the storage backend selected in secrets.toml ([storage] backend)."""
+    backend = get_setting("storage", "backend", DEFAULT_BACKEND)
+    if backend == "sqlite":
+        from database_sqlite import SQLiteDataManager
+        return SQLiteDataManager(get_setting("storage", "sqlite_path", SQLITE_DEFAULT_PATH))
+    if get_setting("journal", "enabled", True):
+        # Google Sheets writes go through the local write-ahead journal
+        from journal import JournaledDataManager
+        return JournaledDataManager(DataManager())
+    return DataManager()
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at capacity tokens per period."""
+
+    def __init__(self, capacity, period=60.0):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = float(capacity)
+        self._last = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def try_take(self, reserve=0.0):
+        """Takes a token if more than reserve would remain; else returns the seconds to wait."""
+        self._refill()
+        if self.tokens - 1 >= reserve:
+            self.tokens -= 1
+            return 0.0
+        return (reserve + 1 - self.tokens) / self.rate
+
+    def remaining(self):
+        self._refill()
+        return int(self.tokens)
+
+
+class RequestScheduler:
+    """Quota-aware gate for every Google Sheets request.
+
+    Reads and writes have separate token buckets (the Sheets API has separate
+    per-minute quotas). Low priority calls (dashboard reads, background
+    refreshes) leave LOW_PRIORITY_RESERVE of each bucket to interactive calls.
+    429 answers are retried with exponential backoff and jitter; 5xx answers
+    and timeouts only for idempotent calls, as the request may have been applied.
+    """
+
+    def __init__(self, read_per_minute=QUOTA_READS_PER_MINUTE, write_per_minute=QUOTA_WRITES_PER_MINUTE,
+                 max_retries=MAX_RETRIES):
+        self.buckets = {"read": TokenBucket(read_per_minute), "write": TokenBucket(write_per_minute)}
+        self.max_retries = max_retries
+        self.metrics = {kind: {"calls": 0, "retries": 0, "throttled_s": 0.0, "errors": 0}
+                        for kind in self.buckets}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def interactive(self):
+        """Marks the calls made by this thread inside the block as interactive (high priority)."""
+        previous = getattr(self._local, "interactive", False)
+        self._local.interactive = True
+        try:
+            yield
+        finally:
+            self._local.interactive = previous
+
+    def _acquire(self, kind):
+        bucket = self.buckets[kind]
+        # Writes are user saves by default; reads are interactive only inside interactive()
+        high = kind == "write" or getattr(self._local, "interactive", False)
+        reserve = 0.0 if high else bucket.capacity * LOW_PRIORITY_RESERVE
+        while True:
+            with self._lock:
+                wait = bucket.try_take(reserve)
+                if not wait:
+                    self.metrics[kind]["calls"] += 1
+                    return
+                self.metrics[kind]["throttled_s"] += min(wait, 1.0)
+            time.sleep(min(wait, 1.0))
+
+    @staticmethod
+    def _retry_delay(exc, attempt, idempotent=True):
+        """Seconds before the next attempt, or None if exc is not worth retrying."""
+        response = getattr(exc, "response", None)
+        status = getattr(response, "status_code", None)
+        if isinstance(exc, (ConnectionError, TimeoutError)) or type(exc).__name__ in ("ConnectionError", "Timeout"):
+            status = 503
+        if status != 429 and not (idempotent and status and 500 <= status < 600):
+            return None
+        retry_after = getattr(response, "headers", {}).get("Retry-After") if response is not None else None
+        if retry_after and str(retry_after).isdigit():
+            return float(retry_after)
+        return min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt) + random.uniform(0, 1)
+
+    def call(self, kind, func, *args, idempotent=True, **kwargs):
+        """Runs one API call within the quota, retrying throttled or failed attempts.
+
+        idempotent=False (appends, row deletions...): only 429 refusals are
+        retried, a 5xx or a timeout is raised to the caller.
+        """
+        attempt = 0
+        while True:
+            self._acquire(kind)
+            try:
+                result = func(*args, **kwargs)
+                record_api_call(result)
+                return result
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, idempotent)
+                if delay is None or attempt >= self.max_retries:
+                    self.metrics[kind]["errors"] += 1
+                    raise
+                self.metrics[kind]["retries"] += 1
+                attempt += 1
+                time.sleep(delay)
+
+    def stats(self):
+        """Remaining budget and counters per kind of request."""
+        with self._lock:
+            return {kind: dict(self.metrics[kind], remaining=bucket.remaining(), capacity=bucket.capacity)
+                    for kind, bucket in self.buckets.items()}
+
+
+# gspread methods that count against the write quota (everything else is a read)
+WRITE_METHOD_PREFIXES = ("update", "batch_update", "values_update", "values_batch_update", "values_append",
+                         "append", "insert", "delete", "del_", "clear", "add_", "resize")
+# Writes giving the same result when sent twice: retried after a 5xx or a timeout like reads.
+# Appends, insertions, deletions and structural batch updates are not
+IDEMPOTENT_WRITE_PREFIXES = ("update", "values_update", "values_batch_update", "clear", "resize")
+
+
+class ScheduledProxy:
+    """Wraps a gspread Spreadsheet/Worksheet so every method call goes through the scheduler."""
+
+    def __init__(self, target, scheduler):
+        self._target = target
+        self._scheduler = scheduler
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+        kind = "write" if name.startswith(WRITE_METHOD_PREFIXES) else "read"
+        idempotent = kind == "read" or name.startswith(IDEMPOTENT_WRITE_PREFIXES)
+
+        def scheduled(*args, **kwargs):
+            return self._scheduler.call(kind, attr, *args, idempotent=idempotent, **kwargs)
+        return scheduled
+
+
+def _interactive(method):
+    """Runs a DataManager method with interactive priority for its Sheets reads."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.pool.scheduler.interactive():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _locked(method):
+    """Runs a DataManager write under the manager lock (script thread, writer and replayer share it)."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def max_id(df):
+    """Highest numeric "N° ordre" of a frame (0 if none)."""
+    if df.empty or "N° ordre" not in df.columns:
+        return 0
+    value = pd.to_numeric(df["N° ordre"], errors='coerce').max()
+    return int(value) if pd.notna(value) else 0
+
+
+class IdAllocator:
+    """Unique "N° ordre" values without reading the data sheet, handed out in blocks.
+
+    Each block reservation is a row appended to a dedicated worksheet
+    ("_seq_<sheet>"). Sheets serializes appends, so the row number of a
+    reservation is unique across processes and defines its block:
+    ids base + k*block + 1 .. base + (k+1)*block for the k-th reservation.
+    Row 1 stores the base (max id when the sequence was created) and the
+    block size. Ids left in a block when the process stops are skipped.
+    """
+
+    def __init__(self, pool, sheet_name, block_size=ID_BLOCK_SIZE):
+        self.pool = pool
+        self.title = f"_seq_{sheet_name}"
+        self.block_size = block_size
+        self.base = None
+        self._next = self._end = 0
+        self._lock = threading.Lock()
+
+    def next_id(self, floor_loader):
+        """Returns a fresh id. floor_loader() gives the current max id, only called once ever."""
+        return self.next_ids(1, floor_loader)[0]
+
+    def next_ids(self, count, floor_loader):
+        """Returns count fresh ids, reserving all the blocks still needed in one request."""
+        with self._lock:
+            ids = list(range(self._next, min(self._end, self._next + count)))
+            self._next += len(ids)
+            missing = count - len(ids)
+            if missing > 0:
+                self._reserve(floor_loader, blocks=-(-missing // self.block_size))
+                ids += range(self._next, self._next + missing)
+                self._next += missing
+            return ids
+
+    def _sequence_sheet(self, floor_loader):
+        try:
+            worksheet = self.pool.worksheet(self.title)
+        except gspread.WorksheetNotFound:
+            # One-time migration: continue after the ids already in the sheet
+            base = floor_loader()
+            try:
+                worksheet = self.pool.add_worksheet(title=self.title, rows="1", cols="4")
+            except gspread.exceptions.APIError:
+                # Created meanwhile by another process: follow its header
+                worksheet = self.pool.worksheet(self.title)
+            else:
+                self.base = base
+                worksheet.update(range_name="A1:D1", values=[["Base", self.base, "Bloc", self.block_size]])
+                return worksheet
+        self.base, self.block_size = self._read_header(worksheet)
+        return worksheet
+
+    @staticmethod
+    def _read_header(worksheet):
+        """(base, block size) of a sequence sheet, waiting for a creator that has not written them yet."""
+        for attempt in range(MAX_RETRIES):
+            header = worksheet.row_values(1)
+            if len(header) >= 4:
+                return int(header[1]), int(header[3])
+            time.sleep(min(BACKOFF_BASE_SECONDS * 2 ** attempt, BACKOFF_MAX_SECONDS))
+        raise RuntimeError("Réservation d'identifiants impossible")
+
+    def _reserve(self, floor_loader, blocks=1):
+        """Reserves consecutive blocks (one appended row each, in a single append)."""
+        worksheet = self._sequence_sheet(floor_loader)
+        stamp = [time.strftime("%Y-%m-%d %H:%M:%S"), f"{socket.gethostname()}:{os.getpid()}"]
+        if blocks == 1:
+            response = worksheet.append_row(stamp)
+        else:
+            response = worksheet.append_rows([stamp] * blocks)
+        row_num = _appended_row_number(response)
+        if row_num is None:
+            raise RuntimeError("Réservation d'identifiants impossible")
+        start = self.base + (row_num - 2) * self.block_size + 1
+        self._next, self._end = start, start + blocks * self.block_size
+
+
+class SheetsConnectionPool:
+    """Process-wide Google Sheets connection shared by every session.
+
+    Holds the authorized client, the opened spreadsheet and its worksheet
+    handles, so a new browser session costs no authentication, Drive search
+    or worksheet metadata request. Expired tokens are renewed by reopening the
+    spreadsheet by key; invalidate() forces a full reconnect after a failure.
+    """
+
+    def __init__(self, scope=SHEETS_SCOPE, sheet_name=SPREADSHEET_NAME, spreadsheet=None, scheduler=None):
+        self.scope = scope
+        self.sheet_name = sheet_name
+        self.scheduler = scheduler or RequestScheduler(
+            read_per_minute=get_setting("quota", "read_per_minute", QUOTA_READS_PER_MINUTE),
+            write_per_minute=get_setting("quota", "write_per_minute", QUOTA_WRITES_PER_MINUTE),
+        )
         self.creds = None
         self.client = None
-        self.sheet = None
+        self.spreadsheet = spreadsheet
+        self._static = spreadsheet is not None  # injected spreadsheet (offline tools), never reconnected
+        self._worksheets = {}
+        self._allocators = {}
+        self._lock = threading.RLock()
+
+    def id_allocator(self, sheet_name):
+        """Process-wide id allocator of a sheet."""
+        with self._lock:
+            if sheet_name not in self._allocators:
+                self._allocators[sheet_name] = IdAllocator(
+                    self, sheet_name, block_size=get_setting("ids", "block_size", ID_BLOCK_SIZE))
+            return self._allocators[sheet_name]
+
+    def connect(self):
+        """Opens the spreadsheet if needed. Returns an error message, or None when connected."""
+        with self._lock:
+            self._refresh_if_expired()
+            if self.spreadsheet is not None:
+                return None
+            try:
+                if "gcp_service_account" in st.secrets:
+                    # Load from secrets.toml
+                    creds_dict = dict(st.secrets["gcp_service_account"])
+                    self.creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, self.scope)
+                else:
+                    # Fallback or error if not configured
+                    return "⚠️ Secrets Google Sheets non configurés ! Ajoutez [gcp_service_account] dans .streamlit/secrets.toml"
+
+                self.client = gspread.authorize(self.creds)
+
+                # We assume a single Spreadsheet with the movement tabs, "Personnel" and "Services"
+                try:
+                    self.spreadsheet = self.scheduler.call("read", self.client.open, self.sheet_name)
+                except gspread.SpreadsheetNotFound:
+                    return f"❌ Impossible de trouver le Google Sheet nommé '{self.sheet_name}'. Veuillez le créer et le partager avec l'email du service account."
+            except Exception as e:
+                return f"Erreur de connexion Google Sheets : {e}"
+            return None
+
+    def _refresh_if_expired(self):
+        """Renews the client when the OAuth token expired (reopens by key: no Drive search)."""
+        if self._static or self.spreadsheet is None or self.creds is None:
+            return
+        if not getattr(self.creds, "access_token", None) or not getattr(self.creds, "access_token_expired", False):
+            return
+        try:
+            key = self.spreadsheet.id
+            self.client = gspread.authorize(self.creds)
+            self.spreadsheet = self.scheduler.call("read", self.client.open_by_key, key)
+            self._worksheets = {}
+        except Exception:
+            self.invalidate()
+
+    def current(self):
+        """The opened spreadsheet (scheduled), or None (no connection attempt)."""
+        with self._lock:
+            self._refresh_if_expired()
+            if self.spreadsheet is None:
+                return None
+            return ScheduledProxy(self.spreadsheet, self.scheduler)
+
+    def _fetch_worksheets(self):
+        self._worksheets = {
+            ws.title: ScheduledProxy(ws, self.scheduler)
+            for ws in self.scheduler.call("read", self.spreadsheet.worksheets)
+        }
+
+    def worksheet(self, title):
+        """Cached worksheet handle; all handles are fetched with a single metadata request."""
+        with self._lock:
+            handle = self._worksheets.get(title)
+            if handle is None:
+                self._fetch_worksheets()
+                handle = self._worksheets.get(title)
+                if handle is None:
+                    raise gspread.WorksheetNotFound(title)
+            return handle
+
+    def titles(self, refresh=False):
+        """Worksheet titles, from the cached handles unless refresh (one metadata request)."""
+        with self._lock:
+            if refresh or not self._worksheets:
+                self._fetch_worksheets()
+            return list(self._worksheets)
+
+    def add_worksheet(self, title, rows, cols):
+        with self._lock:
+            handle = ScheduledProxy(
+                self.scheduler.call("write", self.spreadsheet.add_worksheet, title=title, rows=rows, cols=cols,
+                                    idempotent=False),
+                self.scheduler,
+            )
+            self._worksheets[title] = handle
+            return handle
+
+    def report_error(self, exc):
+        """Reconnects on the next call when exc looks like an authentication failure."""
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+        if status == 401 or "Refresh" in type(exc).__name__:
+            self.invalidate()
+
+    def invalidate(self):
+        """Drops the connection (or only the handles for an injected spreadsheet)."""
+        with self._lock:
+            self._worksheets = {}
+            if not self._static:
+                self.creds = self.client = self.spreadsheet = None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_connection_pool():
+    """The process-wide Google Sheets connection pool."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SheetsConnectionPool()
+        return _pool
+
+
+@profile_methods
+class DataManager(BaseDataManager):
+    def __init__(self, cache_ttl=None, cache_max_entries=None, pool=None):
+        # Connection, spreadsheet and worksheet handles are shared by every session
+        self.pool = pool or get_connection_pool()
+
+        if cache_ttl is None:
+            cache_ttl = get_setting("cache", "ttl_seconds", CACHE_TTL_SECONDS)
+        if cache_max_entries is None:
+            cache_max_entries = get_setting("cache", "max_entries", CACHE_MAX_ENTRIES)
+        self.cache = SheetCache(ttl=cache_ttl, max_entries=cache_max_entries)
+        # Movement partitions get their own cache: it must hold every month of the history
+        self.movements = SheetCache(ttl=cache_ttl, max_entries=None)
+        self._catalog_state = None  # (loaded at, PartitionCatalog)
+        self._indexes = {}  # partition title -> (cache version, MovementIndex)
+        self._directory = None
+        self._directory_version = None
+        self._last_full_sync = {}  # partition title -> time of its last full read
+        self.last_sync = {}
+        # Writes and batch() blocks run one thread at a time: the buffer, the
+        # pending inserts and the indexes are shared with the background writer
+        self._lock = threading.RLock()
+        self._memo_lock = threading.Lock()
+        self._buffer = WriteBuffer()
+        self._batch_depth = 0
+        self._pending_inserts = {}  # (normalized name, date) -> queued Mouvements row
+        self.last_write_failures = []
         
         self._connect_google_sheets()
 
+    @property
+    def sheet(self):
+        """The shared spreadsheet, or None when not connected."""
+        return self.pool.current()
+
+    def ensure_connected(self):
+        """Retries the connection if the spreadsheet could not be opened earlier."""
+        if not self.sheet:
+            self._connect_google_sheets()
+        return self.sheet is not None
+
     def _connect_google_sheets(self):
-        """Connects to Google Sheets using Streamlit secrets."""
-        try:
-            if "gcp_service_account" in st.secrets:
-                # Load from secrets.toml
-                creds_dict = dict(st.secrets["gcp_service_account"])
-                self.creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, self.scope)
+        """Connects to Google Sheets through the shared pool, reporting errors in the page."""
+        error = self.pool.connect()
+        if error:
+            st.error(error)
+
+    def _catalog(self, refresh=False):
+        """Partition catalog, from the spreadsheet metadata (re-read every FULL_SYNC_SECONDS).
+
+        Months created by this process are added as they are written; those
+        created by another one show up at the next metadata read.
+        """
+        state = self._catalog_state
+        if refresh or state is None or time.monotonic() - state[0] > FULL_SYNC_SECONDS:
+            state = (time.monotonic(), PartitionCatalog(self.pool.titles(refresh=True)))
+            self._catalog_state = state
+        return state[1]
+
+    def _movements_version(self, titles=None):
+        """Cache versions of some partitions (all by default), without reading anything."""
+        if titles is None:
+            titles = self._catalog().titles()
+        return tuple((title, self.movements.version(title)) for title in titles)
+
+    def _range_version(self, version, start=None, end=None):
+        """Part of a _movements_version() covering the partitions of [start, end]."""
+        titles = set(self._catalog().titles(start, end))
+        return tuple(item for item in version if item[0] in titles)
+
+    def _partition_frames(self, titles, refresh=False):
+        """{title: cached frame} of some partitions; missing or expired ones are read in one request.
+
+        An expired copy less than FULL_SYNC_SECONDS old is refreshed by reading
+        only its last SYNC_PROBE_ROWS rows and the rows appended since. Titles
+        without a worksheet (month not started yet) give an empty frame.
+        """
+        catalog = self._catalog()
+        existing = set(catalog.titles())
+        frames, reads = {}, []
+        for title in titles:
+            cached = None if refresh else self.movements.get(title)
+            if cached is not None:
+                frames[title] = cached
+            elif title not in existing:
+                frames[title] = pd.DataFrame(columns=MOUVEMENTS_COLUMNS)
+                self.movements.put(title, frames[title])
             else:
-                # Fallback or error if not configured
-                st.error("⚠️ Secrets Google Sheets non configurés ! Ajoutez [gcp_service_account] dans .streamlit/secrets.toml")
-                return
+                reads.append((title, None if refresh else self._probe_start(title)))
 
-            self.client = gspread.authorize(self.creds)
-            
-            # Open the Spreadsheet (Replace with your actual Sheet Name)
-            # We assume a single Spreadsheet with two tabs: "Mouvements" and "Personnel"
-            sheet_name = "SUIVI_PERSONNEL_DB" # You might want to let user configure this
-            try:
-                self.sheet = self.client.open(sheet_name)
-            except gspread.SpreadsheetNotFound:
-                st.error(f"❌ Impossible de trouver le Google Sheet nommé '{sheet_name}'. Veuillez le créer et le partager avec l'email du service account.")
-                return
+        rows_read, read_count = 0, len(reads)
+        while reads:
+            response = self.sheet.values_batch_get([
+                gspread.utils.absolute_range_name(title, f"A{start + 2}:{_last_column(self.movements.peek(title))}")
+                if start is not None else gspread.utils.absolute_range_name(title)
+                for title, start in reads
+            ])
+            retry = []
+            for (title, start), value_range in zip(reads, response.get("valueRanges", [])):
+                values = value_range.get("values", [])
+                rows_read += len(values)
+                if start is None:
+                    df = _stored_dates(frame_from_values(values))
+                    if df.columns.empty:
+                        df = pd.DataFrame(columns=MOUVEMENTS_COLUMNS)
+                    self._last_full_sync[title] = time.monotonic()
+                else:
+                    stale = self.movements.peek(title)
+                    if len(values) < len(stale) - start:
+                        # Rows were deleted by hand: positions no longer match, read it all again
+                        retry.append((title, None))
+                        continue
+                    tail = _stored_dates(frame_from_values([list(stale.columns)] + values))
+                    df = pd.concat([stale.iloc[:start], tail], ignore_index=True)
+                # Names follow the personnel sheet: re-joined on every (full or tail) reload
+                frames[title] = join_employee_names(df, self.personnel_directory())
+                self.movements.put(title, frames[title])
+            reads = retry
+        if read_count:
+            self.last_sync = {"partitions": read_count, "rows_read": rows_read}
+        return frames
 
-        except Exception as e:
-            st.error(f"Erreur de connexion Google Sheets : {e}")
+    def _probe_start(self, title):
+        """Frame position of the first row re-read by an incremental refresh, None for a full read."""
+        stale = self.movements.peek(title)
+        if stale is None or stale.columns.empty:
+            return None
+        last_full = self._last_full_sync.get(title)
+        if last_full is None or time.monotonic() - last_full > FULL_SYNC_SECONDS:
+            return None
+        return max(0, len(stale) - SYNC_PROBE_ROWS)
 
-    def load_data(self):
-        """Loads movements data from 'Mouvements' worksheet."""
+    def load_data(self, refresh=False, start=None, end=None):
+        """Loads the movements of the months overlapping [start, end] (all by default), from cache when warm."""
         if not self.sheet: return pd.DataFrame()
         try:
-            worksheet = self.sheet.worksheet("Mouvements")
-            data = worksheet.get_all_records()
-            return pd.DataFrame(data)
-        except gspread.WorksheetNotFound:
-            # Create if missing
-            worksheet = self.sheet.add_worksheet(title="Mouvements", rows="1000", cols="20")
-            worksheet.append_row(["N° ordre", "Date", "Nom et Prenoms", "Sexe", "Service", "Heure d'arrivée", "Heure de départ"])
-            return pd.DataFrame(columns=["N° ordre", "Date", "Nom et Prenoms", "Sexe", "Service", "Heure d'arrivée", "Heure de départ"])
+            titles = self._catalog(refresh=refresh).titles(start, end)
+            frames = self._partition_frames(titles, refresh=refresh)
         except Exception as e:
+            self.pool.report_error(e)
             st.error(f"Erreur lecture données: {e}")
             return pd.DataFrame()
+        # Callers mutate the frame (sorting, numeric casts), never hand out a cached copy
+        df = _concat_partitions([frames[title] for title in titles])
+        if self._catalog().legacy and (start is not None or end is not None) and not df.empty:
+            # Single sheet not split yet: same rows as the month sheets would give
+            df = df[_month_mask(df, start, end)].reset_index(drop=True)
+        return df
 
-    def load_personnel(self):
-        """Loads personnel list from 'Personnel' worksheet."""
+    def data_version(self, start=None, end=None):
+        """Versions of the cached partitions of [start, end] (expired ones are reloaded first)."""
+        if not self.sheet: return None
+        titles = self._catalog().titles(start, end)
+        if any(self.movements.get(title) is None for title in titles):
+            self.load_data(start=start, end=end)
+        return self._movements_version(titles)
+
+    def load_latest(self, n=5):
+        """Last n movements in sheet order, reading only the end of the last month(s) when the cache is cold."""
+        if not self.sheet: return pd.DataFrame()
+        try:
+            frames, count = [], 0
+            for title in reversed(self._catalog().titles()):
+                if self.movements.get(title) is not None or self.movements.peek(title) is not None:
+                    # Warm or incrementally refreshable copy
+                    df = self._partition_frames([title])[title].tail(n - count)
+                else:
+                    df = self._read_tail(title, n - count)
+                frames.insert(0, df)
+                count += len(df)
+                if count >= n:
+                    break
+            return _concat_partitions(frames)
+        except Exception:
+            return self.load_data().tail(n)
+
+    def _read_tail(self, title, n):
+        """Last n rows of a partition: one narrow column read to count rows, one range read."""
+        worksheet = self.pool.worksheet(title)
+        total = len(worksheet.col_values(1))
+        if total <= 1:
+            return pd.DataFrame(columns=MOUVEMENTS_COLUMNS)
+        header, values = worksheet.batch_get(["1:1", f"{max(2, total - n + 1)}:{total}"])
+        return join_employee_names(_stored_dates(frame_from_values(header[:1] + values)), self.personnel_directory())
+
+    def load_personnel(self, refresh=False):
+        """Loads personnel list from 'Personnel' worksheet (served from cache when warm)."""
         if not self.sheet: return pd.DataFrame()
+        cached = None if refresh else self.cache.get("Personnel")
+        if cached is not None:
+            return cached.copy()
         try:
-            worksheet = self.sheet.worksheet("Personnel")
+            worksheet = self.pool.worksheet("Personnel")
             data = worksheet.get_all_records()
-            return pd.DataFrame(data)
+            df = pd.DataFrame(data)
         except gspread.WorksheetNotFound:
              # Create if missing
-            worksheet = self.sheet.add_worksheet(title="Personnel", rows="1000", cols="10")
-            worksheet.append_row(["N° ordre", "Nom et Prénoms", "Sexe", "Service"])
-            return pd.DataFrame(columns=["N° ordre", "Nom et Prénoms", "Sexe", "Service"])
-        except Exception:
+            worksheet = self.pool.add_worksheet(title="Personnel", rows="1000", cols="10")
+            worksheet.append_row(PERSONNEL_COLUMNS)
+            df = pd.DataFrame(columns=PERSONNEL_COLUMNS)
+        except Exception as e:
+            self.pool.report_error(e)
             return pd.DataFrame()
+        self.cache.put("Personnel", df)
+        return df.copy()
+
+    def personnel_directory(self):
+        """PersonnelDirectory of the cached personnel frame, rebuilt once per personnel version."""
+        df = self.cache.get("Personnel")
+        if df is None:
+            self.load_personnel()
+            df = self.cache.get("Personnel")
+        if df is None:
+            df = pd.DataFrame()
+        version = self.cache.version("Personnel")
+        if self._directory is None or self._directory_version != version:
+            self._directory = PersonnelDirectory(df)
+            self._directory_version = version
+        return self._directory
 
     def load_services(self):
-        """Loads services list from 'Services' worksheet."""
+        """Loads services list from 'Services' worksheet (served from cache when warm)."""
         if not self.sheet: return []
+        cached = self.cache.get("Services")
+        if cached is not None:
+            return list(cached)
+        services = self._fetch_services()
+        if services:
+            self.cache.put("Services", services)
+        return list(services)
+
+    def _fetch_services(self):
+        """Reads the services reference list from the sheet."""
         try:
-            worksheet = self.sheet.worksheet("Services")
+            worksheet = self.pool.worksheet("Services")
             data = worksheet.get_all_values()
             # Assuming first row is header, or simple list
             # Let's assume simple list column 1, starting row 2 if header
@@ -94,12 +1481,10 @@ class DataManager:
         except gspread.WorksheetNotFound:
             # Create silently
             try:
-                worksheet = self.sheet.add_worksheet(title="Services", rows="100", cols="2")
+                worksheet = self.pool.add_worksheet(title="Services", rows="100", cols="2")
                 worksheet.append_row(["Service"])
                 # Add defaults
-                defaults = ["Prélèvements", "Parc Auto", "Comptabilité Matière", 
-                            "Hygiène Assainissement", "Biologie Moléculaire", 
-                            "Administration"]
+                defaults = list(DEFAULT_SERVICES)
                 for d in defaults:
                     worksheet.append_row([d])
                 return defaults
@@ -108,15 +1493,22 @@ class DataManager:
         except Exception:
             return []
 
+    def _services_worksheet(self):
+        """The 'Services' worksheet, created (header only) when missing."""
+        try:
+            return self.pool.worksheet("Services")
+        except gspread.WorksheetNotFound:
+            worksheet = self.pool.add_worksheet(title="Services", rows="100", cols="2")
+            worksheet.append_row(["Service"])
+            return worksheet
+
+    @_locked
+    @_interactive
     def add_service_ref(self, service_name):
         """Adds a service to the reference list."""
         if not self.sheet: return False, "Erreur connexion."
         try:
-            try:
-                worksheet = self.sheet.worksheet("Services")
-            except gspread.WorksheetNotFound:
-                worksheet = self.sheet.add_worksheet(title="Services", rows="100", cols="2")
-                worksheet.append_row(["Service"])
+            worksheet = self._services_worksheet()
 
             # Standardize: Title Case (Premières lettres en majuscules)
             service_clean = service_name.strip().title()
@@ -130,17 +1522,95 @@ class DataManager:
                 return False, f"Le service '{service_clean}' existe déjà."
             
             worksheet.append_row([service_clean])
+            self.cache.patch("Services", lambda services: services + [service_clean])
             return True, f"Service '{service_clean}' ajouté."
         except Exception as e:
             return False, f"Erreur ajout service: {e}"
 
+    @_locked
+    @_interactive
+    def add_services(self, service_names):
+        """Adds several services to the reference list: one read of the list, one append_rows."""
+        if not self.sheet: return False, "Erreur connexion."
+        try:
+            worksheet = self._services_worksheet()
+            known = {str(x).strip().lower() for x in worksheet.col_values(1) if x}
+            new_services = []
+            for service_name in service_names:
+                service_clean = service_name.strip().title()
+                if service_clean and service_clean.lower() not in known:
+                    known.add(service_clean.lower())
+                    new_services.append(service_clean)
+            if not new_services:
+                return True, "Aucun nouveau service."
+            worksheet.append_rows([[service] for service in new_services])
+            self.cache.patch("Services", lambda services: services + new_services)
+            return True, f"{len(new_services)} service(s) ajouté(s)."
+        except Exception as e:
+            return False, f"Erreur ajout service: {e}"
+
+    @contextmanager
+    def batch(self):
+        """Groups the writes of several operations into one flush at the end of the block.
+
+        Other threads' writes wait until the block is flushed, so they never
+        report a success that is still sitting in this block's buffer.
+        """
+        with self._lock:
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self.flush_writes()
+
+    @_locked
+    @_interactive
+    def flush_writes(self):
+        """Sends buffered writes and returns per-row failures (also kept in last_write_failures)."""
+        if not self.sheet: return []
+        failures = self._buffer.flush(self.sheet)
+        self._pending_inserts.clear()
+        for title in {f["sheet"] for f in failures}:
+            # The cached copy was patched optimistically, it can no longer be trusted
+            self.cache.invalidate(title)
+            self.movements.invalidate(title)
+        self.last_write_failures = failures
+        return failures
+
+    def _commit(self):
+        """Ends a logical operation: flushes now unless a batch() block is open."""
+        if self._batch_depth:
+            return []
+        return self.flush_writes()
+
+    def _patch_appended(self, key, row_num, row, cache=None):
+        """Appends a just-written row to the cached copy, or drops it if the copy was stale."""
+        cache = cache or self.cache
+
+        def append(df):
+            # Row N of the sheet is df index N-2; any gap means someone else appended meanwhile
+            if row_num is None or df.columns.empty or row_num != len(df) + 2:
+                raise ValueError("cache out of sync")
+            new_row = pd.DataFrame([dict(zip(df.columns, row))])
+            return pd.concat([df, new_row], ignore_index=True) if len(df) else new_row
+
+        if not cache.patch(key, append):
+            cache.invalidate(key)
+            return False
+        return True
+
+    @_locked
+    @_interactive
     def add_employee(self, name, sexe, service, original_name=None):
         """Adds or updates an employee in 'Personnel' sheet."""
         if not self.sheet: return False, "Erreur connexion."
         
         try:
-            worksheet = self.sheet.worksheet("Personnel")
-            df = self.load_personnel()
+            worksheet = self.pool.worksheet("Personnel")
+            # Fresh read: row numbers must match the sheet (other sessions may have deleted rows)
+            df = self.load_personnel(refresh=True)
             
             # Check for existing
             if not df.empty and "Nom et Prénoms" in df.columns:
@@ -153,14 +1623,18 @@ class DataManager:
                     row_num = existing_idx[0] + 2
                     
                     # Update Name (Col 2), Sexe (Col 3) and Service (Col 4)
-                    worksheet.update_cell(row_num, 2, name) 
-                    worksheet.update_cell(row_num, 3, sexe)
-                    worksheet.update_cell(row_num, 4, service)
-                    
-                    # If name changed, update history in Mouvements
-                    if original_name and original_name.strip() != name.strip():
-                        self.update_history_name(original_name, name)
-                        
+                    with self.batch():
+                        self._buffer.set_cells(worksheet, row_num, {2: name, 3: sexe, 4: service})
+                        self.cache.patch("Personnel", lambda d: _set_row(d, existing_idx[0], {
+                            "Nom et Prénoms": name, "Sexe": sexe, "Service": service
+                        }))
+
+                        # If name changed, update history in Mouvements (same flush)
+                        if original_name and original_name.strip() != name.strip():
+                            self.update_history_name(original_name, name)
+
+                    if self.last_write_failures and not self._batch_depth:
+                        return False, f"Erreur ajout: {self.last_write_failures[0]['error']}"
                     return True, "Mise à jour effectuée."
                 else:
                     # If original_name was given but not found, we might want to just add as new
@@ -169,127 +1643,469 @@ class DataManager:
 
                 # If we get here, either we are adding new, or target wasn't found
             
-            # New ID
-            new_id = 1
-            try:
-                if "N° ordre" in df.columns:
-                    max_id = pd.to_numeric(df["N° ordre"], errors='coerce').max()
-                    new_id = int(max_id) + 1 if pd.notna(max_id) else 1
-            except:
-                pass
+            # New ID from the process block (no scan, unique across sessions)
+            new_id = self.pool.id_allocator("Personnel").next_id(lambda: max_id(df))
             
-            worksheet.append_row([new_id, name, sexe, service])
+            new_row = [new_id, name, sexe, service]
+            self._buffer.append(worksheet, new_row,
+                                on_done=lambda row_num: self._patch_appended("Personnel", row_num, new_row))
+            failures = self._commit()
+            if failures:
+                return False, f"Erreur ajout: {failures[0]['error']}"
             return True, f"Employé ajouté avec succès. (ID: {new_id})"
 
         except Exception as e:
             return False, f"Erreur ajout: {e}"
 
+    @_locked
+    @_interactive
+    def add_employees(self, employees):
+        """Adds several employees [(name, sexe, service)] to 'Personnel' in one append.
+
+        Names already in the sheet or repeated in the list (accents, case and
+        spacing ignored) are skipped.
+        """
+        if not self.sheet: return False, "Erreur connexion."
+        try:
+            worksheet = self.pool.worksheet("Personnel")
+            # Fresh read: no duplicate even if another session added someone meanwhile
+            df = self.load_personnel(refresh=True)
+            directory = PersonnelDirectory(df)
+            new, seen = [], set()
+            for name, sexe, service in employees:
+                key = directory.key(name)
+                if not str(name).strip() or key in seen or directory.homonyms(name):
+                    continue
+                seen.add(key)
+                new.append((name, sexe, service))
+            skipped = len(employees) - len(new)
+            if not new:
+                return True, f"Aucun nouvel employé ({skipped} déjà présent(s))."
+
+            ids = self.pool.id_allocator("Personnel").next_ids(len(new), lambda: max_id(df))
+            for new_id, (name, sexe, service) in zip(ids, new):
+                row = [new_id, name, sexe, service]
+                self._buffer.append(worksheet, row,
+                                    on_done=lambda row_num, row=row: self._patch_appended("Personnel", row_num, row))
+            failures = self._commit()
+            if failures:
+                return False, f"Erreur ajout: {failures[0]['error']}"
+            id_range = f"ID {ids[0]}" if len(ids) == 1 else f"ID {ids[0]} à {ids[-1]}"
+            msg = f"{len(new)} employé(s) ajouté(s) ({id_range})."
+            if skipped:
+                msg += f" {skipped} déjà présent(s), ignoré(s)."
+            return True, msg
+        except Exception as e:
+            return False, f"Erreur ajout: {e}"
+
+    @_locked
+    @_interactive
     def update_history_name(self, old_name, new_name):
-        """Updates employee name in 'Mouvements' history to maintain consistency."""
+        """Renames an employee in the movements history (every month).
+
+        Linked rows get their name from the personnel sheet at read time: only
+        the cached copies change. Unlinked rows still carrying the old name are
+        rewritten, in one batched write.
+        """
         if not self.sheet: return
         try:
-            worksheet = self.sheet.worksheet("Mouvements")
-            # Find all cells with old_name in column 3 (Nom et Prenoms)
-            # This can be slow if many rows. 
-            # cell_list = worksheet.findall(old_name)
-            # Filter by column 3 to be safe? findall searches whole sheet usually? 
-            # findAll in gspread takes a query.
-            
-            # Better approach for batch update if supported, or iterate.
-            # Let's try finding all occurrences in col 3.
-            # Using basic get_all_values might be safer to find indices, then batch update.
-            
-            data = worksheet.get_all_values()
-            # headers is row 1.
-            updates = []
-            
-            # Identify Column Index for "Nom et Prenoms"
-            # We know it is usually col 3 (index 2), but let's check header
-            name_col_idx = 2 # 0-based default
-            if data and "Nom et Prenoms" in data[0]:
-                name_col_idx = data[0].index("Nom et Prenoms")
-                
-            for i, row in enumerate(data):
-                if i == 0: continue # Skip header
-                if len(row) > name_col_idx and row[name_col_idx] == old_name:
-                    # Update this cell. Row is i+1 (1-based)
-                    # Col is name_col_idx + 1 (1-based)
-                    updates.append({
-                        'range': gspread.utils.rowcol_to_a1(i + 1, name_col_idx + 1),
-                        'values': [[new_name]]
-                    })
-            
-            if updates:
-                # Batch update is better than one by one
-                worksheet.batch_update(updates)
-                
+            directory = self.personnel_directory()
+            employee_id = directory.id_of(new_name)
+            if employee_id is None:
+                employee_id = directory.id_of(old_name)
+            titles = self._catalog().titles()
+            self._partition_frames(titles)
+            rewritten = False
+            for title in titles:
+                df, index = self._movements_with_index(title)
+                if df.empty or "Nom et Prenoms" not in df.columns:
+                    continue
+                unlinked = index.positions_for(old_name)
+                positions = index.positions_for(old_name, employee_id)
+                if not positions:
+                    continue
+
+                if unlinked:
+                    # Goes through the write buffer: one request for every month, shared with the caller's batch if any
+                    worksheet = self.pool.worksheet(title)
+                    name_col = df.columns.get_loc("Nom et Prenoms") + 1
+                    for pos in unlinked:
+                        self._buffer.set_cells(worksheet, pos + 2, {name_col: new_name})
+                    rewritten = True
+                patched = self.movements.patch(title, lambda d: _set_positions(d, positions, "Nom et Prenoms", new_name))
+                if patched and not unlinked:
+                    # Only linked rows changed: they are indexed by id, the index stays valid
+                    self._keep_index(title)
+            if rewritten:
+                self._commit()
+
         except Exception as e:
             print(f"Error updating history: {e}") # Log but don't crash main flow
 
+    @_locked
+    @_interactive
     def delete_employee(self, name):
         """Deletes an employee from 'Personnel' worksheet."""
+        return self.delete_employees([name])
+
+    def _personnel_rows(self, df, names):
+        """Sheet rows ({row: name}, header is row 1) of employees in a fresh personnel frame, and the unknown names.
+
+        A name matches its exact stored row, else the only row equal to it
+        regardless of accents, case and spacing. A name matching several rows
+        loosely raises ValueError naming them: nothing is written.
+        """
+        directory = PersonnelDirectory(df)
+        ambiguity = directory.ambiguity_error(names)
+        if ambiguity:
+            raise ValueError(ambiguity)
+        rows, missing = {}, []
+        for name in names:
+            pos = directory.position(name)
+            if pos is None:
+                missing.append(name)
+            else:
+                rows[pos + 2] = name
+        return rows, missing
+
+    @staticmethod
+    def _missing_note(missing):
+        return f" Introuvable(s) : {', '.join(missing)}." if missing else ""
+
+    @_locked
+    @_interactive
+    def update_employees(self, names, sexe=None, service=None):
+        """Sets the sex and/or service (None: unchanged) of several employees in one write."""
+        if not self.sheet: return False, "Erreur connexion."
+        changes = {col: value for col, value in (("Sexe", sexe), ("Service", service)) if value}
+        if not names or not changes:
+            return False, "Aucune modification à appliquer."
+        try:
+            worksheet = self.pool.worksheet("Personnel")
+            # Fresh read: row numbers must match the sheet (other sessions may have deleted rows)
+            df = self.load_personnel(refresh=True)
+            try:
+                rows, missing = self._personnel_rows(df, names)
+            except ValueError as e:
+                return False, str(e)
+            if not rows:
+                return False, "Employé non trouvé."
+            cells = {df.columns.get_loc(col) + 1: value for col, value in changes.items() if col in df.columns}
+            positions = [row - 2 for row in sorted(rows)]
+
+            def patch(d):
+                for col, value in changes.items():
+                    d = _set_positions(d, positions, col, value)
+                return d
+
+            with self.batch():
+                for row in rows:
+                    self._buffer.set_cells(worksheet, row, cells)
+                self.cache.patch("Personnel", patch)
+            if self.last_write_failures and not self._batch_depth:
+                return False, f"Erreur mise à jour: {self.last_write_failures[0]['error']}"
+            return True, f"{len(rows)} employé(s) mis à jour.{self._missing_note(missing)}"
+        except Exception as e:
+            return False, f"Erreur mise à jour: {e}"
+
+    @_locked
+    @_interactive
+    def delete_employees(self, names):
+        """Deletes several employees from 'Personnel' in one request, whatever their rows."""
         if not self.sheet: return False, "Erreur connexion."
         try:
-            worksheet = self.sheet.worksheet("Personnel")
-            cell = worksheet.find(name)
-            if cell:
-                worksheet.delete_rows(cell.row)
+            worksheet = self.pool.worksheet("Personnel")
+            # Fresh read: row numbers must match the sheet (other sessions may have deleted rows)
+            df = self.load_personnel(refresh=True)
+            try:
+                rows, missing = self._personnel_rows(df, names)
+            except ValueError as e:
+                return False, str(e)
+            if not rows:
+                return False, "Employé non trouvé."
+            with self.batch():
+                for name in rows.values():
+                    self._detach_movements(name)
+            if self.last_write_failures and not self._batch_depth:
+                return False, f"Erreur suppression: {self.last_write_failures[0]['error']}"
+            # One deleteDimension per run of consecutive rows, bottom-up so the row numbers stay valid
+            self.sheet.batch_update({"requests": [
+                {"deleteDimension": {"range": {"sheetId": worksheet.id, "dimension": "ROWS",
+                                               "startIndex": first - 1, "endIndex": last}}}
+                for first, last in reversed(_row_blocks(sorted(rows)))
+            ]})
+            self.cache.put("Personnel", df.drop(df.index[[row - 2 for row in rows]]).reset_index(drop=True))
+            if len(rows) == 1 and not missing:
                 return True, "Employé supprimé avec succès."
-            return False, "Employé non trouvé."
+            return True, f"{len(rows)} employé(s) supprimé(s).{self._missing_note(missing)}"
         except Exception as e:
             return False, f"Erreur suppression: {e}"
 
+    def _detach_movements(self, name):
+        """Writes the current name into the linked rows of an employee about to be deleted.
+
+        Their id will no longer resolve: the stored name is what will be shown.
+        """
+        employee_id = self.personnel_directory().id_of(name)
+        if employee_id is None:
+            return
+        titles = self._catalog().titles()
+        self._partition_frames(titles)
+        queued = False
+        for title in titles:
+            df, index = self._movements_with_index(title)
+            linked = sorted(set(index.positions_for(name, employee_id)) - set(index.positions_for(name)))
+            if not linked:
+                continue
+            worksheet = self.pool.worksheet(title)
+            name_col = df.columns.get_loc("Nom et Prenoms") + 1
+            for pos in linked:
+                self._buffer.set_cells(worksheet, pos + 2, {name_col: name})
+            queued = True
+        if queued:
+            self._commit()
+
+    @_locked
+    @_interactive
+    def migrate_employee_ids(self):
+        """Backfills the "ID Employé" column of the movement sheets from the personnel names.
+
+        Adds the column when missing and links every row without an id whose
+        name matches an employee (accents, case and spacing ignored). One read
+        and one column write per sheet, whatever the number of rows.
+        """
+        if not self.sheet: return False, "Erreur connexion."
+        try:
+            titles = self._catalog(refresh=True).titles()
+            if not titles:
+                return False, "Aucune feuille de mouvements."
+            directory = PersonnelDirectory(self.load_personnel(refresh=True))
+            linked = already = 0
+            unmatched = Counter()
+            for title in titles:
+                counts = self._link_partition(title, directory)
+                linked += counts[0]
+                already += counts[1]
+                unmatched.update(counts[2])
+
+            msg = f"{linked} mouvements liés à leur employé ({already} l'étaient déjà)."
+            if unmatched:
+                names = ", ".join(sorted(unmatched)[:10])
+                msg += f" {sum(unmatched.values())} sans correspondance dans le personnel : {names}"
+                if len(unmatched) > 10:
+                    msg += "..."
+            return True, msg
+        except Exception as e:
+            return False, f"Erreur migration: {e}"
+
+    def _link_partition(self, title, directory):
+        """Links the rows of one movement sheet. Returns (linked, already linked, Counter of unmatched names)."""
+        worksheet = self.pool.worksheet(title)
+        values = worksheet.get_values()
+        if not values:
+            return 0, 0, Counter()
+        header = values[0]
+        if EMPLOYEE_ID_COLUMN in header:
+            id_idx = header.index(EMPLOYEE_ID_COLUMN)
+        else:
+            id_idx = len(header)
+        name_idx = header.index("Nom et Prenoms") if "Nom et Prenoms" in header else 2
+
+        column = [[EMPLOYEE_ID_COLUMN]]
+        linked = already = 0
+        unmatched = Counter()
+        for row in values[1:]:
+            current = str(row[id_idx]).strip() if len(row) > id_idx else ""
+            if current:
+                already += 1
+                column.append([current])
+                continue
+            name = row[name_idx] if len(row) > name_idx else ""
+            employee_id = directory.id_of(name)
+            if employee_id is None:
+                if str(name).strip():
+                    unmatched[name] += 1
+                column.append([""])
+            else:
+                linked += 1
+                column.append([employee_id])
+
+        if worksheet.col_count <= id_idx:
+            worksheet.add_cols(id_idx + 1 - worksheet.col_count)
+        letter = re.sub(r"\d", "", gspread.utils.rowcol_to_a1(1, id_idx + 1))
+        worksheet.update(range_name=f"{letter}1:{letter}{len(column)}", values=column)
+        self.movements.invalidate(title)
+        return linked, already, unmatched
+
+    @_locked
+    @_interactive
+    def migrate_dates(self):
+        """Rewrites the dd/mm/yyyy dates of the movement sheets as yyyy-mm-dd.
+
+        The "Date" column (B) of every sheet is read in one request and the
+        converted ones written back in one request. Unreadable cells are kept
+        as they are and listed. Safe to run again.
+        """
+        if not self.sheet: return False, "Erreur connexion."
+        try:
+            titles = self._catalog(refresh=True).titles()
+            if not titles:
+                return False, "Aucune feuille de mouvements."
+            date_col = MOUVEMENTS_COLUMNS.index("Date") + 1
+            letter = re.sub(r"\d", "", gspread.utils.rowcol_to_a1(1, date_col))
+            response = self.sheet.values_batch_get(
+                [gspread.utils.absolute_range_name(title, f"{letter}:{letter}") for title in titles])
+            data, converted, already, invalid = [], 0, 0, []
+            for title, value_range in zip(titles, response.get("valueRanges", [])):
+                cells = [row[0] if row else "" for row in value_range.get("values", [])]
+                if not cells or cells[0] != "Date":
+                    invalid.append(f"{title} (pas de colonne Date en {letter})")
+                    continue
+                column = []
+                for cell in cells[1:]:
+                    text = str(cell).strip()
+                    stored = to_sheet_date(text) if text else text
+                    if stored is None:
+                        invalid.append(text)
+                        stored = cell
+                    elif stored != text:
+                        converted += 1
+                    elif text:
+                        already += 1
+                    column.append([stored])
+                if column != [[cell] for cell in cells[1:]]:
+                    data.append({"range": gspread.utils.absolute_range_name(title, f"{letter}2:{letter}{len(cells)}"),
+                                 "values": column})
+            if data:
+                self.sheet.values_batch_update(body={"valueInputOption": "RAW", "data": data})
+                for title in titles:
+                    self.movements.invalidate(title)
+
+            msg = f"{converted} date(s) converties au format AAAA-MM-JJ ({already} l'étaient déjà)."
+            if invalid:
+                msg += f" {len(invalid)} date(s) illisible(s), laissée(s) telle(s) quelle(s) : {', '.join(invalid[:10])}"
+                if len(invalid) > 10:
+                    msg += "..."
+            return True, msg
+        except Exception as e:
+            return False, f"Erreur migration: {e}"
+
+    def _partition_worksheet(self, title):
+        """Worksheet of a partition, created with its header for the first movement of a month."""
+        catalog = self._catalog()
+        known = title in catalog.titles()
+        try:
+            worksheet = self.pool.worksheet(title)
+        except gspread.WorksheetNotFound:
+            try:
+                worksheet = self.pool.add_worksheet(title=title, rows=str(PARTITION_ROWS),
+                                                    cols=str(len(MOUVEMENTS_COLUMNS)))
+                worksheet.append_row(MOUVEMENTS_COLUMNS)
+                self.movements.put(title, pd.DataFrame(columns=MOUVEMENTS_COLUMNS))
+                self._last_full_sync[title] = time.monotonic()
+                known = True
+            except gspread.exceptions.APIError:
+                # Created meanwhile by another process
+                worksheet = self.pool.worksheet(title)
+        if not known:
+            # Month started by another process since the last metadata read: drop any empty placeholder
+            self.movements.invalidate(title)
+        catalog.add(title)
+        return worksheet
+
+    def _keep_index(self, title):
+        """Keeps the index of a partition after a cache patch that changed no name, date or id."""
+        entry = self._indexes.get(title)
+        if entry is not None:
+            self._indexes[title] = (self.movements.version(title), entry[1])
+
+    def _offset(self, title):
+        """Position of the first row of a partition in load_data(), None when an earlier month is not cached."""
+        offset = 0
+        for other in self._catalog().titles():
+            if other == title:
+                return offset
+            df = self.movements.peek(other)
+            if df is None:
+                return None
+            offset += len(df)
+        return None
+
+    @_locked
+    @_interactive
     def upsert_entry(self, date_val, name, gender, service, arrival_time, departure_time):
-        """Adds or updates an entry in 'Mouvements'."""
+        """Adds or updates an entry in the 'Mouvements' sheet of its month."""
         if not self.sheet: return False, "Erreur connexion."
-        
+        if to_sheet_date(date_val) is None: return False, f"Date invalide : {date_val}"
+        date_val = to_sheet_date(date_val)
+
         try:
-            worksheet = self.sheet.worksheet("Mouvements")
-            df = self.load_data()
+            title = self._catalog().title_for(date_val)
+            worksheet = self._partition_worksheet(title)
+            df, index = self._movements_with_index(title)
+            directory = self.personnel_directory()
+            ambiguity = directory.ambiguity_error([name])
+            if ambiguity: return False, ambiguity
+            employee_id = directory.id_of(name)
+
+            # Row queued earlier in the same batch() block: amend it before it is sent
+            key = (MovementIndex.employee_key(name, employee_id), str(date_val).strip())
+            pending = self._pending_inserts.get(key)
+            if pending is not None:
+                pending[3:6] = [gender, service, arrival_time]
+                if departure_time:
+                    pending[6] = departure_time
+                return True, f"Mise à jour effectuée pour {name} (Date: {display_date(date_val)})"
             
-            # Logic to find row index
-            row_to_update = None
-            if not df.empty:
-                # Iterate or filter. Since we need row number, iteration might be safer if not too large
-                # Or find by name, then check date?
-                # Let's use simple logic: row index corresponds to df index + 2
-                
-                mask = (df["Nom et Prenoms"].astype(str).str.strip() == str(name).strip()) & \
-                       (df["Date"].astype(str) == date_val)
-                
-                if mask.any():
-                    row_idx = df.index[mask][0]
-                    row_to_update = row_idx + 2 # Header + 0-based index
+            # Sheet row comes straight from the (employee, date) index of the month
+            row_to_update = index.row_for(name, date_val, employee_id)
 
             if row_to_update:
-                # Update cols: Sexe(4), Service(5), Arr(6), Dep(7)
+                # Update cols: Sexe(4), Service(5), Arr(6), Dep(7) -> a single range write
                 # Col indices: 1=Ordre, 2=Date, 3=Nom, 4=Sexe, 5=Service, 6=Arr, 7=Dep
-                worksheet.update_cell(row_to_update, 4, gender)
-                worksheet.update_cell(row_to_update, 5, service)
-                worksheet.update_cell(row_to_update, 6, arrival_time)
+                cells = {4: gender, 5: service, 6: arrival_time}
                 if departure_time:
-                    worksheet.update_cell(row_to_update, 7, departure_time)
-                
-                return True, f"Mise à jour effectuée pour {name} (Date: {date_val})"
+                    cells[7] = departure_time
+                self._buffer.set_cells(worksheet, row_to_update, cells)
+
+                changes = {"Sexe": gender, "Service": service, "Heure d'arrivée": arrival_time}
+                if departure_time:
+                    changes["Heure de départ"] = departure_time
+                before = self._movements_version()
+                if self.movements.patch(title, lambda d: _set_row(d, row_to_update - 2, changes)):
+                    # Name and date are unchanged, the index stays valid
+                    self._keep_index(title)
+                    after = self._movements_version()
+                    self._rollups_written(before, after, date_val, name, service)
+                    offset = self._offset(title)
+                    if offset is not None:
+                        self._advance_memo("search", before, after,
+                                           lambda search, _: search.set_row(offset + row_to_update - 2, changes))
+
+                failures = self._commit()
+                if failures:
+                    return False, f"Erreur enregistrement: {failures[0]['error']}"
+                return True, f"Mise à jour effectuée pour {name} (Date: {display_date(date_val)})"
             else:
-                # INSERT
-                new_id = 1
-                if not df.empty and "N° ordre" in df.columns:
-                    try:
-                        max_id = pd.to_numeric(df["N° ordre"], errors='coerce').max()
-                        new_id = int(max_id) + 1 if pd.notna(max_id) else 1
-                    except:
-                        pass
+                # INSERT (id from the process block: no scan, unique across sessions and months)
+                new_id = self.pool.id_allocator(MOVEMENTS_SHEET).next_id(lambda: max_id(self.load_data()))
                 
-                worksheet.append_row([
+                new_row = [
                     new_id,
                     date_val,
                     name,
                     gender,
                     service,
                     arrival_time,
-                    departure_time
-                ])
+                    departure_time,
+                    employee_id if employee_id is not None else ""
+                ]
+                self._pending_inserts[key] = self._buffer.append(
+                    worksheet, new_row, on_done=lambda row_num: self._on_movement_appended(title, row_num, new_row)
+                )
+                failures = self._commit()
+                if failures:
+                    return False, f"Erreur enregistrement: {failures[0]['error']}"
                 # Note: prepend not supported by append_row easily, append is end. 
                 # Sorting in visualization handles order.
                 return True, f"Entrée ajoutée avec succès ! (ID: {new_id})"
@@ -297,14 +2113,165 @@ class DataManager:
         except Exception as e:
             return False, f"Erreur enregistrement: {e}"
 
+    @_locked
+    @_interactive
+    def upsert_entries(self, entries):
+        """Adds or updates several movements [(date, name, arrival, departure)] in one flush.
+
+        Existing (employee, date) rows are resolved in one pass over the month
+        indexes: updates go out as one batched range write, new rows as one
+        append_rows per month.
+        """
+        if not self.sheet: return False, "Erreur connexion."
+        if not entries: return True, "Aucune saisie à enregistrer."
+        invalid = [date_val for date_val, _, _, _ in entries if to_sheet_date(date_val) is None]
+        if invalid: return False, f"Date invalide : {invalid[0]}"
+        entries = [(to_sheet_date(date_val),) + tuple(rest) for date_val, *rest in entries]
+
+        try:
+            catalog = self._catalog()
+            directory = self.personnel_directory()
+            ambiguity = directory.ambiguity_error([name for _, name, _, _ in entries])
+            if ambiguity: return False, ambiguity
+            partitions = {}  # title -> (worksheet, frame, index)
+            updates = {}  # (title, sheet row) -> (cells, cache changes, date, name, service)
+            inserts = {}  # (employee key, date) -> (title, new row), ids set below
+            amended = 0
+            for date_val, name, arrival_time, departure_time in entries:
+                title = catalog.title_for(date_val)
+                if title not in partitions:
+                    worksheet = self._partition_worksheet(title)
+                    partitions[title] = (worksheet,) + self._movements_with_index(title)
+                gender, service = (value if value is not None else "" for value in directory.info(name))
+                employee_id = directory.id_of(name)
+                key = (MovementIndex.employee_key(name, employee_id), str(date_val).strip())
+
+                # New row listed twice, or queued earlier in the same batch() block: amend it before it is sent
+                pending = inserts[key][1] if key in inserts else None
+                if pending is None and key in self._pending_inserts:
+                    pending = self._pending_inserts[key]
+                    amended += 1
+                if pending is not None:
+                    pending[3:6] = [gender, service, arrival_time]
+                    if departure_time:
+                        pending[6] = departure_time
+                    continue
+
+                row = partitions[title][2].row_for(name, date_val, employee_id)
+                if row:
+                    cells = {4: gender, 5: service, 6: arrival_time}
+                    changes = {"Sexe": gender, "Service": service, "Heure d'arrivée": arrival_time}
+                    if departure_time:
+                        cells[7] = departure_time
+                        changes["Heure de départ"] = departure_time
+                    if (title, row) in updates:
+                        # Same row twice in the list: the later values win, an empty departure keeps the earlier one
+                        cells = {**updates[title, row][0], **cells}
+                        changes = {**updates[title, row][1], **changes}
+                    updates[title, row] = (cells, changes, date_val, name, service)
+                else:
+                    inserts[key] = (title, [None, date_val, name, gender, service, arrival_time, departure_time or "",
+                                            employee_id if employee_id is not None else ""])
+
+            if updates:
+                before = self._movements_version()
+                for (title, row), (cells, _, _, _, _) in updates.items():
+                    self._buffer.set_cells(partitions[title][0], row, cells)
+                touched = {title for title, _ in updates}
+                patched = set()
+                for title in touched:
+                    changes_by_idx = {row - 2: update[1] for (t, row), update in updates.items() if t == title}
+                    if self.movements.patch(title, lambda d, changes_by_idx=changes_by_idx: _set_rows(d, changes_by_idx)):
+                        # Names and dates are unchanged, the index stays valid
+                        self._keep_index(title)
+                        patched.add(title)
+                if patched == touched:
+                    after = self._movements_version()
+
+                    def apply_rollups(rollup, in_range):
+                        for _, _, date_val, name, service in updates.values():
+                            if in_range(date_val):
+                                rollup.apply(date_val, name, service)
+
+                    offsets = {title: self._offset(title) for title in patched}
+
+                    def apply_search(search, _):
+                        for (title, row), (_, changes, _, _, _) in updates.items():
+                            search.set_row(offsets[title] + row - 2, changes)
+
+                    self._advance_memo("rollups", before, after, apply_rollups)
+                    if None not in offsets.values():
+                        self._advance_memo("search", before, after, apply_search)
+
+            if inserts:
+                new_ids = self.pool.id_allocator(MOVEMENTS_SHEET).next_ids(len(inserts), lambda: max_id(self.load_data()))
+                for new_id, (key, (title, new_row)) in zip(new_ids, inserts.items()):
+                    new_row[0] = new_id
+                    self._pending_inserts[key] = self._buffer.append(
+                        partitions[title][0], new_row,
+                        on_done=lambda row_num, title=title, new_row=new_row: self._on_movement_appended(title, row_num, new_row)
+                    )
+
+            failures = self._commit()
+            if failures:
+                return False, f"Erreur enregistrement: {failures[0]['error']}"
+            return True, f"{len(inserts)} entrée(s) ajoutée(s), {len(updates) + amended} mise(s) à jour."
+        except Exception as e:
+            return False, f"Erreur enregistrement: {e}"
+
+    def _on_movement_appended(self, title, row_num, new_row):
+        """Keeps the cached partition and its index in step with a written movement row."""
+        if self.movements.get(title) is None:
+            return
+        df, index = self._movements_with_index(title)
+        before = self._movements_version()
+        last = self._catalog().titles()[-1:] == [title]
+        if self._patch_appended(title, row_num, new_row, cache=self.movements):
+            index.add(len(df), new_row[2], new_row[1], new_row[7])
+            self._keep_index(title)
+            after = self._movements_version()
+            self._rollups_written(before, after, new_row[1], new_row[2], new_row[4])
+            if last:
+                # Rows of the last month are the last rows of load_data()
+                self._advance_memo("search", before, after,
+                                   lambda search, _: search.add_row(dict(zip(df.columns, new_row), Date=display_date(new_row[1]))))
+
+    def _movements_with_index(self, title):
+        """Cached frame of one partition (read-only) and its index, rebuilt once per partition version."""
+        df = self._partition_frames([title])[title]
+        version = self.movements.version(title)
+        entry = self._indexes.get(title)
+        if entry is None or entry[0] != version:
+            entry = (version, MovementIndex(df))
+            self._indexes[title] = entry
+        return df, entry[1]
+
+    def get_rows_for_name(self, name, start=None, end=None):
+        """Positions (0-based, as in load_data(start=start, end=end)) of every movement of an employee."""
+        if not self.sheet: return []
+        employee_id = self.personnel_directory().id_of(name)
+        titles = self._catalog().titles(start, end)
+        self._partition_frames(titles)
+        positions, offset = [], 0
+        for title in titles:
+            df, index = self._movements_with_index(title)
+            positions += [offset + pos for pos in index.positions_for(name, employee_id)]
+            offset += len(df)
+        if self._catalog().legacy and (start is not None or end is not None) and positions:
+            # Positions in the month-filtered frame of load_data()
+            mask = _month_mask(df, start, end).to_numpy()
+            ranks = mask.cumsum() - 1
+            positions = [int(ranks[pos]) for pos in positions if mask[pos]]
+        return positions
+
+    @_interactive
     def get_entry_for_today(self, name, date_val):
-         # Helper to check local cache or fetch fresh? 
-         # For simplicity, we just reload data. In prod, cache this.
-         df = self.load_data()
-         if df.empty: return None
-         mask = (df["Nom et Prenoms"].astype(str).str.strip() == str(name).strip()) & \
-                (df["Date"].astype(str) == date_val)
-         match = df[mask]
-         if not match.empty:
-             return match.iloc[0].to_dict()
-         return None
+         """Returns the movement of an employee for a given date, or None."""
+         date_val = to_sheet_date(date_val)
+         if date_val is None:
+             return None
+         title = self._catalog().title_for(date_val)
+         df, index = self._movements_with_index(title)
+         row = index.row_for(name, date_val, self.personnel_directory().id_of(name))
+         if row is None or row - 2 >= len(df): return None
+         return df.iloc[row - 2].to_dict()
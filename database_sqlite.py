@@ -0,0 +1,449 @@
+import sqlite3
+import threading
+
+import pandas as pd
+
+from database import (BaseDataManager, DEFAULT_SERVICES, EMPLOYEE_ID_COLUMN, MOUVEMENTS_COLUMNS,
+                      PERSONNEL_COLUMNS, month_of, name_key)
+from schema import display_date, to_sheet_date
+from profiler import profile_methods
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS mouvements (
+    id       INTEGER PRIMARY KEY,      -- N° ordre
+    date     TEXT NOT NULL,            -- yyyy-mm-dd (sorts like the dates)
+    name     TEXT NOT NULL,            -- as typed; shown only when employee_id does not resolve
+    name_key TEXT NOT NULL,            -- name_key(name): case, spacing and accents ignored
+    sexe     TEXT,
+    service  TEXT,
+    arrivee  TEXT,
+    depart   TEXT,
+    employee_id INTEGER                -- personnel.id (NULL: not linked)
+);
+CREATE INDEX IF NOT EXISTS idx_mouvements_date ON mouvements (date);
+
+CREATE TABLE IF NOT EXISTS personnel (
+    id       INTEGER PRIMARY KEY,      -- N° ordre
+    name     TEXT NOT NULL,
+    name_key TEXT NOT NULL UNIQUE,
+    sexe     TEXT,
+    service  TEXT
+);
+
+CREATE TABLE IF NOT EXISTS services (
+    name TEXT PRIMARY KEY COLLATE NOCASE
+);
+"""
+
+# Names are joined from personnel at read time: a rename is one personnel UPDATE
+MOUVEMENTS_SELECT = f"""
+SELECT m.id AS "N° ordre", m.date AS "Date", COALESCE(p.name, m.name) AS "Nom et Prenoms", m.sexe AS "Sexe",
+       m.service AS "Service", m.arrivee AS "Heure d'arrivée", m.depart AS "Heure de départ",
+       m.employee_id AS "{EMPLOYEE_ID_COLUMN}"
+FROM mouvements m LEFT JOIN personnel p ON p.id = m.employee_id
+"""
+
+# Movements of one employee: linked by id, or unlinked under its name
+EMPLOYEE_ROWS = "({t}employee_id = ? OR ({t}employee_id IS NULL AND {t}name_key = ?))"
+
+# Dates stored before they were ISO: dd/mm/yyyy, converted once when the file is opened
+LEGACY_DATE = "date GLOB '[0-9][0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9]'"
+ISO_FROM_LEGACY = "substr(date, 7, 4) || '-' || substr(date, 4, 2) || '-' || substr(date, 1, 2)"
+# PRAGMA user_version of a file whose dates are all ISO, then whose name keys ignore accents
+DATES_VERSION = 1
+NAME_KEYS_VERSION = 2
+
+
+@profile_methods
+class SQLiteDataManager(BaseDataManager):
+    """Local SQLite implementation of the DataManager surface.
+
+    Same method names, return values and messages as the Google Sheets backend,
+    so the views work unchanged; (name, date) and date lookups go through indexes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._memo_lock = threading.Lock()
+        # Streamlit callbacks may run on another thread than the one that created the session
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self._migrate()
+        self.conn.commit()
+
+    def _migrate(self):
+        """Upgrades a file created before movements referenced their employee."""
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(mouvements)")]
+        if "employee_id" not in columns:
+            self.conn.execute("ALTER TABLE mouvements ADD COLUMN employee_id INTEGER")
+            self._link_movements()
+        # (name, date) is no longer unique: a renamed employee's rows keep their old name_key
+        self.conn.execute("DROP INDEX IF EXISTS idx_mouvements_name_date")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_mouvements_name_key_date ON mouvements (name_key, date)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_mouvements_employee_date ON mouvements (employee_id, date)")
+        # ISO dates: month ranges are plain range scans of idx_mouvements_date
+        self.conn.execute("DROP INDEX IF EXISTS idx_mouvements_month")
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < DATES_VERSION:
+            self._convert_dates()
+        if version < NAME_KEYS_VERSION:
+            self._fold_name_keys()
+            self.conn.execute(f"PRAGMA user_version = {NAME_KEYS_VERSION}")
+
+    def _convert_dates(self):
+        cur = self.conn.execute(f"UPDATE mouvements SET date = {ISO_FROM_LEGACY} WHERE {LEGACY_DATE}")
+        return cur.rowcount
+
+    def _fold_name_keys(self):
+        """Recomputes the name keys stored before they ignored accents (same key as the Sheets backend)."""
+        self.conn.create_function("name_key", 1, name_key, deterministic=True)
+        # Two employees differing only by accents keep the second one's old key: both stay listed
+        self.conn.execute("UPDATE OR IGNORE personnel SET name_key = name_key(name)")
+        self.conn.execute("UPDATE mouvements SET name_key = name_key(name)")
+
+    def _link_movements(self):
+        cur = self.conn.execute(
+            "UPDATE mouvements SET employee_id = (SELECT p.id FROM personnel p WHERE p.name_key = mouvements.name_key) "
+            "WHERE employee_id IS NULL AND name_key IN (SELECT name_key FROM personnel)"
+        )
+        return cur.rowcount
+
+    def _employee_id(self, name):
+        # Exact stored name first: a homonym kept its own key when the keys were folded
+        row = self.conn.execute("SELECT id FROM personnel WHERE name = ?", (str(name).strip(),)).fetchone()
+        if row is None:
+            row = self.conn.execute("SELECT id FROM personnel WHERE name_key = ?", (name_key(name),)).fetchone()
+        return row[0] if row else None
+
+    def _query_df(self, sql, params=(), columns=None):
+        with self._lock:
+            df = pd.read_sql_query(sql, self.conn, params=params)
+        if columns is not None and df.empty:
+            df = pd.DataFrame(columns=columns)
+        if EMPLOYEE_ID_COLUMN in df.columns:
+            # Same dtype as the sheet loader: nullable integer, <NA> when not linked
+            df[EMPLOYEE_ID_COLUMN] = df[EMPLOYEE_ID_COLUMN].astype("Int64")
+        return df.fillna({col: "" for col in df.columns if col != EMPLOYEE_ID_COLUMN})
+
+    @staticmethod
+    def _months(start, end, t=""):
+        """WHERE condition (and parameters) keeping the months overlapping [start, end]."""
+        clauses, params = ["1"], []
+        # "-99" is past the last day of any month, as text
+        for bound, op, day in ((start, ">=", "01"), (end, "<=", "99")):
+            if bound is not None:
+                clauses.append(f"{t}date {op} ?")
+                params.append("%04d-%02d-%s" % (month_of(bound) + (day,)))
+        return " AND ".join(clauses), params
+
+    def load_data(self, refresh=False, start=None, end=None):
+        """Loads movements data (same columns as the 'Mouvements' sheet), of the months overlapping [start, end]."""
+        where, params = self._months(start, end, t="m.")
+        return self._query_df(MOUVEMENTS_SELECT + f" WHERE {where} ORDER BY m.id", params, columns=MOUVEMENTS_COLUMNS)
+
+    def load_latest(self, n=5):
+        """Last n movements, in storage order."""
+        return self._query_df(f'SELECT * FROM ({MOUVEMENTS_SELECT} ORDER BY m.id DESC LIMIT ?) ORDER BY "N° ordre"',
+                              (int(n),), columns=MOUVEMENTS_COLUMNS)
+
+    def data_version(self, start=None, end=None):
+        """Changes with every commit, from this connection or another process."""
+        with self._lock:
+            return self.conn.total_changes, self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def load_personnel(self, refresh=False):
+        """Loads personnel list (same columns as the 'Personnel' sheet)."""
+        return self._query_df(
+            'SELECT id AS "N° ordre", name AS "Nom et Prénoms", sexe AS "Sexe", service AS "Service" '
+            "FROM personnel ORDER BY id",
+            columns=PERSONNEL_COLUMNS,
+        )
+
+    def load_services(self):
+        """Loads services list, seeding the defaults on first use."""
+        with self._lock:
+            rows = self.conn.execute("SELECT name FROM services ORDER BY rowid").fetchall()
+            if not rows:
+                self.conn.executemany("INSERT OR IGNORE INTO services (name) VALUES (?)",
+                                      [(d,) for d in DEFAULT_SERVICES])
+                self.conn.commit()
+                return list(DEFAULT_SERVICES)
+        return [r[0] for r in rows]
+
+    def add_service_ref(self, service_name):
+        """Adds a service to the reference list."""
+        service_clean = service_name.strip().title()
+        try:
+            with self._lock, self.conn:
+                cur = self.conn.execute("INSERT OR IGNORE INTO services (name) VALUES (?)", (service_clean,))
+            if cur.rowcount == 0:
+                return False, f"Le service '{service_clean}' existe déjà."
+            return True, f"Service '{service_clean}' ajouté."
+        except Exception as e:
+            return False, f"Erreur ajout service: {e}"
+
+    def add_services(self, service_names):
+        """Adds several services to the reference list in one transaction."""
+        names = [name.strip().title() for name in service_names if name.strip()]
+        try:
+            with self._lock, self.conn:
+                before = self.conn.total_changes
+                self.conn.executemany("INSERT OR IGNORE INTO services (name) VALUES (?)", [(name,) for name in names])
+                added = self.conn.total_changes - before
+            if not added:
+                return True, "Aucun nouveau service."
+            return True, f"{added} service(s) ajouté(s)."
+        except Exception as e:
+            return False, f"Erreur ajout service: {e}"
+
+    def add_employee(self, name, sexe, service, original_name=None):
+        """Adds or updates an employee."""
+        try:
+            target_name = original_name if original_name else name
+            with self._lock, self.conn:
+                row = self.conn.execute("SELECT id FROM personnel WHERE name = ?", (target_name,)).fetchone()
+                if row:
+                    self.conn.execute(
+                        "UPDATE personnel SET name = ?, name_key = ?, sexe = ?, service = ? WHERE id = ?",
+                        (name, name_key(name), sexe, service, row[0]),
+                    )
+                else:
+                    cur = self.conn.execute(
+                        "INSERT INTO personnel (name, name_key, sexe, service) VALUES (?, ?, ?, ?)",
+                        (name, name_key(name), sexe, service),
+                    )
+                    new_id = cur.lastrowid
+            if row:
+                if original_name and original_name.strip() != name.strip():
+                    self.update_history_name(original_name, name)
+                return True, "Mise à jour effectuée."
+            return True, f"Employé ajouté avec succès. (ID: {new_id})"
+        except sqlite3.IntegrityError:
+            return False, f"Erreur ajout: '{name}' existe déjà."
+        except Exception as e:
+            return False, f"Erreur ajout: {e}"
+
+    def add_employees(self, employees):
+        """Adds several employees [(name, sexe, service)] in one transaction, skipping known names."""
+        try:
+            with self._lock, self.conn:
+                before = self.conn.total_changes
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO personnel (name, name_key, sexe, service) VALUES (?, ?, ?, ?)",
+                    [(name, name_key(name), sexe, service) for name, sexe, service in employees
+                     if str(name).strip()],
+                )
+                added = self.conn.total_changes - before
+            skipped = len(employees) - added
+            if not added:
+                return True, f"Aucun nouvel employé ({skipped} déjà présent(s))."
+            msg = f"{added} employé(s) ajouté(s)."
+            if skipped:
+                msg += f" {skipped} déjà présent(s), ignoré(s)."
+            return True, msg
+        except Exception as e:
+            return False, f"Erreur ajout: {e}"
+
+    def update_history_name(self, old_name, new_name):
+        """Renames the unlinked movements of an employee (linked ones are joined at read time)."""
+        try:
+            with self._lock, self.conn:
+                self.conn.execute(
+                    "UPDATE mouvements SET name = ?, name_key = ? WHERE employee_id IS NULL AND name_key = ?",
+                    (new_name, name_key(new_name), name_key(old_name)),
+                )
+        except Exception as e:
+            print(f"Error updating history: {e}") # Log but don't crash main flow
+
+    def delete_employee(self, name):
+        """Deletes an employee."""
+        return self.delete_employees([name])
+
+    def _personnel_ids(self, names):
+        """{id: name} of the known employees among names, and the unknown names.
+
+        Raises ValueError naming the rows when a name matches several employees but none exactly.
+        """
+        ambiguity = self.personnel_directory().ambiguity_error(names)
+        if ambiguity:
+            raise ValueError(ambiguity)
+        ids, missing = {}, []
+        for name in names:
+            employee_id = self._employee_id(name)
+            if employee_id is None:
+                missing.append(name)
+            else:
+                ids[employee_id] = name
+        return ids, missing
+
+    @staticmethod
+    def _missing_note(missing):
+        return f" Introuvable(s) : {', '.join(missing)}." if missing else ""
+
+    def update_employees(self, names, sexe=None, service=None):
+        """Sets the sex and/or service (None: unchanged) of several employees in one transaction."""
+        if not names or not (sexe or service):
+            return False, "Aucune modification à appliquer."
+        try:
+            with self._lock, self.conn:
+                try:
+                    ids, missing = self._personnel_ids(names)
+                except ValueError as e:
+                    return False, str(e)
+                self.conn.executemany(
+                    "UPDATE personnel SET sexe = COALESCE(?, sexe), service = COALESCE(?, service) WHERE id = ?",
+                    [(sexe or None, service or None, employee_id) for employee_id in ids],
+                )
+            if not ids:
+                return False, "Employé non trouvé."
+            return True, f"{len(ids)} employé(s) mis à jour.{self._missing_note(missing)}"
+        except Exception as e:
+            return False, f"Erreur mise à jour: {e}"
+
+    def delete_employees(self, names):
+        """Deletes several employees in one transaction."""
+        try:
+            with self._lock, self.conn:
+                try:
+                    ids, missing = self._personnel_ids(names)
+                except ValueError as e:
+                    return False, str(e)
+                # Ids may be reused once deleted: the movements keep the name instead
+                self.conn.executemany(
+                    "UPDATE mouvements SET name = (SELECT name FROM personnel WHERE id = ?), "
+                    "name_key = (SELECT name_key FROM personnel WHERE id = ?), employee_id = NULL "
+                    "WHERE employee_id = ?",
+                    [(employee_id,) * 3 for employee_id in ids],
+                )
+                self.conn.executemany("DELETE FROM personnel WHERE id = ?", [(employee_id,) for employee_id in ids])
+            if not ids:
+                return False, "Employé non trouvé."
+            if len(ids) == 1 and not missing:
+                return True, "Employé supprimé avec succès."
+            return True, f"{len(ids)} employé(s) supprimé(s).{self._missing_note(missing)}"
+        except Exception as e:
+            return False, f"Erreur suppression: {e}"
+
+    def _upsert_row(self, date_val, name, gender, service, arrival_time, departure_time):
+        """Writes the movement of (name, date) inside the caller's transaction. Returns (updated, id)."""
+        key = name_key(name)
+        employee_id = self._employee_id(name)
+        row = self.conn.execute(
+            f"SELECT id FROM mouvements WHERE {EMPLOYEE_ROWS.format(t='')} AND date = ?", (employee_id, key, date_val)
+        ).fetchone()
+        if row:
+            self.conn.execute(
+                "UPDATE mouvements SET sexe = ?, service = ?, arrivee = ?, "
+                "depart = CASE WHEN ? != '' THEN ? ELSE depart END WHERE id = ?",
+                (gender, service, arrival_time, departure_time or "", departure_time or "", row[0]),
+            )
+            return True, row[0]
+        cur = self.conn.execute(
+            "INSERT INTO mouvements (date, name, name_key, sexe, service, arrivee, depart, employee_id) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (date_val, name, key, gender, service, arrival_time, departure_time or "", employee_id),
+        )
+        return False, cur.lastrowid
+
+    def upsert_entry(self, date_val, name, gender, service, arrival_time, departure_time):
+        """Adds or updates the movement of (name, date)."""
+        if to_sheet_date(date_val) is None: return False, f"Date invalide : {date_val}"
+        date_val = to_sheet_date(date_val)
+        try:
+            ambiguity = self.personnel_directory().ambiguity_error([name])
+            if ambiguity: return False, ambiguity
+            before = self.data_version()
+            with self._lock, self.conn:
+                updated, row_id = self._upsert_row(date_val, name, gender, service, arrival_time, departure_time)
+            self._rollups_written(before, self.data_version(), date_val, name, service)
+            if updated:
+                return True, f"Mise à jour effectuée pour {name} (Date: {display_date(date_val)})"
+            return True, f"Entrée ajoutée avec succès ! (ID: {row_id})"
+        except Exception as e:
+            return False, f"Erreur enregistrement: {e}"
+
+    def upsert_entries(self, entries):
+        """Adds or updates several movements [(date, name, arrival, departure)] in one transaction."""
+        if not entries:
+            return True, "Aucune saisie à enregistrer."
+        invalid = [date_val for date_val, _, _, _ in entries if to_sheet_date(date_val) is None]
+        if invalid: return False, f"Date invalide : {invalid[0]}"
+        entries = [(to_sheet_date(date_val),) + tuple(rest) for date_val, *rest in entries]
+        try:
+            directory = self.personnel_directory()
+            ambiguity = directory.ambiguity_error([name for _, name, _, _ in entries])
+            if ambiguity: return False, ambiguity
+            written = []
+            before = self.data_version()
+            with self._lock, self.conn:
+                for date_val, name, arrival_time, departure_time in entries:
+                    gender, service = (value if value is not None else "" for value in directory.info(name))
+                    updated, _ = self._upsert_row(date_val, name, gender, service, arrival_time, departure_time)
+                    written.append((updated, date_val, name, service))
+
+            def apply_rollups(rollup, in_range):
+                for _, date_val, name, service in written:
+                    if in_range(date_val):
+                        rollup.apply(date_val, name, service)
+
+            self._advance_memo("rollups", before, self.data_version(), apply_rollups)
+            added = sum(1 for updated, _, _, _ in written if not updated)
+            return True, f"{added} entrée(s) ajoutée(s), {len(written) - added} mise(s) à jour."
+        except Exception as e:
+            return False, f"Erreur enregistrement: {e}"
+
+    def get_entry_for_today(self, name, date_val):
+        """Returns the movement of an employee for a given date, or None."""
+        date_val = to_sheet_date(date_val)
+        if date_val is None:
+            return None
+        with self._lock:
+            employee_id = self._employee_id(name)
+        df = self._query_df(MOUVEMENTS_SELECT + f" WHERE {EMPLOYEE_ROWS.format(t='m.')} "
+                            "AND m.date = ? ORDER BY m.id",
+                            (employee_id, name_key(name), date_val))
+        if df.empty:
+            return None
+        return df.iloc[0].to_dict()
+
+    def get_rows_for_name(self, name, start=None, end=None):
+        """Positions (0-based, as in load_data(start=start, end=end)) of every movement of an employee."""
+        where, params = self._months(start, end)
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT pos FROM (SELECT employee_id, name_key, ROW_NUMBER() OVER (ORDER BY id) - 1 AS pos "
+                f"FROM mouvements WHERE {where}) WHERE {EMPLOYEE_ROWS.format(t='')}",
+                params + [self._employee_id(name), name_key(name)],
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def migrate_employee_ids(self):
+        """Links the movements without employee to the employee of the same name."""
+        try:
+            with self._lock, self.conn:
+                linked = self._link_movements()
+                left = self.conn.execute("SELECT COUNT(*) FROM mouvements WHERE employee_id IS NULL").fetchone()[0]
+            msg = f"{linked} mouvements liés à leur employé."
+            if left:
+                msg += f" {left} sans correspondance dans le personnel."
+            return True, msg
+        except Exception as e:
+            return False, f"Erreur migration: {e}"
+
+    def migrate_dates(self):
+        """Converts the dd/mm/yyyy dates left (already done when the file is opened)."""
+        try:
+            with self._lock, self.conn:
+                converted = self._convert_dates()
+                invalid = self.conn.execute(
+                    "SELECT COUNT(*) FROM mouvements WHERE date NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'"
+                ).fetchone()[0]
+            msg = f"{converted} date(s) converties au format AAAA-MM-JJ."
+            if invalid:
+                msg += f" {invalid} date(s) illisible(s), laissée(s) telle(s) quelle(s)."
+            return True, msg
+        except Exception as e:
+            return False, f"Erreur migration: {e}"
@@ -0,0 +1,118 @@
+import hashlib
+import os
+import tempfile
+import time
+from collections import OrderedDict
+
+import xlsxwriter
+
+# Generated files live on disk, not in the session: a large export is never held in RAM
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), "suivi_rh_exports")
+EXPORT_MAX_AGE_SECONDS = 3600
+EXPORT_CACHE_ENTRIES = 3
+EXPORT_CHUNK_ROWS = 5000
+
+EXPORT_FORMATS = {
+    "xlsx": ("Excel (.xlsx)", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": ("CSV (.csv)", "text/csv"),
+    "parquet": ("Parquet (.parquet)", "application/vnd.apache.parquet"),
+}
+
+
+def export_key(version, *parts):
+    """Cache key of an export (None when the data version is unknown: never cached)."""
+    if version is None:
+        return None
+    return hashlib.sha1(repr((version,) + parts).encode("utf-8")).hexdigest()
+
+
+def _chunks(df):
+    for start in range(0, len(df), EXPORT_CHUNK_ROWS):
+        chunk = df.iloc[start:start + EXPORT_CHUNK_ROWS].astype(object)
+        yield chunk.where(chunk.notna(), None)
+
+
+def write_xlsx(df, path, sheet_name="Donnees_Export"):
+    """Row by row with xlsxwriter's constant_memory mode (each row is flushed to disk)."""
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+    try:
+        worksheet = workbook.add_worksheet(sheet_name)
+        bold = workbook.add_format({"bold": True})
+        worksheet.write_row(0, 0, [str(c) for c in df.columns], bold)
+        row = 1
+        for chunk in _chunks(df):
+            for values in chunk.itertuples(index=False, name=None):
+                worksheet.write_row(row, 0, values)
+                row += 1
+    finally:
+        workbook.close()
+
+
+def write_csv(df, path):
+    # ';' and a BOM so Excel (French locale) opens it with the accents right
+    df.to_csv(path, index=False, sep=";", encoding="utf-8-sig", chunksize=EXPORT_CHUNK_ROWS)
+
+
+def write_parquet(df, path):
+    # Sheet columns may mix numbers and text: store those as text
+    mixed = {col: str for col in df.columns if df[col].dtype == object}
+    df.astype(mixed).to_parquet(path, index=False)
+
+
+WRITERS = {"xlsx": write_xlsx, "csv": write_csv, "parquet": write_parquet}
+
+
+def _remove_stale_files():
+    if not os.path.isdir(EXPORT_DIR):
+        return
+    limit = time.time() - EXPORT_MAX_AGE_SECONDS
+    for name in os.listdir(EXPORT_DIR):
+        path = os.path.join(EXPORT_DIR, name)
+        try:
+            if os.path.getmtime(path) < limit:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+class ExportCache:
+    """Export files of one session by export key, generated only when asked for.
+
+    Keeps the last few files; older ones are deleted from disk.
+    """
+
+    def __init__(self, max_entries=EXPORT_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._files = OrderedDict()  # key -> path
+
+    def get(self, key):
+        """Path of an already generated export, or None."""
+        path = self._files.get(key) if key else None
+        if path and os.path.exists(path):
+            self._files.move_to_end(key)
+            return path
+        return None
+
+    def build(self, key, fmt, make_frame):
+        """Generates (or reuses) the export of make_frame() and returns its path."""
+        path = self.get(key)
+        if path:
+            return path
+        _remove_stale_files()
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        fd, path = tempfile.mkstemp(suffix=f".{fmt}", dir=EXPORT_DIR)
+        os.close(fd)
+        try:
+            WRITERS[fmt](make_frame(), path)
+        except Exception:
+            os.remove(path)
+            raise
+        if key:
+            self._files[key] = path
+            while len(self._files) > self.max_entries:
+                _, old = self._files.popitem(last=False)
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
+        return path
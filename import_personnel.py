@@ -0,0 +1,197 @@
+# Bulk import of a staff list (xlsx or CSV) into the personnel base.
+#
+#   python import_personnel.py "liste personnel.xlsx"            # dry run: prints what would change
+#   python import_personnel.py "liste personnel.xlsx" --apply    # adds the new employees (one append)
+#   python import_personnel.py equipe.csv --sheet Feuil1 --apply
+#
+# Rows are streamed (read-only workbook, csv reader), names and services are
+# normalized, and employees already in the base (accents, case and spacing
+# ignored) are left as they are: differences are only reported.
+import argparse
+import csv
+import sys
+
+from openpyxl import load_workbook
+
+from database import PersonnelDirectory, create_data_manager
+from schema import fold_text
+
+DIFF_PREVIEW_LINES = 50
+
+
+def read_rows(path, sheet_name=None):
+    """Streams the rows of an xlsx or CSV file as {header: value} dicts (first row = header)."""
+    if path.lower().endswith((".xlsx", ".xlsm")):
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            worksheet = workbook[sheet_name] if sheet_name else workbook.worksheets[0]
+            rows = worksheet.iter_rows(values_only=True)
+            header = [str(c).strip() if c is not None else "" for c in next(rows, ())]
+            for values in rows:
+                if any(v not in (None, "") for v in values):
+                    yield dict(zip(header, values))
+        finally:
+            workbook.close()
+        return
+
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=";,\t")
+        except csv.Error:
+            dialect = csv.excel
+        for record in csv.DictReader(f, dialect=dialect):
+            yield {str(k).strip(): v for k, v in record.items() if k is not None}
+
+
+def find_column(header, *keywords):
+    """First column whose title contains one of the keywords (same rule as PersonnelDirectory)."""
+    return next((c for c in header if any(k in c.lower() for k in keywords)), None)
+
+
+def clean_name(value):
+    """Spacing collapsed, family name (first word) in capitals, as entered in the app."""
+    words = str(value if value is not None else "").split()
+    if not words:
+        return ""
+    return " ".join([words[0].upper()] + words[1:])
+
+
+def clean_sex(value):
+    """'M' / 'F' from M, F, Masculin, Féminin, Homme, Femme ('' when unknown)."""
+    text = fold_text(value if value is not None else "").strip()
+    if text[:1] in ("m", "h"):
+        return "M"
+    if text[:1] == "f":
+        return "F"
+    return ""
+
+
+class ServiceNames:
+    """Maps service spellings to the known ones (accents and case ignored).
+
+    Unknown services are title-cased like add_service_ref() and remembered,
+    so every row of the file spells them the same way.
+    """
+
+    def __init__(self, known):
+        self.known = {}
+        for service in known:
+            self.known.setdefault(fold_text(" ".join(str(service).split())), service)
+        self.new = []
+
+    def __call__(self, value):
+        text = " ".join(str(value if value is not None else "").split())
+        if not text:
+            return ""
+        key = fold_text(text)
+        if key not in self.known:
+            self.known[key] = text.title()
+            self.new.append(self.known[key])
+        return self.known[key]
+
+
+def plan_import(rows, directory, services):
+    """Compares the file rows with the personnel directory.
+
+    Returns {"new": [(name, sexe, service)], "unchanged": [name],
+    "changed": [(name, (old sexe, old service), (sexe, service))],
+    "duplicates": [name], "invalid": int, "new_services": [service]}.
+    """
+    plan = {"new": [], "unchanged": [], "changed": [], "duplicates": [], "invalid": 0}
+    name_col = sex_col = service_col = None
+    seen = set()
+    for record in rows:
+        if name_col is None:
+            header = list(record)
+            name_col = find_column(header, "nom")
+            sex_col = find_column(header, "sexe", "genre")
+            service_col = find_column(header, "service", "département")
+            if name_col is None:
+                raise ValueError(f"Colonne des noms introuvable (colonnes : {', '.join(header)})")
+        name = clean_name(record.get(name_col))
+        if not name:
+            plan["invalid"] += 1
+            continue
+        key = directory.key(name)
+        if key in seen:
+            plan["duplicates"].append(name)
+            continue
+        seen.add(key)
+        sexe = clean_sex(record.get(sex_col)) if sex_col else ""
+        service = services(record.get(service_col)) if service_col else ""
+
+        existing = directory.get(name)
+        if existing is None and directory.homonyms(name):
+            # Several stored variants ("KONÉ Awa" / "KONE Awa"): none of them is touched
+            plan["unchanged"].append(name)
+            continue
+        if existing is None:
+            plan["new"].append((name, sexe, service))
+            continue
+        old_sexe, old_service = directory.info(name)
+        old = (str(old_sexe or ""), str(old_service or ""))
+        if (sexe and sexe != old[0]) or (service and fold_text(service) != fold_text(old[1])):
+            plan["changed"].append((str(existing.get(directory.name_col)), old, (sexe or old[0], service or old[1])))
+        else:
+            plan["unchanged"].append(name)
+    plan["new_services"] = list(services.new)
+    return plan
+
+
+def print_plan(plan, out=None):
+    out = out or sys.stdout
+
+    def preview(lines):
+        for line in lines[:DIFF_PREVIEW_LINES]:
+            print(line, file=out)
+        if len(lines) > DIFF_PREVIEW_LINES:
+            print(f"  ... et {len(lines) - DIFF_PREVIEW_LINES} de plus", file=out)
+
+    preview([f"+ {name} ({sexe or '?'}, {service or '?'})" for name, sexe, service in plan["new"]])
+    preview([f"~ {name} : {old[0]}/{old[1]} -> {new[0]}/{new[1]} (non modifié)"
+             for name, old, new in plan["changed"]])
+    if plan["duplicates"]:
+        print(f"Doublons dans le fichier (ignorés) : {', '.join(plan['duplicates'])}", file=out)
+    if plan["new_services"]:
+        print(f"Nouveaux services : {', '.join(plan['new_services'])}", file=out)
+    print(f"\nRésumé : {len(plan['new'])} à ajouter, {len(plan['unchanged'])} déjà présents, "
+          f"{len(plan['changed'])} différents (à corriger dans la gestion du personnel), "
+          f"{len(plan['duplicates'])} doublons, {plan['invalid']} lignes sans nom.", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import groupé du personnel depuis un fichier Excel ou CSV.")
+    parser.add_argument("path", help="fichier .xlsx ou .csv (première ligne : en-têtes)")
+    parser.add_argument("--sheet", default=None, help="feuille du classeur (par défaut : la première)")
+    parser.add_argument("--apply", action="store_true", help="écrit les ajouts (sinon simple aperçu)")
+    args = parser.parse_args(argv)
+
+    db = create_data_manager()
+    directory = PersonnelDirectory(db.load_personnel(refresh=True))
+    services = ServiceNames(db.load_services() + directory.services)
+    try:
+        plan = plan_import(read_rows(args.path, args.sheet), directory, services)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Erreur lecture fichier: {e}")
+        return 1
+    print_plan(plan)
+
+    if not args.apply:
+        print("\nAperçu uniquement : relancez avec --apply pour enregistrer.")
+        return 0
+    if plan["new_services"]:
+        success, msg = db.add_services(plan["new_services"])
+        print(msg)
+        if not success:
+            return 1
+    if not plan["new"]:
+        return 0
+    success, msg = db.add_employees(plan["new"])
+    print(msg)
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
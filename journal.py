@@ -0,0 +1,444 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+import pandas as pd
+
+from database import CACHE_TTL_SECONDS, MOUVEMENTS_COLUMNS, BaseDataManager, DataManager, get_setting, in_months, name_key
+from schema import display_date, display_frame, to_sheet_date
+from search import OverlaidSearchIndex
+from profiler import profile_methods
+
+# Write-ahead journal defaults (overridable in secrets.toml under [journal])
+JOURNAL_DEFAULT_PATH = "journal_ecritures.jsonl"
+REPLAY_RETRY_SECONDS = 30
+# Replayed entries keep being overlaid on reads for this many cache TTLs
+# ([cache] ttl_seconds), until every session's cache has reloaded them
+RECENT_OVERLAY_TTLS = 2
+
+
+class WriteJournal:
+    """Append-only, fsync'd JSON-lines journal of mutations.
+
+    Each line is either an operation {"seq", "op", "args", "ts"} or an
+    acknowledgement {"ack": [seq, ...]} written once the operation reached the
+    backend. The file is truncated when nothing is left pending.
+    """
+
+    def __init__(self, path, overlay_seconds=RECENT_OVERLAY_TTLS * CACHE_TTL_SECONDS):
+        self.path = path
+        self.overlay_seconds = overlay_seconds
+        self._lock = threading.RLock()
+        self._pending = OrderedDict()  # seq -> entry
+        self._recent = deque()  # (acked_at, entry) of replayed entries
+        self._seq = 0
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn last line after a crash: the append was never acknowledged to the user
+                    continue
+                if "ack" in record:
+                    for seq in record["ack"]:
+                        self._pending.pop(seq, None)
+                        self._seq = max(self._seq, seq)
+                else:
+                    self._pending[record["seq"]] = record
+                    self._seq = max(self._seq, record["seq"])
+
+    def _write(self, *records):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def append(self, op, args):
+        """Durably records a mutation and returns its entry."""
+        return self.append_many(op, [args])[0]
+
+    def append_many(self, op, args_list):
+        """Durably records several mutations of the same kind with a single fsync."""
+        with self._lock:
+            now = time.time()
+            entries = []
+            for args in args_list:
+                self._seq += 1
+                entries.append({"seq": self._seq, "op": op, "args": args, "ts": now})
+            self._write(*entries)
+            for entry in entries:
+                self._pending[entry["seq"]] = entry
+            return entries
+
+    def ack(self, seqs):
+        """Marks entries as applied to the backend."""
+        seqs = [seq for seq in seqs if seq in self._pending]
+        if not seqs:
+            return
+        with self._lock:
+            self._write({"ack": seqs})
+            now = time.time()
+            for seq in seqs:
+                self._recent.append((now, self._pending.pop(seq)))
+            if not self._pending:
+                # Nothing left to replay: start over with an empty file
+                with open(self.path, "w", encoding="utf-8") as f:
+                    f.flush()
+                    os.fsync(f.fileno())
+
+    def pending(self):
+        with self._lock:
+            return list(self._pending.values())
+
+    def recent(self, max_age=None):
+        """Entries replayed less than max_age seconds ago (default: overlay_seconds)."""
+        with self._lock:
+            limit = time.time() - (self.overlay_seconds if max_age is None else max_age)
+            while self._recent and self._recent[0][0] < limit:
+                self._recent.popleft()
+            return [entry for _, entry in self._recent]
+
+    def __len__(self):
+        return len(self._pending)
+
+
+class JournalReplayer:
+    """Drains a journal to a backend, in order and idempotently.
+
+    Consecutive upserts are merged per (name, date) and sent inside one
+    backend.batch(), so a backlog accumulated during an outage costs a
+    single flush once the connection is back.
+
+    Background drains write through a backend of its own, built by
+    backend_factory on first use: the journal outlives the session that
+    started it.
+    """
+
+    def __init__(self, journal, backend_factory, retry_seconds=REPLAY_RETRY_SECONDS):
+        self.journal = journal
+        self.backend_factory = backend_factory
+        self.retry_seconds = retry_seconds
+        self.results = {}  # seq -> (success, msg) of replayed personnel/service operations
+        self._lock = threading.Lock()
+        self._kick_lock = threading.Lock()
+        self._backend = None
+        self._thread = None
+
+    def kick(self):
+        """Starts a background drain unless one is already running."""
+        with self._kick_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            if self._backend is None:
+                self._backend = self.backend_factory()
+            self._thread = threading.Thread(target=self._run, args=(self._backend,), daemon=True)
+            self._thread.start()
+
+    def _run(self, backend):
+        while len(self.journal):
+            self.drain(backend)
+            if len(self.journal):
+                time.sleep(self.retry_seconds)
+
+    def drain(self, backend):
+        """Replays every pending entry it can. Stops at the first failure to keep ordering."""
+        with self._lock:
+            if not backend.ensure_connected():
+                return False
+            pending = self.journal.pending()
+            i = 0
+            while i < len(pending):
+                if pending[i]["op"] == "upsert_entry":
+                    run = []
+                    while i < len(pending) and pending[i]["op"] == "upsert_entry":
+                        run.append(pending[i])
+                        i += 1
+                    ok = self._replay_upserts(backend, run)
+                else:
+                    ok = self._replay_one(backend, pending[i])
+                    i += 1
+                if not ok:
+                    return False
+            return True
+
+    def _replay_upserts(self, backend, run):
+        merged = OrderedDict()
+        for entry in run:
+            args = entry["args"]
+            key = (name_key(args["name"]), to_sheet_date(args["date_val"]) or args["date_val"])
+            previous = merged.get(key)
+            if previous and not args.get("departure_time"):
+                # A later arrival-only save must not wipe a departure recorded earlier
+                args = dict(args, departure_time=previous["departure_time"])
+            merged[key] = args
+
+        results = []
+        with backend.batch():
+            for args in merged.values():
+                results.append(backend.upsert_entry(**args))
+        if getattr(backend, "last_write_failures", None):
+            return False
+        # Refusals (ambiguous name...) will not change on retry either: only errors keep the run pending
+        if any(not success and str(msg).startswith("Erreur") for success, msg in results):
+            return False
+        self.journal.ack([entry["seq"] for entry in run])
+        return True
+
+    def _replay_one(self, backend, entry):
+        result = getattr(backend, entry["op"])(**entry["args"])
+        success, msg = result if result is not None else (True, "")
+        # Business refusals ("existe déjà", "non trouvé") will not change on retry: consider them applied
+        if not success and str(msg).startswith("Erreur"):
+            return False
+        self.results[entry["seq"]] = (success, msg)
+        self.journal.ack([entry["seq"]])
+        return True
+
+
+_journals = {}
+_journals_lock = threading.Lock()
+
+
+def get_journal(path, backend_factory):
+    """Process-wide journal and replayer for a file (shared by every session).
+
+    backend_factory builds the replayer's own backend; the first caller's is kept.
+    """
+    with _journals_lock:
+        if path not in _journals:
+            retry = get_setting("journal", "retry_seconds", REPLAY_RETRY_SECONDS)
+            overlay = RECENT_OVERLAY_TTLS * get_setting("cache", "ttl_seconds", CACHE_TTL_SECONDS)
+            journal = WriteJournal(path, overlay_seconds=overlay)
+            _journals[path] = (journal, JournalReplayer(journal, backend_factory, retry_seconds=retry))
+        return _journals[path]
+
+
+@profile_methods
+class JournaledDataManager(BaseDataManager):
+    """Write-ahead wrapper around a backend.
+
+    Every mutation is appended to the local journal before anything else.
+    Check-ins (upsert_entry) are acknowledged as soon as they are on disk and
+    replayed in the background; personnel changes are replayed right away
+    when the backend is reachable. Reads overlay the entries not yet visible
+    in the backend so a clerk always sees their own saves.
+    """
+
+    def __init__(self, backend, path=None, backend_factory=None):
+        self.backend = backend
+        # The replayer gets its own manager on the same (process-wide) connection pool
+        factory = backend_factory or functools.partial(DataManager, pool=backend.pool)
+        self.journal, self.replayer = get_journal(path or get_setting("journal", "path", JOURNAL_DEFAULT_PATH), factory)
+        if len(self.journal):
+            # Leftovers from a previous run or an outage
+            self.replayer.kick()
+
+    def __getattr__(self, name):
+        # Backend specific extras (cache, sheet, batch state...)
+        return getattr(self.backend, name)
+
+    def pending_count(self):
+        return len(self.journal)
+
+    def replay(self):
+        """Synchronously drains the journal with this session's backend."""
+        return self.replayer.drain(self.backend)
+
+    # --- Reads ---
+
+    def _overlay_entries(self):
+        entries = self.journal.recent() + self.journal.pending()
+        # Entries journaled before dates were stored ISO carry dd/mm/yyyy dates
+        return [dict(e["args"], date_val=to_sheet_date(e["args"]["date_val"]) or e["args"]["date_val"])
+                for e in entries if e["op"] == "upsert_entry"]
+
+    def load_data(self, refresh=False, start=None, end=None):
+        return self._apply_overlay(self.backend.load_data(refresh=refresh, start=start, end=end), start, end)
+
+    def load_latest(self, n=5):
+        return self._apply_overlay(self.backend.load_latest(n)).tail(n)
+
+    def data_version(self, start=None, end=None):
+        backend_version = self.backend.data_version(start, end)
+        if backend_version is None:
+            return None
+        overlay = self.journal.recent() + self.journal.pending()
+        return backend_version, tuple(e["seq"] for e in overlay if e["op"] == "upsert_entry")
+
+    def _apply_overlay(self, df, start=None, end=None):
+        """Applies pending and just-replayed check-ins on top of a backend frame (months of [start, end])."""
+        return self._overlay(df, start, end)[0]
+
+    def _overlay(self, df, start=None, end=None):
+        """(frame with the overlay applied, sorted positions of the rows it changed or appended)."""
+        overlay = self._overlay_entries()
+        if start is not None or end is not None:
+            overlay = [args for args in overlay if in_months(args["date_val"], start, end)]
+        if not overlay:
+            return df, []
+        if "Nom et Prenoms" not in df.columns:
+            # No movement stored yet (first check-in of a new month): the pending saves make the frame
+            df = pd.DataFrame(columns=MOUVEMENTS_COLUMNS)
+        keys = list(zip(df["Nom et Prenoms"].map(name_key), df["Date"].astype(str)))
+        positions = {key: pos for pos, key in enumerate(keys)}
+        new_rows = OrderedDict()
+        touched = set()
+        for args in overlay:
+            key = (name_key(args["name"]), args["date_val"])
+            values = {"Sexe": args["gender"], "Service": args["service"], "Heure d'arrivée": args["arrival_time"]}
+            if args["departure_time"]:
+                values["Heure de départ"] = args["departure_time"]
+            pos = positions.get(key)
+            if pos is not None:
+                for col, value in values.items():
+                    df.iat[pos, df.columns.get_loc(col)] = value
+                touched.add(pos)
+            else:
+                row = new_rows.setdefault(key, {"Date": args["date_val"], "Nom et Prenoms": args["name"]})
+                row.update(values)
+        size = len(df)
+        if new_rows:
+            added = pd.DataFrame(list(new_rows.values()))
+            df = added.reindex(columns=df.columns) if df.empty else pd.concat([df, added], ignore_index=True)
+        return df, sorted(touched) + list(range(size, len(df)))
+
+    def load_rollups(self, start=None, end=None):
+        # apply() is idempotent: pending saves are folded into the backend rollups,
+        # which see them again (no-op) once replayed
+        rollup = self.backend.load_rollups(start, end)
+        for args in self._overlay_entries():
+            if (start is None and end is None) or in_months(args["date_val"], start, end):
+                rollup.apply(args["date_val"], args["name"], args["service"])
+        return rollup
+
+    def load_search_index(self):
+        # The backend index is kept current by the backend's own writes: only the
+        # overlaid rows are indexed here, so a save does not re-index the history
+        return self._memoized("search", self._overlaid_search_index)
+
+    def _overlaid_search_index(self):
+        base = self.backend.load_search_index()
+        df, positions = self._overlay(self.backend.load_data())
+        if not positions:
+            return base
+        return OverlaidSearchIndex(base, display_frame(df.iloc[positions]), positions)
+
+    def load_personnel(self, refresh=False):
+        return self.backend.load_personnel(refresh=refresh)
+
+    def load_services(self):
+        return self.backend.load_services()
+
+    def personnel_directory(self):
+        return self.backend.personnel_directory()
+
+    def get_entry_for_today(self, name, date_val):
+        entry = self.backend.get_entry_for_today(name, date_val)
+        key = (name_key(name), to_sheet_date(date_val))
+        for args in self._overlay_entries():
+            if (name_key(args["name"]), args["date_val"]) != key:
+                continue
+            entry = dict(entry or {"Date": args["date_val"], "Nom et Prenoms": args["name"]})
+            entry.update({"Sexe": args["gender"], "Service": args["service"], "Heure d'arrivée": args["arrival_time"]})
+            if args["departure_time"]:
+                entry["Heure de départ"] = args["departure_time"]
+        return entry
+
+    def get_rows_for_name(self, name, start=None, end=None):
+        return self.backend.get_rows_for_name(name, start, end)
+
+    # One-off migrations rewrite stored rows: sent straight to the backend
+    def migrate_employee_ids(self):
+        return self.backend.migrate_employee_ids()
+
+    def migrate_dates(self):
+        return self.backend.migrate_dates()
+
+    # --- Writes ---
+
+    def upsert_entry(self, date_val, name, gender, service, arrival_time, departure_time):
+        if to_sheet_date(date_val) is None: return False, f"Date invalide : {date_val}"
+        date_val = to_sheet_date(date_val)
+        # Refused now: the replayer would only find out in the background
+        ambiguity = self.backend.personnel_directory().ambiguity_error([name])
+        if ambiguity: return False, ambiguity
+        try:
+            self.journal.append("upsert_entry", {
+                "date_val": date_val, "name": name, "gender": gender, "service": service,
+                "arrival_time": arrival_time, "departure_time": departure_time or "",
+            })
+        except OSError as e:
+            return False, f"Erreur enregistrement: {e}"
+        self.replayer.kick()
+        return True, f"Saisie enregistrée pour {name} (Date: {display_date(date_val)}). Synchronisation en arrière-plan."
+
+    def upsert_entries(self, entries):
+        # Journaled as individual check-ins: the overlay shows them at once and
+        # the replayer sends the whole run in one batch
+        directory = self.backend.personnel_directory()
+        ambiguity = directory.ambiguity_error([name for _, name, _, _ in entries])
+        if ambiguity: return False, ambiguity
+        args_list = []
+        for date_val, name, arrival_time, departure_time in entries:
+            if to_sheet_date(date_val) is None: return False, f"Date invalide : {date_val}"
+            gender, service = (value if value is not None else "" for value in directory.info(name))
+            args_list.append({
+                "date_val": to_sheet_date(date_val), "name": name, "gender": gender, "service": service,
+                "arrival_time": arrival_time, "departure_time": departure_time or "",
+            })
+        if not args_list:
+            return True, "Aucune saisie à enregistrer."
+        try:
+            self.journal.append_many("upsert_entry", args_list)
+        except OSError as e:
+            return False, f"Erreur enregistrement: {e}"
+        self.replayer.kick()
+        return True, f"{len(args_list)} saisie(s) enregistrée(s). Synchronisation en arrière-plan."
+
+    def _journaled(self, op, args, error_prefix):
+        try:
+            entry = self.journal.append(op, args)
+        except OSError as e:
+            return False, f"{error_prefix}: {e}"
+        self.replay()
+        if entry["seq"] in self.replayer.results:
+            return self.replayer.results.pop(entry["seq"])
+        self.replayer.kick()
+        return True, "Enregistré localement, synchronisation en attente (connexion indisponible)."
+
+    def add_service_ref(self, service_name):
+        return self._journaled("add_service_ref", {"service_name": service_name}, "Erreur ajout service")
+
+    def add_services(self, service_names):
+        return self._journaled("add_services", {"service_names": list(service_names)}, "Erreur ajout service")
+
+    def add_employee(self, name, sexe, service, original_name=None):
+        return self._journaled("add_employee", {
+            "name": name, "sexe": sexe, "service": service, "original_name": original_name,
+        }, "Erreur ajout")
+
+    def delete_employee(self, name):
+        return self._journaled("delete_employee", {"name": name}, "Erreur suppression")
+
+    def add_employees(self, employees):
+        return self._journaled("add_employees", {"employees": [list(e) for e in employees]}, "Erreur ajout")
+
+    def update_employees(self, names, sexe=None, service=None):
+        return self._journaled("update_employees", {
+            "names": list(names), "sexe": sexe, "service": service,
+        }, "Erreur mise à jour")
+
+    def delete_employees(self, names):
+        return self._journaled("delete_employees", {"names": list(names)}, "Erreur suppression")
+
+    def update_history_name(self, old_name, new_name):
+        self._journaled("update_history_name", {"old_name": old_name, "new_name": new_name}, "Erreur")
@@ -0,0 +1,15 @@
+# One-off migration: rewrites the dates of the movement sheets in the stored format
+# yyyy-mm-dd ("01/12/2025" -> "2025-12-01"), which sorts like the dates themselves.
+# The app reads both formats meanwhile. Safe to run again: converted dates are kept,
+# unreadable ones are listed. With SQLite, dates are converted when the file is opened.
+#
+#   python migrate_dates_iso.py
+import sys
+
+from database import create_data_manager
+
+if __name__ == "__main__":
+    db = create_data_manager()
+    success, msg = db.migrate_dates()
+    print(msg)
+    sys.exit(0 if success else 1)
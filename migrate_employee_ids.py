@@ -0,0 +1,13 @@
+# One-off migration: links every 'Mouvements' row to its employee (column "ID Employé").
+# Safe to run again: rows already linked are kept, names without match are listed.
+#
+#   python migrate_employee_ids.py
+import sys
+
+from database import create_data_manager
+
+if __name__ == "__main__":
+    db = create_data_manager()
+    success, msg = db.migrate_employee_ids()
+    print(msg)
+    sys.exit(0 if success else 1)
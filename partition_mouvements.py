@@ -0,0 +1,103 @@
+# One-off migration: splits the single 'Mouvements' sheet into one sheet per month
+# ("Mouvements_2025_06"), so the app only reads the months it displays.
+#
+#   python partition_mouvements.py            # dry run: rows per month
+#   python partition_mouvements.py --apply    # writes the month sheets, then archives 'Mouvements'
+#
+# Stop the app while it runs. The switch happens at the very end, when 'Mouvements'
+# is renamed "Mouvements (archive AAAA-MM-JJ)" (kept as a backup): until then the
+# app keeps using it and the script can be run again.
+import argparse
+import sys
+from datetime import date
+
+import gspread
+
+from database import MOUVEMENTS_COLUMNS, MOVEMENTS_SHEET, create_data_manager, month_of, partition_title
+from schema import to_sheet_date
+
+ID_COLUMNS = (0, len(MOUVEMENTS_COLUMNS) - 1)  # "N° ordre" and "ID Employé", kept numeric
+INVALID_PREVIEW_LINES = 10
+
+
+def split_rows(values):
+    """Sheet values (header first) -> ({month sheet: rows in MOUVEMENTS_COLUMNS order, dates stored ISO}, [rows without a readable date])."""
+    header = values[0]
+    cols = [header.index(c) if c in header else None for c in MOUVEMENTS_COLUMNS]
+    months, invalid = {}, []
+    for row in values[1:]:
+        if not any(str(v).strip() for v in row):
+            continue
+        record = [row[i] if i is not None and i < len(row) else "" for i in cols]
+        for i in ID_COLUMNS:
+            if str(record[i]).strip().isdigit():
+                record[i] = int(record[i])
+        if to_sheet_date(record[1]) is None:
+            invalid.append(record)
+        else:
+            record[1] = to_sheet_date(record[1])
+            months.setdefault(partition_title(month_of(record[1])), []).append(record)
+    return months, invalid
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Découpe la feuille 'Mouvements' en une feuille par mois.")
+    parser.add_argument("--apply", action="store_true", help="écrit les feuilles mensuelles (sinon simple aperçu)")
+    args = parser.parse_args(argv)
+
+    db = create_data_manager()
+    backend = getattr(db, "backend", db)
+    if not hasattr(backend, "pool"):
+        print("Stockage SQLite : les mouvements sont déjà indexés par mois, rien à faire.")
+        return 0
+    if not backend.ensure_connected():
+        print("Erreur connexion.")
+        return 1
+    if hasattr(db, "pending_count") and db.pending_count():
+        print(f"{db.pending_count()} saisie(s) du journal pas encore synchronisée(s) : relancez une fois l'application synchronisée.")
+        return 1
+
+    pool = backend.pool
+    try:
+        legacy = pool.worksheet(MOVEMENTS_SHEET)
+    except gspread.WorksheetNotFound:
+        print("Pas de feuille 'Mouvements' : les mouvements sont déjà répartis par mois.")
+        return 0
+    values = legacy.get_values()
+    if not values:
+        print("Feuille 'Mouvements' vide.")
+        return 0
+    months, invalid = split_rows(values)
+    for title in sorted(months):
+        print(f"{title} : {len(months[title])} lignes")
+    archive = f"{MOVEMENTS_SHEET} (archive {date.today():%Y-%m-%d})"
+    if invalid:
+        print(f"\n{len(invalid)} ligne(s) sans date lisible, conservées seulement dans '{archive}' :")
+        for record in invalid[:INVALID_PREVIEW_LINES]:
+            print(f"  {record}")
+
+    if not args.apply:
+        print("\nAperçu uniquement : relancez avec --apply pour écrire les feuilles mensuelles.")
+        return 0
+
+    existing = set(pool.titles(refresh=True))
+    data = []
+    for title, rows in sorted(months.items()):
+        if title in existing:
+            # Left by an interrupted run: written again from scratch
+            worksheet = pool.worksheet(title)
+            worksheet.clear()
+            worksheet.resize(rows=len(rows) + 1, cols=len(MOUVEMENTS_COLUMNS))
+        else:
+            pool.add_worksheet(title=title, rows=str(len(rows) + 1), cols=str(len(MOUVEMENTS_COLUMNS)))
+        data.append({"range": gspread.utils.absolute_range_name(title, "A1"), "values": [MOUVEMENTS_COLUMNS] + rows})
+    # Every month in one request
+    backend.sheet.values_batch_update(body={"valueInputOption": "RAW", "data": data})
+    legacy.update_title(archive)
+    print(f"\n{sum(len(rows) for rows in months.values())} mouvements répartis sur {len(months)} mois. "
+          f"Ancienne feuille renommée '{archive}'.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import types
+from contextlib import contextmanager
+
+# Opt-in: [debug] profiler = true in secrets.toml, or ?profile=1 in the page URL
+PROFILE_LOG_PATH = "profil_performances.jsonl"
+PROFILE_LOG_MAX_BYTES = 1_000_000  # rolled over to <path>.1 beyond this size
+
+_local = threading.local()
+_log_lock = threading.Lock()
+
+
+class Profile:
+    """Measurements of one rerun, as nested spans.
+
+    Each span records wall time, Sheets API calls, rows received from those
+    calls and bytes sent to the browser while it was open (children included).
+    """
+
+    def __init__(self, label):
+        self.label = label
+        self.started_at = time.time()
+        self.spans = []  # in opening order
+        self.depth = 0
+        self.api_calls = 0
+        self.rows = 0
+        self.bytes_sent = 0
+
+    @contextmanager
+    def span(self, name):
+        record = {"name": name, "depth": self.depth}
+        self.spans.append(record)
+        start = (time.perf_counter(), self.api_calls, self.rows, self.bytes_sent)
+        self.depth += 1
+        try:
+            yield record
+        finally:
+            self.depth -= 1
+            record.update(
+                ms=round((time.perf_counter() - start[0]) * 1000, 1),
+                api_calls=self.api_calls - start[1],
+                rows=self.rows - start[2],
+                bytes=self.bytes_sent - start[3],
+            )
+
+    def to_dict(self):
+        return {"label": self.label, "ts": self.started_at, "spans": self.spans}
+
+
+def current():
+    """Profile of the rerun running on this thread, or None when profiling is off."""
+    return getattr(_local, "profile", None)
+
+
+def _row_count(result):
+    if isinstance(result, dict):
+        if "valueRanges" in result:
+            # values_batch_get: the rows of every range
+            return sum(len(value_range.get("values", [])) for value_range in result["valueRanges"])
+        # values_get / batch update style responses
+        result = result.get("values", [])
+    if isinstance(result, list):
+        if result and all(isinstance(r, list) and r and isinstance(r[0], list) for r in result):
+            return sum(len(r) for r in result)  # batch_get: one list of rows per range
+        # Rows are lists (values) or dicts (records); worksheets() lists are not rows
+        return sum(1 for r in result if isinstance(r, (list, dict)))
+    return 0
+
+
+def record_api_call(result=None):
+    """Counts one Sheets API call (and the rows it returned) in the active profile."""
+    profile = current()
+    if profile is not None:
+        profile.api_calls += 1
+        profile.rows += _row_count(result)
+
+
+def profiled(name=None):
+    """Decorator recording a span per call while profiling (plain call otherwise)."""
+    def decorator(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profile = current()
+            if profile is None:
+                return func(*args, **kwargs)
+            with profile.span(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def profile_methods(cls):
+    """Class decorator: profiled() on every method defined by the class."""
+    for attr, func in list(vars(cls).items()):
+        if attr.startswith("__") or not isinstance(func, types.FunctionType):
+            continue
+        if inspect.isgeneratorfunction(inspect.unwrap(func)):
+            continue  # @contextmanager methods: the call only builds the context manager
+        setattr(cls, attr, profiled(f"{cls.__name__}.{attr}")(func))
+    return cls
+
+
+def _count_bytes(profile):
+    """Wraps the Streamlit session queue of this rerun to add up the messages sent."""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+        original = ctx._enqueue
+    except Exception:
+        return None
+
+    def enqueue(msg):
+        profile.bytes_sent += msg.ByteSize()
+        original(msg)
+    ctx._enqueue = enqueue
+    return ctx, original
+
+
+@contextmanager
+def profile_run(label, log_path=PROFILE_LOG_PATH):
+    """Profiles the enclosed block (one rerun) and appends the result to the rolling log."""
+    profile = Profile(label)
+    _local.profile = profile
+    hook = _count_bytes(profile)
+    try:
+        with profile.span(label):
+            yield profile
+    finally:
+        _local.profile = None
+        if hook:
+            ctx, original = hook
+            ctx._enqueue = original
+        _write_log(profile, log_path)
+
+
+def _write_log(profile, path):
+    if not path:
+        return
+    try:
+        with _log_lock:
+            if os.path.exists(path) and os.path.getsize(path) > PROFILE_LOG_MAX_BYTES:
+                os.replace(path, path + ".1")
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(profile.to_dict(), ensure_ascii=False) + "\n")
+    except OSError:
+        pass  # Profiling must never break the page
\ No newline at end of file
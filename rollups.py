@@ -0,0 +1,107 @@
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from datetime import datetime
+
+import pandas as pd
+
+from schema import SHEET_DATE_FORMAT, normalize_name, normalize_names, to_sheet_date
+
+
+class DailyRollup:
+    """Movement counts per day × service, with the distinct employees behind them.
+
+    Built once from the typed Mouvements frame, then kept up to date by
+    apply() on every check-in, so dashboard figures for a date range only
+    walk the days of that range instead of every movement row.
+    """
+
+    def __init__(self):
+        self.days = []  # sorted datetime.date having at least one movement
+        self.counts = {}  # day -> Counter(service -> rows)
+        self.employees = {}  # day -> {service: set(name keys)}
+        self._services = {}  # (day, name key) -> [service of each row], to re-route updates
+
+    @classmethod
+    def from_frame(cls, typed):
+        """Rollup of a load_typed() frame (rows without a valid date are ignored)."""
+        rollup = cls()
+        if typed.empty or not {"Date", "Nom et Prenoms", "Service"} <= set(typed.columns):
+            return rollup
+        valid = typed["Date"].notna()
+        days = typed.loc[valid, "Date"].dt.date
+        keys = normalize_names(typed.loc[valid, "Nom et Prenoms"])
+        services = typed.loc[valid, "Service"].astype(str)
+        for day, key, service in zip(days, keys, services):
+            rollup._add(day, key, service)
+        return rollup
+
+    def _add(self, day, key, service):
+        if day not in self.counts:
+            insort(self.days, day)
+            self.counts[day] = Counter()
+            self.employees[day] = {}
+        self.counts[day][service] += 1
+        self.employees[day].setdefault(service, set()).add(key)
+        self._services.setdefault((day, key), []).append(service)
+
+    def apply(self, date_val, name, service):
+        """Records a saved movement of (name, date). Idempotent: re-applying a save changes nothing."""
+        stored = to_sheet_date(date_val)
+        if stored is None:
+            return
+        day = datetime.strptime(stored, SHEET_DATE_FORMAT).date()
+        key = normalize_name(name)
+        service = str(service).strip()
+        services = self._services.get((day, key))
+        if not services:
+            self._add(day, key, service)
+            return
+        old = services[0]
+        if old == service:
+            return
+        # Same row, new service: move it from one bucket to the other
+        services[0] = service
+        counts = self.counts[day]
+        counts[old] -= 1
+        if not counts[old]:
+            del counts[old]
+        counts[service] += 1
+        if old not in services:
+            self.employees[day][old].discard(key)
+            if not self.employees[day][old]:
+                del self.employees[day][old]
+        self.employees[day].setdefault(service, set()).add(key)
+
+    def span(self):
+        """(first day, last day), or None when empty."""
+        return (self.days[0], self.days[-1]) if self.days else None
+
+    def _days_between(self, start, end):
+        return self.days[bisect_left(self.days, start):bisect_right(self.days, end)]
+
+    def count(self, start, end):
+        """Movements between two dates (inclusive)."""
+        return sum(sum(self.counts[day].values()) for day in self._days_between(start, end))
+
+    def daily_totals(self, start, end):
+        """DataFrame (Date_dt, Nombre) with one row per day having movements."""
+        days = self._days_between(start, end)
+        return pd.DataFrame({
+            "Date_dt": pd.to_datetime(pd.Series(days, dtype=object)),
+            "Nombre": [sum(self.counts[day].values()) for day in days],
+        })
+
+    def service_totals(self, start, end):
+        """DataFrame (Service, Nombre, Employés Uniques) for the services active in the range."""
+        rows = Counter()
+        people = {}
+        for day in self._days_between(start, end):
+            rows.update(self.counts[day])
+            for service, keys in self.employees[day].items():
+                people.setdefault(service, set()).update(keys)
+        services = sorted(rows)
+        return pd.DataFrame({
+            "Service": services,
+            "Nombre": [rows[s] for s in services],
+            "Employés Uniques": [len(people.get(s, ())) for s in services],
+        })
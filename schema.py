@@ -0,0 +1,210 @@
+import unicodedata
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Declared column types of the 'Mouvements' sheet
+#   id       -> nullable integer
+#   date     -> datetime64 (stored yyyy-mm-dd, older rows dd/mm/yyyy)
+#   time     -> minutes since midnight, nullable int16 ("08:30", "8h30")
+#   category -> pandas categorical (few distinct values, repeated on every row)
+MOUVEMENTS_SCHEMA = {
+    "N° ordre": "id",
+    "Date": "date",
+    "Nom et Prenoms": "category",
+    "Sexe": "category",
+    "Service": "category",
+    "Heure d'arrivée": "time",
+    "Heure de départ": "time",
+    "ID Employé": "id",
+}
+
+# Dates are stored ISO: as text they sort like the dates themselves, so a range
+# is a slice. They are shown and typed dd/mm/yyyy; both forms are accepted on input.
+SHEET_DATE_FORMAT = "%Y-%m-%d"
+DISPLAY_DATE_FORMAT = "%d/%m/%Y"
+
+
+def normalize_name(name):
+    """Canonical form of an employee name used as index key (case and spacing insensitive)."""
+    return " ".join(str(name).split()).upper()
+
+
+def fold_text(text):
+    """Lowercase, accent-free form of a text ("Prélèvements" -> "prelevements")."""
+    text = str(text)
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def normalize_names(series):
+    """normalize_name() over a Series (computed once per category when categorical)."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.map(normalize_name)
+    return series.astype(str).str.split().str.join(" ").str.upper()
+
+
+def frame_from_values(values, numeric_columns=("N° ordre", "ID Employé")):
+    """Builds a DataFrame from raw sheet values (first row = header) in one pass.
+
+    Replaces get_all_records(), which converts every cell in Python: rows are
+    padded to the header width and only the id columns are converted, vectorized.
+    """
+    if not values:
+        return pd.DataFrame()
+    header = values[0]
+    width = len(header)
+    rows = [(row + [""] * width)[:width] for row in values[1:]]
+    df = pd.DataFrame(rows, columns=header)
+    for col in numeric_columns:
+        if col in df.columns:
+            df[col] = parse_ids(df[col])
+    return df
+
+
+def parse_ids(series):
+    """Numeric ids; blanks become <NA>, other non-numeric cells are kept as text."""
+    numbers = pd.to_numeric(series, errors="coerce")
+    if numbers.isna().sum() > (series.astype(str).str.strip() == "").sum():
+        return series
+    return numbers.astype("Int64")
+
+
+def to_sheet_date(value):
+    """Stored form ("2025-12-01") of a date, datetime, ISO or dd/mm/yyyy string; None when unreadable."""
+    if hasattr(value, "strftime"):
+        return value.strftime(SHEET_DATE_FORMAT)
+    text = str(value).strip()
+    for fmt in (SHEET_DATE_FORMAT, DISPLAY_DATE_FORMAT):
+        try:
+            return datetime.strptime(text, fmt).strftime(SHEET_DATE_FORMAT)
+        except ValueError:
+            pass
+    return None
+
+
+def to_sheet_dates(series):
+    """to_sheet_date() over a Series of strings, vectorized; unreadable cells are kept as they are."""
+    text = series.astype(str).str.strip()
+    legacy = text.str.contains("/", regex=False)
+    if not legacy.any():
+        return text
+    # dd/mm/yyyy by position; the regex only for the irregular cells (1/2/2025)
+    padded = legacy & (text.str.len() == 10) & (text.str[2] == "/") & (text.str[5] == "/")
+    text[padded] = text[padded].str[6:] + "-" + text[padded].str[3:5] + "-" + text[padded].str[:2]
+    irregular = legacy & ~padded
+    if irregular.any():
+        parts = text[irregular].str.extract(r"^(\d{1,2})/(\d{1,2})/(\d{4})$")
+        converted = parts[2] + "-" + parts[1].str.zfill(2) + "-" + parts[0].str.zfill(2)
+        text[irregular] = converted.fillna(text[irregular])
+    return text
+
+
+def display_date(value):
+    """dd/mm/yyyy form of a stored date, for messages (unreadable values are returned as they are)."""
+    stored = to_sheet_date(value)
+    if stored is None:
+        return str(value)
+    return datetime.strptime(stored, SHEET_DATE_FORMAT).strftime(DISPLAY_DATE_FORMAT)
+
+
+def display_dates(series):
+    """Stored dates -> dd/mm/yyyy strings, vectorized (other values unchanged)."""
+    text = series.astype(str)
+    stored = (text.str.len() == 10) & (text.str[4] == "-") & (text.str[7] == "-")
+    return (text.str[8:] + "/" + text.str[5:7] + "/" + text.str[:4]).where(stored, text)
+
+
+def display_frame(df):
+    """Copy of a movements frame with dd/mm/yyyy dates, for tables, exports and search."""
+    df = df.copy()
+    if "Date" in df.columns and not df.empty:
+        df["Date"] = display_dates(df["Date"])
+    return df
+
+
+def parse_dates(series):
+    """Stored dates (or dd/mm/yyyy strings, or already parsed dates) -> datetime64, NaT when invalid."""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    text = series.astype(str).str.strip()
+    dates = pd.to_datetime(text, format=SHEET_DATE_FORMAT, errors="coerce")
+    for fmt in (DISPLAY_DATE_FORMAT, None):
+        leftovers = dates.isna() & (text != "")
+        if not leftovers.any():
+            break
+        # Rows not migrated yet and hand-typed cells in other layouts (1/12/25...)
+        if fmt:
+            dates[leftovers] = pd.to_datetime(text[leftovers], format=fmt, errors="coerce")
+        else:
+            dates[leftovers] = pd.to_datetime(text[leftovers], dayfirst=True, errors="coerce", format="mixed")
+    return dates
+
+
+def parse_minutes(series):
+    """'HH:MM' / '8h30' strings -> minutes since midnight (Int16), <NA> when invalid or empty."""
+    text = series.astype(str).str.strip().str.lower().str.replace("h", ":", regex=False)
+    parts = text.str.extract(r"^(\d{1,2}):(\d{2})?")
+    hours = pd.to_numeric(parts[0], errors="coerce")
+    minutes = pd.to_numeric(parts[1], errors="coerce").fillna(0)
+    total = hours * 60 + minutes
+    total[(hours > 23) | (minutes > 59)] = float("nan")
+    return total.astype("Int16")
+
+
+def format_minutes(series):
+    """Minutes since midnight -> 'HH:MM' ('' when missing), for display."""
+    values = series.astype("Float64")
+    text = (values // 60).astype("Int64").astype(str).str.zfill(2) + ":" + \
+        (values % 60).astype("Int64").astype(str).str.zfill(2)
+    return text.where(values.notna(), "")
+
+
+def format_dates(series):
+    """datetime64 -> dd/mm/yyyy strings, for display."""
+    return series.dt.strftime(DISPLAY_DATE_FORMAT).fillna("")
+
+
+def typed_frame(df, schema=MOUVEMENTS_SCHEMA):
+    """Applies a declared schema to a raw frame (columns missing from the frame are skipped)."""
+    typed = pd.DataFrame(index=df.index)
+    for col in df.columns:
+        kind = schema.get(col)
+        if kind == "id":
+            typed[col] = pd.to_numeric(df[col], errors="coerce").astype("Int32")
+        elif kind == "date":
+            typed[col] = parse_dates(df[col])
+        elif kind == "time":
+            typed[col] = parse_minutes(df[col])
+        elif kind == "category":
+            typed[col] = df[col].astype(str).str.strip().astype("category")
+        else:
+            typed[col] = df[col]
+    return typed
+
+
+class DateIndex:
+    """Row positions of a typed frame sorted by date: a date range is two binary searches.
+
+    Rows are appended roughly in date order, so the sort is close to linear.
+    Rows without a valid date are left out.
+    """
+
+    def __init__(self, dates):
+        values = dates.to_numpy(dtype="datetime64[ns]")
+        positions = np.flatnonzero(~np.isnat(values))
+        order = np.argsort(values[positions], kind="stable")
+        self.positions = positions[order]
+        self.dates = values[self.positions]
+
+    def __len__(self):
+        return len(self.positions)
+
+    def between(self, start=None, end=None):
+        """Positions of the rows dated within [start, end] (inclusive, None: unbounded), in date order."""
+        first = 0 if start is None else np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start)), "left")
+        last = len(self.dates) if end is None else np.searchsorted(self.dates, np.datetime64(pd.Timestamp(end)), "right")
+        return self.positions[first:last]
@@ -0,0 +1,179 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from schema import fold_text
+
+# "field:value" prefixes accepted in queries (accents and case ignored)
+SEARCH_FIELDS = {
+    "ordre": "N° ordre",
+    "id": "N° ordre",
+    "date": "Date",
+    "nom": "Nom et Prenoms",
+    "sexe": "Sexe",
+    "service": "Service",
+    "arrivee": "Heure d'arrivée",
+    "depart": "Heure de départ",
+}
+
+# Columns with more distinct values than this (e.g. "N° ordre") are not trigram
+# indexed: one vectorized scan of their values is cheaper than the postings
+SCAN_MIN_DISTINCT = 2000
+
+# field:"quoted value" | field:value | "quoted value" | value
+QUERY_TERM = re.compile(r'(?:(\w+):)?(?:"([^"]*)"|(\S+))')
+
+
+def parse_query(query):
+    """Splits a query into (column or None, folded term) pairs; all of them must match."""
+    terms = []
+    for match in QUERY_TERM.finditer(str(query)):
+        field, quoted, bare = match.groups()
+        value = quoted if quoted is not None else bare
+        column = SEARCH_FIELDS.get(fold_text(field)) if field else None
+        if field and column is None:
+            # Not a known field ("08:30"): search the text as typed
+            value = f"{field}:{value}"
+        value = fold_text(value).strip()
+        if value:
+            terms.append((column, value))
+    return terms
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _as_text(series):
+    return series.astype(object).where(series.notna(), "").astype(str)
+
+
+class SearchIndex:
+    """Substring search over a frame without scanning its cells.
+
+    Each column is dictionary-encoded (distinct values + one code per row)
+    and the distinct values are indexed by accent-folded trigrams. A term
+    is resolved on the small vocabulary, then rows are selected with one
+    vectorized code lookup per column, whatever the number of rows.
+    Near-unique columns skip the trigrams and scan their values instead.
+    """
+
+    def __init__(self, df):
+        self.columns = list(df.columns)
+        self._size = len(df)
+        self._codes = {}  # column -> int32 array, code of each row (capacity may exceed size)
+        self._vocab = {}  # column -> {value text: code}
+        self._folded = {}  # column -> [folded text of each code]
+        self._grams = {}  # trigram -> {(column, code)}
+        self._scanned = {}  # near-unique column -> Series of its folded values (None: to rebuild)
+        self._alphabet = {}  # near-unique column -> characters used by its values
+        for col in self.columns:
+            codes, uniques = pd.factorize(_as_text(df[col]), use_na_sentinel=False)
+            self._codes[col] = codes.astype(np.int32)
+            self._vocab[col] = {}
+            self._folded[col] = []
+            if len(uniques) > SCAN_MIN_DISTINCT and len(uniques) > len(df) // 2:
+                self._vocab[col] = dict(zip(uniques, range(len(uniques))))
+                self._folded[col] = [fold_text(value) for value in uniques]
+                self._scanned[col] = None
+                self._alphabet[col] = set("".join(self._folded[col]))
+                continue
+            for value in uniques:
+                self._register(col, value)
+
+    def __len__(self):
+        return self._size
+
+    def _register(self, col, value):
+        code = len(self._folded[col])
+        folded = fold_text(value)
+        self._vocab[col][value] = code
+        self._folded[col].append(folded)
+        if col in self._scanned:
+            self._scanned[col] = None
+            self._alphabet[col].update(folded)
+            return code
+        for gram in _trigrams(folded):
+            self._grams.setdefault(gram, set()).add((col, code))
+        return code
+
+    def _code(self, col, value):
+        value = "" if value is None else str(value)
+        code = self._vocab[col].get(value)
+        return self._register(col, value) if code is None else code
+
+    def add_row(self, row):
+        """Indexes a row appended at the end of the frame (row: column -> value)."""
+        pos = self._size
+        for col in self.columns:
+            codes = self._codes[col]
+            if pos >= len(codes):
+                # Grow by doubling so appends stay amortized O(1)
+                codes = np.concatenate([codes, np.zeros(max(16, len(codes)), dtype=np.int32)])
+                self._codes[col] = codes
+            codes[pos] = self._code(col, row.get(col, ""))
+        self._size += 1
+
+    def set_row(self, pos, changes):
+        """Re-indexes some cells of an existing row (changes: column -> value)."""
+        for col, value in changes.items():
+            if col in self._codes and pos < self._size:
+                self._codes[col][pos] = self._code(col, value)
+
+    def _matching_codes(self, column, term):
+        columns = [column] if column else self.columns
+        if len(term) >= 3:
+            postings = sorted((self._grams.get(gram, set()) for gram in _trigrams(term)), key=len)
+            candidates = set(postings[0]).intersection(*postings[1:])
+        else:
+            # One or two characters: scan the vocabulary (distinct values only)
+            candidates = ((col, code) for col in columns if col in self._folded for code in range(len(self._folded[col])))
+        matches = {}
+        for col, code in candidates:
+            if col in columns and term in self._folded[col][code] and col not in self._scanned:
+                matches.setdefault(col, []).append(code)
+        for col in columns:
+            if col in self._scanned and set(term) <= self._alphabet[col]:
+                if self._scanned[col] is None:
+                    self._scanned[col] = pd.Series(self._folded[col], dtype=object)
+                hits = np.flatnonzero(self._scanned[col].str.contains(term, regex=False).to_numpy())
+                if len(hits):
+                    matches[col] = hits
+        return matches
+
+    def search(self, query):
+        """Sorted positions of the rows matching every term of the query."""
+        terms = parse_query(query)
+        if not terms:
+            return np.arange(self._size)
+        mask = np.ones(self._size, dtype=bool)
+        for column, term in terms:
+            term_mask = np.zeros(self._size, dtype=bool)
+            for col, codes in self._matching_codes(column, term).items():
+                term_mask |= np.isin(self._codes[col][:self._size], codes)
+            mask &= term_mask
+        return np.flatnonzero(mask)
+
+
+class OverlaidSearchIndex:
+    """A SearchIndex seen with a few rows replaced or appended, the index itself untouched.
+
+    The overlay rows (a small frame) get their own SearchIndex; positions are
+    their places in the full frame: rows of the base they replace, or
+    positions past its end for new rows.
+    """
+
+    def __init__(self, base, overlay, positions):
+        self.base = base
+        self.overlay = SearchIndex(overlay)
+        self.positions = np.asarray(positions, dtype=np.int64)
+
+    def __len__(self):
+        return max(len(self.base), int(self.positions.max()) + 1 if len(self.positions) else 0)
+
+    def search(self, query):
+        """Sorted positions of the rows matching every term of the query."""
+        hits = self.base.search(query)
+        hits = hits[~np.isin(hits, self.positions)]
+        return np.union1d(hits, self.positions[self.overlay.search(query)])
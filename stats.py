@@ -1,46 +1,36 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import altair as alt
 from datetime import datetime, timedelta
 
+from profiler import profiled
+from schema import format_dates, format_minutes
+from timesheet import display_durations
+
+@profiled("stats.view_dashboard")
 def view_dashboard(db):
     """
     Displays the dashboard with key metrics and statistics.
     """
-    # 1. Load Data
-    df_mouvements = db.load_data()  # Returns DataFrame of movements
     df_personnel = db.load_personnel() # Returns DataFrame of personnel
 
     # Container
     st.markdown("<div class='info-card'><h3>📊 Tableau de Bord Analytique</h3>", unsafe_allow_html=True)
-    
-    if df_mouvements.empty:
-        st.info("Données insuffisantes pour générer des graphiques.")
-        st.markdown("</div>", unsafe_allow_html=True)
-        return
 
     # --- DATE FILTERS ---
-    # Pre-processing for Date
-    df_chart = df_mouvements.copy()
-    if "Date" in df_chart.columns:
-        df_chart['Date_dt'] = pd.to_datetime(df_chart['Date'], dayfirst=True, errors='coerce')
-        df_chart = df_chart.dropna(subset=['Date_dt'])
-    
-    # Get Mix/Max dates for default
-    min_date = df_chart['Date_dt'].min().date() if not df_chart.empty else datetime.now().date()
-    max_date = df_chart['Date_dt'].max().date() if not df_chart.empty else datetime.now().date()
-    
+    # Current month by default: only its movements are read
+    today = datetime.now().date()
     col_filter1, col_filter2 = st.columns([2, 2])
     with col_filter1:
         date_range = st.date_input(
             "📅 Filtrer par Période",
-            value=(min_date, max_date),
-            min_value=min_date,
-            max_value=datetime.now().date() + timedelta(days=365) # Allow future if needed, but usually past
+            value=(today.replace(day=1), today),
+            max_value=today + timedelta(days=365) # Allow future if needed, but usually past
         )
     
     # Filter Logic
-    start_date, end_date = min_date, max_date
+    start_date, end_date = today.replace(day=1), today
     if isinstance(date_range, tuple):
         if len(date_range) == 2:
             start_date, end_date = date_range
@@ -48,9 +38,9 @@ def view_dashboard(db):
             start_date = date_range[0]
             end_date = start_date
 
-    # Apply Filter
-    mask_date = (df_chart['Date_dt'].dt.date >= start_date) & (df_chart['Date_dt'].dt.date <= end_date)
-    df_filter = df_chart[mask_date].copy()
+    # 1. Load Data
+    rollup = db.load_rollups(start_date, end_date)  # Per-day × service counts of the months of the range
+    service_stats = rollup.service_totals(start_date, end_date)
 
     # --- KPI HEADER ---
     col1, col2, col3, col4 = st.columns(4)
@@ -60,29 +50,24 @@ def view_dashboard(db):
     col1.metric("👥 Total Personnel", total_emp)
     
     # Metric 2: Total Movements (Filtered)
-    total_mov = len(df_filter)
+    total_mov = int(service_stats["Nombre"].sum())
     col2.metric("📝 Enregistrements", total_mov)
     
     # Metric 3: Today's Count (Static context usually, but let's keep it real-time independent of filter?)
     # User might want to see "Today" regardless of filter, OR filtered today. 
     # Let's keep "Today" as absolute "Today" for dashboard awareness.
-    today_str = datetime.now().strftime("%d/%m/%Y")
-    today_count = 0
-    if not df_mouvements.empty and "Date" in df_mouvements.columns:
-        today_mask = df_mouvements["Date"].astype(str) == today_str
-        today_count = len(df_mouvements[today_mask])
+    today_rollup = rollup if start_date <= today <= end_date else db.load_rollups(today, today)
+    today_count = today_rollup.count(today, today)
     
     col3.metric("📅 Aujourd'hui (Global)", today_count)
 
     # Metric 4: Active Departments (Filtered)
-    unique_services = 0
-    if not df_filter.empty and "Service" in df_filter.columns:
-        unique_services = df_filter["Service"].nunique()
+    unique_services = len(service_stats)
     col4.metric("🏢 Services Actifs", unique_services)
 
     st.markdown("---")
 
-    if df_filter.empty:
+    if total_mov == 0:
         st.warning(f"Aucune donnée trouvée pour la période du {start_date} au {end_date}.")
         st.markdown("</div>", unsafe_allow_html=True)
         return
@@ -92,9 +77,8 @@ def view_dashboard(db):
     
     with c_chart1:
         st.markdown("#### 🥧 Répartition par Service")
-        if "Service" in df_filter.columns:
-            service_counts = df_filter["Service"].value_counts().reset_index()
-            service_counts.columns = ["Service", "Nombre"]
+        if not service_stats.empty:
+            service_counts = service_stats[["Service", "Nombre"]]
             
             bar_chart = alt.Chart(service_counts).mark_bar(cornerRadiusTopLeft=3, cornerRadiusTopRight=3).encode(
                 x=alt.X('Service', sort='-y', axis=alt.Axis(labelAngle=-45)),
@@ -106,9 +90,8 @@ def view_dashboard(db):
             
     with c_chart2:
         st.markdown("#### 📈 Évolution des entrées")
-        if "Date_dt" in df_filter.columns:
-            daily_counts = df_filter.groupby('Date_dt').size().reset_index(name='Nombre')
-            daily_counts = daily_counts.sort_values('Date_dt')
+        if not service_stats.empty:
+            daily_counts = rollup.daily_totals(start_date, end_date)
             
             line_chart = alt.Chart(daily_counts).mark_line(point=True, interpolate='monotone').encode(
                 x=alt.X('Date_dt', axis=alt.Axis(format='%d/%m', title='Date')),
@@ -121,7 +104,7 @@ def view_dashboard(db):
     st.markdown("---")
     st.subheader("🔍 Analyse détaillée")
     
-    tab1, tab2 = st.tabs(["👤 Par Employé & Tendances", "🏢 Par Service"])
+    tab1, tab2, tab3 = st.tabs(["👤 Par Employé & Tendances", "🏢 Par Service", "⏱️ Feuilles de temps"])
     
     # TAB 1: Employee Stats
     with tab1:
@@ -137,14 +120,16 @@ def view_dashboard(db):
         with col_stats:
             if selected_emp:
                 # Filter movements for this employee (within global date filter)
-                # Normalize case and whitespace for comparison
-                mask_emp = df_filter["Nom et Prenoms"].astype(str).str.strip().str.upper() == str(selected_emp).strip().upper()
-                emp_data = df_filter[mask_emp].sort_values(by="Date_dt", ascending=False)
+                # Rows of the period from the sorted date index (binary search), of the employee from the name index
+                df_typed = db.load_typed(start_date, end_date)
+                in_period = db.load_date_index(start_date, end_date).between(start_date, end_date)
+                rows = np.intersect1d(in_period, np.asarray(db.get_rows_for_name(selected_emp, start_date, end_date), dtype=np.int64))
+                emp_data = df_typed.iloc[rows].sort_values(by="Date", ascending=False)
                 
                 if not emp_data.empty:
                     # Specific Metrics
-                    last_visit = emp_data.iloc[0]["Date"]
-                    last_time = emp_data.iloc[0].get("Heure d'arrivée", "-")
+                    last_visit = format_dates(emp_data["Date"].head(1)).iloc[0]
+                    last_time = format_minutes(emp_data["Heure d'arrivée"].head(1)).iloc[0] or "-"
                     total_visits = len(emp_data)
                     
                     m1, m2, m3 = st.columns(3)
@@ -157,20 +142,12 @@ def view_dashboard(db):
                     
                     # Prepare data for plotting
                     # We need to normalize time to a dummy date to plot on Y-axis
-                    chart_data = emp_data.copy().sort_values("Date_dt")
+                    chart_data = emp_data.sort_values("Date").rename(columns={"Date": "Date_dt"})
                     
-                    # Function to convert HH:MM string to datetime on a dummy day
-                    def parse_time_to_dummy(t_str):
-                        if not isinstance(t_str, str): return None
-                        try:
-                            t_str = t_str.replace('h', ':').strip()
-                            t = datetime.strptime(t_str, "%H:%M").time()
-                            return datetime.combine(datetime(2000, 1, 1), t)
-                        except:
-                            return None
-
-                    chart_data['Arrival_DT'] = chart_data["Heure d'arrivée"].apply(parse_time_to_dummy)
-                    chart_data['Departure_DT'] = chart_data["Heure de départ"].apply(parse_time_to_dummy)
+                    # Minutes since midnight -> datetime on a dummy day
+                    dummy_day = pd.Timestamp(2000, 1, 1)
+                    chart_data['Arrival_DT'] = dummy_day + pd.to_timedelta(chart_data["Heure d'arrivée"].astype("Float64"), unit="m")
+                    chart_data['Departure_DT'] = dummy_day + pd.to_timedelta(chart_data["Heure de départ"].astype("Float64"), unit="m")
 
                     # Melt for dual line chart
                     melted = chart_data.melt(
@@ -201,8 +178,14 @@ def view_dashboard(db):
                         st.info("Pas assez de données horaires valides pour le graphique.")
                     
                     st.caption("Historique récent (filtré) :")
+                    recent = emp_data.head(5)
                     st.dataframe(
-                        emp_data[["Date", "Heure d'arrivée", "Heure de départ", "Service"]].head(5),
+                        pd.DataFrame({
+                            "Date": format_dates(recent["Date"]),
+                            "Heure d'arrivée": format_minutes(recent["Heure d'arrivée"]),
+                            "Heure de départ": format_minutes(recent["Heure de départ"]),
+                            "Service": recent["Service"].astype(str),
+                        }),
                         hide_index=True,
                         use_container_width=True
                     )
@@ -213,13 +196,9 @@ def view_dashboard(db):
 
     # TAB 2: Service Stats
     with tab2:
-        if "Service" in df_filter.columns:
-            # Group by Service
-            grouped_svc = df_filter.groupby("Service").size().reset_index(name="Total Mouvements")
-            # Calculate unique people per service seen
-            people_per_svc = df_filter.groupby("Service")["Nom et Prenoms"].nunique().reset_index(name="Employés Uniques")
-            
-            merged_stats = pd.merge(grouped_svc, people_per_svc, on="Service")
+        if not service_stats.empty:
+            # Totals and unique people per service, straight from the rollup
+            merged_stats = service_stats.rename(columns={"Nombre": "Total Mouvements"})
             
             st.dataframe(
                 merged_stats.style.background_gradient(cmap="Greens"), 
@@ -229,4 +208,31 @@ def view_dashboard(db):
         else:
             st.error("Colonne 'Service' manquante dans les données.")
 
+    # TAB 3: Monthly timesheets (months of the selected period)
+    with tab3:
+        timesheet = db.load_timesheet(start_date, end_date)
+        months = timesheet.months()
+        if months:
+            col_month, col_service = st.columns(2)
+            with col_month:
+                month = st.selectbox("Mois :", months[::-1], format_func=lambda m: f"{m[5:]}/{m[:4]}")
+            with col_service:
+                services = sorted(timesheet.for_month(month)["Service"].unique().tolist())
+                service = st.selectbox("Service :", ["Tous"] + services)
+
+            st.caption(f"Horaire de référence : {' - '.join(format_minutes(pd.Series(timesheet.schedule)))} "
+                       "(retard après le début, heures sup. au-delà de la durée de la journée)")
+
+            st.markdown("##### 🏢 Par Service")
+            st.dataframe(display_durations(timesheet.by_service(month)), use_container_width=True, hide_index=True)
+
+            st.markdown("##### 👤 Par Employé")
+            st.dataframe(
+                display_durations(timesheet.for_month(month, None if service == "Tous" else service).drop(columns=["Mois"])),
+                use_container_width=True,
+                hide_index=True
+            )
+        else:
+            st.info("Aucun mouvement sur cette période.")
+
     st.markdown("</div>", unsafe_allow_html=True)
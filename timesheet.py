@@ -0,0 +1,118 @@
+import pandas as pd
+
+from schema import format_minutes, parse_minutes
+
+# Reference working day (overridable in secrets.toml under [schedule])
+DEFAULT_START = "08:00"
+DEFAULT_END = "17:30"
+
+# Per employee and month; durations in minutes
+TIMESHEET_COLUMNS = ["Mois", "Service", "Nom et Prenoms", "Jours", "Jours complets", "Travaillé (min)",
+                     "Retards", "Retard (min)", "Heures sup. (min)"]
+DURATION_COLUMNS = ["Travaillé (min)", "Retard (min)", "Heures sup. (min)"]
+
+
+def schedule_minutes(start=DEFAULT_START, end=DEFAULT_END):
+    """(start, end) of the working day in minutes since midnight ("08:00", "8h30"); the defaults when unreadable."""
+    first, last, default_first, default_last = (
+        None if pd.isna(value) else int(value) for value in parse_minutes(pd.Series([start, end, DEFAULT_START, DEFAULT_END])))
+    if first is None or last is None or last <= first:
+        return default_first, default_last
+    return first, last
+
+
+def day_minutes(typed, start, end):
+    """Worked, late and overtime minutes of every row of a load_typed() frame, in one vectorized pass.
+
+    Worked time needs both times (departure after arrival), <NA> otherwise.
+    Lateness is the arrival past start; overtime the time worked beyond the
+    scheduled day (end - start), so a late arrival is not counted twice.
+    """
+    arrival = typed["Heure d'arrivée"].astype("Int32")
+    departure = typed["Heure de départ"].astype("Int32")
+    worked = departure - arrival
+    worked = worked.where(worked > 0)
+    return pd.DataFrame({
+        "worked": worked,
+        "late": (arrival - start).clip(lower=0),
+        "overtime": (worked - (end - start)).clip(lower=0),
+    }, index=typed.index)
+
+
+class Timesheet:
+    """Monthly timesheets: worked time, lateness and overtime per employee and service.
+
+    Built from a load_typed() frame (times already in minutes) with one
+    groupby, whatever the number of employees and months; the views then
+    only slice the small per-employee-month table.
+    """
+
+    def __init__(self, rows, schedule):
+        self.rows = rows  # TIMESHEET_COLUMNS, "Mois" as "yyyy-mm"
+        self.schedule = schedule  # (start, end) in minutes
+
+    @classmethod
+    def from_frame(cls, typed, schedule=None):
+        """Timesheet of a load_typed() frame against a (start, end) schedule in minutes (default: 08:00-17:30)."""
+        start, end = schedule = schedule or schedule_minutes()
+        needed = {"Date", "Nom et Prenoms", "Service", "Heure d'arrivée", "Heure de départ"}
+        if typed.empty or not needed <= set(typed.columns):
+            return cls(pd.DataFrame(columns=TIMESHEET_COLUMNS), schedule)
+        typed = typed[typed["Date"].notna()]
+        minutes = day_minutes(typed, start, end)
+        frame = pd.DataFrame({
+            "Mois": typed["Date"].dt.to_period("M"),
+            "Service": typed["Service"],
+            "Nom et Prenoms": typed["Nom et Prenoms"],
+            "worked": minutes["worked"],
+            "late": minutes["late"],
+            "is_late": (minutes["late"] > 0).astype("Int32"),
+            "overtime": minutes["overtime"],
+        })
+        rows = frame.groupby(["Mois", "Service", "Nom et Prenoms"], observed=True, sort=True).agg(**{
+            "Jours": ("worked", "size"),
+            "Jours complets": ("worked", "count"),
+            "Travaillé (min)": ("worked", "sum"),
+            "Retards": ("is_late", "sum"),
+            "Retard (min)": ("late", "sum"),
+            "Heures sup. (min)": ("overtime", "sum"),
+        }).reset_index()
+        rows["Mois"] = rows["Mois"].astype(str)
+        for col in ("Service", "Nom et Prenoms"):
+            rows[col] = rows[col].astype(str)
+        for col in TIMESHEET_COLUMNS[3:]:
+            rows[col] = rows[col].astype("int64")
+        return cls(rows[TIMESHEET_COLUMNS], schedule)
+
+    def months(self):
+        """Months ("yyyy-mm") having at least one movement, oldest first."""
+        return sorted(self.rows["Mois"].unique().tolist())
+
+    def for_month(self, month, service=None):
+        """Per-employee rows of a month ("yyyy-mm"), optionally of one service."""
+        rows = self.rows[self.rows["Mois"] == month]
+        if service:
+            rows = rows[rows["Service"] == service]
+        return rows.reset_index(drop=True)
+
+    def by_service(self, month):
+        """Totals per service of a month: employees, days, worked time, lateness and overtime."""
+        rows = self.for_month(month)
+        totals = rows.groupby("Service", sort=True).agg(**{
+            "Employés": ("Nom et Prenoms", "nunique"),
+            "Jours": ("Jours", "sum"),
+            "Travaillé (min)": ("Travaillé (min)", "sum"),
+            "Retards": ("Retards", "sum"),
+            "Retard (min)": ("Retard (min)", "sum"),
+            "Heures sup. (min)": ("Heures sup. (min)", "sum"),
+        })
+        return totals.reset_index()
+
+
+def display_durations(df):
+    """Copy of a timesheet table with its minute columns as "HH:MM" (hours may exceed 24), for display."""
+    df = df.copy()
+    for col in DURATION_COLUMNS:
+        if col in df.columns:
+            df[col] = format_minutes(df[col])
+    return df.rename(columns={col: col.replace(" (min)", "") for col in DURATION_COLUMNS})
@@ -0,0 +1,81 @@
+import queue
+import threading
+import time
+from collections import defaultdict, deque
+
+# Number of recent write latencies kept for the sidebar metrics
+LATENCY_HISTORY = 50
+
+
+class BackgroundWriter:
+    """Process-wide worker thread executing DataManager writes off the Streamlit callbacks.
+
+    Commands are (session key, db, method, args); they run one at a time in
+    submission order, so a second save for the same (name, date) always sees
+    the first one. Results are kept per session until the UI collects them.
+    """
+
+    def __init__(self, history=LATENCY_HISTORY):
+        self._queue = queue.Queue()
+        self._results = defaultdict(deque)  # session key -> (label, success, msg, latency_ms)
+        self._results_lock = threading.Lock()
+        self._latencies = deque(maxlen=history)
+        self._busy = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, session_key, db, method, *args, label=None):
+        """Queues db.method(*args) and returns immediately with the queue depth."""
+        self._queue.put((session_key, db, method, args, label or method, time.monotonic()))
+        return self.depth()
+
+    def _run(self):
+        while True:
+            session_key, db, method, args, label, submitted_at = self._queue.get()
+            self._busy = True
+            started = time.monotonic()
+            try:
+                success, msg = getattr(db, method)(*args)
+            except Exception as e:
+                success, msg = False, f"Erreur enregistrement: {e}"
+            finally:
+                self._busy = False
+            latency_ms = (time.monotonic() - started) * 1000
+            self._latencies.append((latency_ms, (time.monotonic() - submitted_at) * 1000))
+            with self._results_lock:
+                self._results[session_key].append((label, success, msg, latency_ms))
+            self._queue.task_done()
+
+    def pop_results(self, session_key):
+        """Results finished since the last call for this session."""
+        with self._results_lock:
+            return list(self._results.pop(session_key, []))
+
+    def depth(self):
+        """Commands waiting or running."""
+        return self._queue.qsize() + (1 if self._busy else 0)
+
+    def stats(self):
+        """Queue depth and latency figures (ms) of the last writes."""
+        latencies = list(self._latencies)
+        write_ms = sorted(l for l, _ in latencies)
+        return {
+            "depth": self.depth(),
+            "last_ms": latencies[-1][0] if latencies else None,
+            "avg_ms": sum(write_ms) / len(write_ms) if write_ms else None,
+            "p95_ms": write_ms[int(0.95 * (len(write_ms) - 1))] if write_ms else None,
+            "last_total_ms": latencies[-1][1] if latencies else None,
+        }
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """Process-wide writer shared by every session."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = BackgroundWriter()
+        return _writer